@@ -0,0 +1,49 @@
+import argparse
+import json
+import sys
+
+# ---- REGRESSION CHECK ----
+# A step regresses when it is both `threshold` times slower and at least
+# `min_ms` slower than the baseline (tiny steps are too noisy for ratios
+# alone), or when it issues more queries than before.
+
+
+def compare(base, new, threshold=1.25, min_ms=5.0):
+    """[(step, message)] for every regression of `new` against `base`"""
+    problems = []
+    for name, before in base["steps"].items():
+        after = new["steps"].get(name)
+        if after is None:
+            problems.append((name, "missing from the new report"))
+            continue
+        slower = after["wall_ms"] - before["wall_ms"]
+        if after["wall_ms"] > before["wall_ms"] * threshold and slower >= min_ms:
+            problems.append((name, f"{before['wall_ms']:.1f} ms -> {after['wall_ms']:.1f} ms"))
+        if after["queries"] > before["queries"]:
+            problems.append((name, f"{before['queries']} -> {after['queries']} queries"))
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts (default 1.25)")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+    if base["meta"]["scale"] != new["meta"]["scale"]:
+        print(f"warning: comparing scale {base['meta']['scale']} against {new['meta']['scale']}")
+
+    for name, after in new["steps"].items():
+        before = base["steps"].get(name)
+        change = f"{after['wall_ms'] / before['wall_ms']:6.2f}x" if before and before["wall_ms"] else "   new"
+        print(f"{name:<28} {change}  {after['wall_ms']:>10.2f} ms")
+    problems = compare(base, new, args.threshold, args.min_ms)
+    for name, message in problems:
+        print(f"REGRESSION {name}: {message}")
+    sys.exit(1 if problems else 0)
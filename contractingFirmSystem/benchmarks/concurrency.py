@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks import datagen
+
+# ---- CONCURRENT WRITERS STRESS TEST ----
+# Many threads, each with its own connection as separate desktops would have,
+# mix list reads, row reads, conflict-checked employee edits and new payments
+# on a copy of a generated database for a fixed time. Edits all land on a
+# small set of "hot" employees and add 1 to the salary, so afterwards every
+# hot row must show exactly one version step and one rupee per successful
+# edit: anything less is a lost update. --unchecked edits without the
+# version check, the way the dashboard saved before row versions, to show
+# the difference.
+#
+#     python -m benchmarks.concurrency --scale 10k --threads 16 --seconds 10
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker(until, rng, hot, checked, think, tally, lock):
+    from modules import repositories
+    from modules.sources import SOURCES
+
+    times, edits = {}, {}
+    conflicts = failures = 0
+    lists = list(SOURCES.values())
+    while time.monotonic() < until:
+        roll = rng.random()
+        start = time.perf_counter()
+        try:
+            if roll < 0.35:
+                kind = "list"
+                source = rng.choice(lists)
+                source.fetch_after(source.default_state(), None, 100)
+            elif roll < 0.5:
+                kind = "get"
+                repositories.employees.get(rng.choice(hot))
+            elif roll < 0.85:
+                kind = "edit"
+                row = repositories.employees.get(rng.choice(hot))
+                time.sleep(think * rng.random())  # the clerk typing
+                version = row.version if checked else None
+                if repositories.employees.update(row.id, version, salary=(row.salary or 0) + 1):
+                    edits[row.id] = edits.get(row.id, 0) + 1
+            else:
+                kind = "insert"
+                repositories.payments.insert(project_id=rng.randint(1, 1000), amount=rng.randint(1, 500) * 1000,
+                                             date=f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2026")
+        except repositories.ConflictError:
+            conflicts += 1
+        except sqlite3.OperationalError:
+            failures += 1  # still locked after every retry
+        times.setdefault(kind, []).append(time.perf_counter() - start)
+    with lock:
+        for kind, samples in times.items():
+            tally["times"].setdefault(kind, []).extend(samples)
+        for row_id, count in edits.items():
+            tally["edits"][row_id] = tally["edits"].get(row_id, 0) + count
+        tally["conflicts"] += conflicts
+        tally["failures"] += failures
+
+
+def run_stress(db_path, threads, seconds, hot_rows, checked=True, think=0.002, seed=1234):
+    from modules import db_connection, stats
+
+    db_connection.configure(db_path)
+    conn = db_connection.connection()
+    hot = [row[0] for row in conn.execute("SELECT id FROM employees ORDER BY id LIMIT ?", (hot_rows,))]
+    before = {row_id: (version, salary or 0) for row_id, version, salary in conn.execute(
+        f"SELECT id, version, salary FROM employees WHERE id IN ({', '.join('?' * len(hot))})", hot
+    )}
+    db_connection.reset_stats()
+
+    tally = {"times": {}, "edits": {}, "conflicts": 0, "failures": 0}
+    lock = threading.Lock()
+    until = time.monotonic() + seconds
+    workers = [
+        threading.Thread(target=_worker, args=(until, random.Random(seed + i), hot, checked, think, tally, lock))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    lost = 0
+    for row_id, version, salary in conn.execute(
+        f"SELECT id, version, salary FROM employees WHERE id IN ({', '.join('?' * len(hot))})", hot
+    ):
+        saved = tally["edits"].get(row_id, 0)
+        lost += saved - round(salary - before[row_id][1])  # edits whose +1 another edit overwrote
+    drift = stats.verify()
+    busy_retries = db_connection.stats()["busy_retries"]
+    db_connection.close_all()
+
+    kinds = {}
+    for kind, samples in sorted(tally["times"].items()):
+        samples.sort()
+        kinds[kind] = {
+            "ops": len(samples),
+            "p50_ms": round(statistics.median(samples) * 1000, 2),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        }
+    total = sum(k["ops"] for k in kinds.values())
+    return {
+        "ops": total,
+        "per_second": round(total / elapsed, 1),
+        "edits_saved": sum(tally["edits"].values()),
+        "conflicts": tally["conflicts"],
+        "lost_updates": lost,
+        "lock_failures": tally["failures"],
+        "busy_retries": busy_retries,
+        "counter_drift": len(drift),
+        "kinds": kinds,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.concurrency",
+                                     description="Stress concurrent readers and writers on one database")
+    parser.add_argument("--scale", default="1k", help=f"one of {', '.join(datagen.SCALES)}")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--hot", type=int, default=20, help="employees all edits go to")
+    parser.add_argument("--unchecked", action="store_true", help="edit without the row version check")
+    parser.add_argument("--out", help="JSON report (default: benchmarks/results/concurrency-<scale>-<time>.json)")
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir(),
+                        help="where generated databases are kept between runs")
+    args = parser.parse_args()
+
+    dataset = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.db")
+    if not os.path.exists(dataset):
+        datagen.generate(dataset, args.scale, args.seed, log=print)
+    work = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.stress.db")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(dataset, work)
+
+    report = run_stress(work, args.threads, args.seconds, args.hot, not args.unchecked, seed=args.seed)
+    report["meta"] = {"scale": args.scale, "threads": args.threads, "seconds": args.seconds, "hot": args.hot,
+                      "checked": not args.unchecked, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    out = args.out or os.path.join(APP_DIR, "benchmarks", "results",
+                                   f"concurrency-{args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for kind, k in report["kinds"].items():
+        print(f"{kind:<7} {k['ops']:>8} ops  p50 {k['p50_ms']:>8.2f} ms  p95 {k['p95_ms']:>8.2f} ms")
+    print(f"{report['ops']} operations from {args.threads} threads: {report['per_second']}/s")
+    print(f"edits saved {report['edits_saved']}, conflicts {report['conflicts']}, "
+          f"lost updates {report['lost_updates']}, lock failures {report['lock_failures']}, "
+          f"busy retries {report['busy_retries']}, counters drifted {report['counter_drift']}")
+    print(f"report written to {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
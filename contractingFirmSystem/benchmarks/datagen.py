@@ -0,0 +1,121 @@
+import argparse
+import os
+import random
+import time
+
+from modules import db_connection, migrations
+
+# ---- SYNTHETIC FIRM DATA ----
+# A seeded random.Random drives every value, so one (scale, seed) always gives
+# the same rows and the same ids. The schema comes from modules/migrations.py,
+# like setup_db.py, and the counter/search triggers fire as they would live.
+
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000, "1m": 1000000}
+
+FIRST = ["Ali", "Ahmed", "Bilal", "Haris", "Musawir", "Zubair", "Kamran", "Noor", "Sana", "Ayesha",
+         "Imran", "Asad", "Fahad", "Hina", "Mohsin", "Rashid", "Saad", "Usman", "Wali", "Yasir"]
+LAST = ["Khan", "Baloch", "Kakar", "Achakzai", "Shah", "Qureshi", "Butt", "Malik", "Raza", "Jamali"]
+TRADES = ["Traders", "Builders", "Steel", "Cement", "Contractors", "Logistics", "Estates", "Works"]
+PLACES = ["Quetta", "Sariab Road", "Brewery Road", "Jinnah Town", "Satellite Town", "Airport Road",
+          "Zarghoon Road", "Hazar Ganji", "Chaman", "Pishin"]
+PROJECT_KINDS = ["Road", "Bridge", "School", "Hospital", "Plaza", "Water Supply", "Drainage", "Boundary Wall"]
+MACHINE_KINDS = [("Excavator", "Heavy"), ("Mixer", "Electric"), ("Drill", "Electric"), ("Crane", "Heavy"),
+                 ("Roller", "Heavy"), ("Generator", "Diesel"), ("Dumper", "Heavy")]
+MACHINE_STATUSES = ["Available", "In Use", "Under Repair", "Broken"]
+DESIGNATIONS = ["Manager", "CEO", "Driver", "Accountant", "Labour", "Office Wroker"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+
+
+def table_sizes(rows):
+    """Rows per table for a scale: the list tabs get `rows`, the rest proportionally fewer"""
+    return {
+        "clients": rows,
+        "projects": rows,
+        "payments": rows,
+        "employee_salaries": rows,
+        "employees": max(50, rows // 20),
+        "machines": max(20, rows // 100),
+    }
+
+
+def _date(rng, first_year=2018, last_year=2025):
+    return f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(first_year, last_year)}"
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+
+
+def _with_uuid(sql):
+    # each row's sync uuid in the INSERT itself, as the repositories do, rather than from the fallback trigger
+    columns, values = sql.rsplit(") VALUES (", 1)
+    return f"{columns}, uuid) VALUES ({values[:-1]}, {migrations.NEW_UUID_SQL})"
+
+
+def generate(path, scale="1k", seed=1234, log=None):
+    """Create a fresh database at `path`; returns {table: rows inserted}"""
+    rows = SCALES[scale] if isinstance(scale, str) else int(scale)
+    sizes = table_sizes(rows)
+    rng = random.Random(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    pool = db_connection.ConnectionPool(path, profile="bulk")
+    start = time.perf_counter()
+    steps = [
+        ("users", "INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+         [("admin", "123", "admin")]),
+        ("clients", "INSERT INTO clients (name, contact, address) VALUES (?, ?, ?)",
+         ((f"{rng.choice(FIRST)} {rng.choice(TRADES)}", f"03{rng.randrange(10**9):09d}",
+           rng.choice(PLACES)) for _ in range(sizes["clients"]))),
+        ("projects", "INSERT INTO projects (client_id, project_name, project_value, start_date, end_date, status) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+         ((rng.randint(1, sizes["clients"]), f"{rng.choice(PLACES)} {rng.choice(PROJECT_KINDS)}",
+           float(rng.randrange(100, 50000) * 1000), _date(rng), _date(rng),
+           rng.choice(["ongoing", "ongoing", "completed"])) for _ in range(sizes["projects"]))),
+        ("payments", "INSERT INTO payments (project_id, amount, date) VALUES (?, ?, ?)",
+         ((rng.randint(1, sizes["projects"]), float(rng.randrange(1, 5000) * 100), _date(rng))
+          for _ in range(sizes["payments"]))),
+        ("machines", "INSERT INTO machines (machine_name, machine_type, purchase_date, cost, status) "
+                     "VALUES (?, ?, ?, ?, ?)",
+         ((f"{kind} {i + 1}", mtype, _date(rng, 2010), float(rng.randrange(50, 5000) * 1000),
+           rng.choice(MACHINE_STATUSES))
+          for i in range(sizes["machines"]) for kind, mtype in [rng.choice(MACHINE_KINDS)])),
+        ("employees", "INSERT INTO employees (name, phone, cnic, designation, salary, join_date, status) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)",
+         ((_person(rng), f"03{rng.randrange(10**9):09d}", f"{rng.randrange(10**12, 10**13)}",
+           rng.choice(DESIGNATIONS), float(rng.randrange(25, 300) * 1000),
+           f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+           "active" if rng.random() < 0.9 else "inactive") for _ in range(sizes["employees"]))),
+        ("employee_salaries", "INSERT INTO employee_salaries (employee_id, salary_amount, month, date_paid, status) "
+                              "VALUES (?, ?, ?, ?, ?)",
+         ((rng.randint(1, sizes["employees"]), float(rng.randrange(25, 300) * 1000), rng.choice(MONTHS),
+           _date(rng), "Paid") for _ in range(sizes["employee_salaries"]))),
+    ]
+    counts = {}
+    for table, sql, values in steps:
+        step_start = time.perf_counter()
+        with pool.transaction() as conn:
+            counts[table] = conn.executemany(_with_uuid(sql), values).rowcount
+        if log:
+            log(f"{table}: {counts[table]} rows in {time.perf_counter() - step_start:.1f}s")
+    with pool.transaction() as conn:
+        conn.execute("DELETE FROM change_log")  # history of a made-up firm: no other site is waiting for it
+    conn = pool.connection()
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    pool.close_all()
+    if log:
+        log(f"{path} generated in {time.perf_counter() - start:.1f}s")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.datagen", description="Generate a synthetic firm.db")
+    parser.add_argument("output", help="database file to create (overwritten)")
+    parser.add_argument("--scale", default="1k", help=f"one of {', '.join(SCALES)} or a row count")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    generate(args.output, args.scale if args.scale in SCALES else int(args.scale), args.seed, log=print)
@@ -0,0 +1,294 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks import datagen
+
+# ---- DASHBOARD BENCHMARKS ----
+# Drives the real LoginApp/DashboardApp headless (QT_QPA_PLATFORM=offscreen)
+# against a generated database. Every step waits until the query executor is
+# idle, so its time includes the worker-thread work and the UI update.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_qt_app = None  # Qt deletes a QApplication nothing refers to, so the suite holds it here
+
+
+def rss_mb():
+    """Current resident set size, where the platform exposes it"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class Bench:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.samples = {}
+
+    def measure(self, name, fn, executor=None, setup=None):
+        """Time `fn` `repeat` times; `setup` runs untimed before each run"""
+        from modules import db_connection
+
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+                if executor is not None:
+                    executor.wait_for_idle(600000)
+            db_connection.reset_stats()
+            start = time.perf_counter()
+            result = fn()
+            executor = executor or getattr(result, "executor", None)
+            if executor is not None:
+                executor.wait_for_idle(600000)
+            elapsed = time.perf_counter() - start
+            stats = db_connection.stats()
+            self.samples.setdefault(name, []).append((elapsed, stats["queries"], stats["query_time"], rss_mb()))
+
+    def report(self):
+        steps = {}
+        for name, samples in self.samples.items():
+            steps[name] = {
+                "wall_ms": round(statistics.median(s[0] for s in samples) * 1000, 3),
+                "queries": int(statistics.median(s[1] for s in samples)),
+                "query_ms": round(statistics.median(s[2] for s in samples) * 1000, 3),
+                "rss_mb": max((s[3] for s in samples if s[3] is not None), default=None),
+                "runs": len(samples),
+            }
+        return steps
+
+
+def _patch_dialogs():
+    """Answer every message box and file dialog without showing it"""
+    from PyQt5 import QtWidgets
+
+    box = QtWidgets.QMessageBox
+    for name in ("information", "warning", "critical"):
+        setattr(box, name, staticmethod(lambda *args, **kwargs: box.Ok))
+    box.question = staticmethod(lambda *args, **kwargs: box.Yes)
+
+
+def _select_first(table):
+    table.setCurrentIndex(table.model().index(0, 0))
+
+
+def run_suite(db_path, repeat=3):
+    os.environ["FIRM_DB_PATH"] = db_path
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+
+    from PyQt5 import QtCore, QtWidgets
+
+    global _qt_app
+    _qt_app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+    _patch_dialogs()
+
+    from modules import analytics, db_connection, lookups, payroll
+
+    # db_connection may already be imported (datagen uses it), so point it at the copy explicitly
+    db_connection.configure(db_path)
+    import main
+
+    bench = Bench(repeat)
+    start = time.perf_counter()
+    db_connection.connection()  # migrations and statistics refresh, outside the timings
+    cold_open = time.perf_counter() - start
+
+    def login():
+        window = main.LoginApp()
+        window.ui.username_input.setText("admin")
+        window.ui.password_input.setText("123")
+        window.handle_login()
+        return window.dashboard
+
+    dashboards = []
+    bench.measure("login", lambda: dashboards.append(login()) or dashboards[-1])
+    d = dashboards[-1]
+    for old in dashboards[:-1]:
+        old.close()
+    ui, ex = d.ui, d.executor
+
+    class Settled:
+        """Idle once the executor is and no change event waits in the dashboard's debounce"""
+
+        def wait_for_idle(self, timeout_ms=30000):
+            idle = ex.wait_for_idle(timeout_ms)
+            while d.changes.pending():
+                d.changes.flush()
+                idle = ex.wait_for_idle(timeout_ms)
+            return idle
+
+    step = lambda name, fn, setup=None: bench.measure(name, fn, Settled(), setup)
+
+    # ---- loads ----
+    for name in ("load_overview", "load_clients", "load_projects", "load_payments", "load_machines",
+                 "load_employees", "load_salary_table"):
+        step(name, getattr(d, name))
+    # dropdowns are timed with an empty lookup cache, i.e. after a write to their table
+    for name in ("populate_client_dropdown", "populate_project_dropdown", "load_salary_employees"):
+        step(name, getattr(d, name), lookups.clear)
+
+    def first_visit(page):
+        def setup():
+            ui.main_tabs.setCurrentWidget(ui.Overview)
+            d.stale_tabs.add(page)
+        return lambda: ui.main_tabs.setCurrentWidget(page), setup
+
+    for page in (ui.Payments, ui.Ledger, ui.Reports, ui.tab):
+        title = ui.main_tabs.tabText(ui.main_tabs.indexOf(page)).strip().lower()
+        step(f"open_{title}_tab", *first_visit(page))
+
+    def scroll(model, pages=10):
+        def run():
+            for _ in range(pages):
+                model.fetchMore()
+                ex.wait_for_idle()
+        return run
+
+    step("scroll_payments_10_pages", scroll(d.payments_model), d.payments_model.reload)
+    step("scroll_salaries_10_pages", scroll(d.salary_model), d.salary_model.reload)
+    step("sort_payments_by_amount", lambda: d.payments_model.sort(2, QtCore.Qt.DescendingOrder),
+         lambda: d.payments_model.sort(0, QtCore.Qt.AscendingOrder))
+    step("sort_ledger_by_outstanding", lambda: d.ledger_model.sort(5, QtCore.Qt.DescendingOrder),
+         lambda: d.ledger_model.sort(0, QtCore.Qt.AscendingOrder))
+    step("filter_clients_by_name", lambda: d.clients_model.set_filters({1: "khan"}),
+         lambda: d.clients_model.set_filters({}))
+    d.payments_model.sort(0, QtCore.Qt.AscendingOrder)
+    d.ledger_model.sort(0, QtCore.Qt.AscendingOrder)
+    d.clients_model.set_filters({})
+    ex.wait_for_idle()
+
+    def search(text):
+        def run():
+            d.search_bar.setText(text)
+            d.search_bar._search()
+        return run
+
+    step("search_prefix", search("kha"))
+
+    # ---- adds, updates, deletes ----
+    def fill_and(fn, **fields):
+        def run():
+            for widget, value in fields.items():
+                target = getattr(ui, widget)
+                if isinstance(target, QtWidgets.QComboBox):
+                    target.setCurrentIndex(max(0, target.findText(value)))
+                elif isinstance(target, QtWidgets.QAbstractSpinBox) and hasattr(target, "setValue"):
+                    target.setValue(value)
+                else:
+                    target.setText(value)
+            fn()
+        return run
+
+    step("add_client", fill_and(d.add_client, client_name_input="Bench Client",
+                                client_contact_input="0300", client_address_input="Quetta"))
+    step("delete_client", lambda: (_select_first(ui.clients_table), d.delete_client()))
+    step("add_project", fill_and(d.add_project, project_name_input="Bench Project", project_value_input="1000"))
+    step("delete_project", lambda: (_select_first(ui.projects_table), d.delete_project()))
+    step("add_payment", fill_and(d.add_payment, payment_amount_input="500"))
+    step("delete_payment", lambda: (_select_first(ui.payments_table), d.delete_payment()))
+    step("add_machine", fill_and(d.add_machine, machine_name_input="Bench Drill", machine_type_input="Electric"))
+    step("delete_machine", lambda: (_select_first(ui.machines_table), d.delete_machine()))
+    step("add_employee", fill_and(d.add_employee, employee_name_input="Bench Worker",
+                                  employee_salary_input="30000"))
+
+    def update_employee():
+        _select_first(ui.employees_table)
+        d.on_employee_table_click()
+        d.executor.wait_for_idle()  # the form loads the row and its version
+        ui.employee_name_input.setText("Bench Renamed")
+        d.update_employee()
+
+    step("update_employee", update_employee)
+    step("delete_employee", lambda: (_select_first(ui.employees_table), d.delete_employee()))
+    step("add_salary_record", fill_and(d.add_salary_record, salary_amount_input="30000"))
+    step("delete_salary_record", lambda: (_select_first(ui.salary_table), d.delete_salary_record()))
+    step("run_payroll", d.run_payroll)
+    # untimed check: a period outside the current year is paid once, however often it is run
+    next_year = datetime.date.today().year + 1
+    if not payroll.run("July", next_year) or payroll.run("July", next_year):
+        raise RuntimeError(f"payroll for July {next_year} was not paid exactly once")
+
+    # ---- analytics ----
+    step("analytics_incremental", analytics.compute)
+    step("analytics_full_read", analytics.compute, analytics.reset)
+
+    d.close()
+    return cold_open, bench.report()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Time the dashboard headless")
+    parser.add_argument("--scale", default="1k", help=f"one of {', '.join(datagen.SCALES)}")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per step; the median is reported")
+    parser.add_argument("--out", help="JSON report (default: benchmarks/results/<scale>-<time>.json)")
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir(),
+                        help="where generated databases are kept between runs")
+    parser.add_argument("--regenerate", action="store_true", help="rebuild the cached database")
+    args = parser.parse_args()
+
+    dataset = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.db")
+    if args.regenerate or not os.path.exists(dataset):
+        datagen.generate(dataset, args.scale, args.seed, log=print)
+    work = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.work.db")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(dataset, work)
+
+    cold_open, steps = run_suite(work, args.repeat)
+
+    from PyQt5.QtCore import QT_VERSION_STR
+
+    report = {
+        "meta": {
+            "scale": args.scale,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "qt": QT_VERSION_STR,
+            "platform": platform.platform(),
+        },
+        "cold_open_ms": round(cold_open * 1000, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "steps": steps,
+    }
+    out = args.out or os.path.join(APP_DIR, "benchmarks", "results",
+                                   f"{args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    width = max(len(name) for name in steps)
+    for name, s in steps.items():
+        print(f"{name:<{width}}  {s['wall_ms']:>10.2f} ms  {s['queries']:>5} queries")
+    print(f"peak RSS {report['peak_rss_mb']} MB; report written to {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import datagen
+
+# ---- API SERVER LOAD TEST ----
+# Starts modules/server.py in its own process on a copy of a generated
+# database, then runs many concurrent keep-alive clients against it for a
+# fixed time: list pages, overview counters, single rows and writes, mixed
+# as an office of desktops would. Reports throughput, latency percentiles
+# per kind of request and errors, and checks the counters afterwards.
+#
+#     python -m benchmarks.server_load --scale 100k --clients 300 --seconds 20
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LISTS = ("clients", "projects", "payments", "ledger", "machines", "employees", "salaries")
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection speaking JSON"""
+
+    def __init__(self, host, port, token=None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, port, readers=None):
+    command = [sys.executable, "-m", "modules.server", "--db", db_path, "--port", str(port)]
+    if readers:
+        command += ["--readers", str(readers)]
+    server = subprocess.Popen(command, cwd=APP_DIR)
+    deadline = time.monotonic() + 60  # migrations may run first
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit("the server exited while starting")
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit("the server did not start listening")
+
+
+async def _client(port, token, until, rng, ids, samples, errors):
+    conn = Connection("127.0.0.1", port, token)
+    try:
+        while time.monotonic() < until:
+            roll = rng.random()
+            if roll < 0.55:
+                kind, method, payload = "list", "GET", None
+                path = f"/api/{rng.choice(LISTS)}?sort={rng.randrange(3)}&desc={rng.randrange(2)}&limit=100"
+            elif roll < 0.75:
+                kind, method, path, payload = "overview", "GET", "/api/overview", None
+            elif roll < 0.9:
+                kind, method, path, payload = "get", "GET", f"/api/clients/{rng.randint(1, ids['clients'])}", None
+            elif roll < 0.97:
+                kind, method, path = "insert", "POST", "/api/payments"
+                payload = {"project_id": rng.randint(1, ids["projects"]), "amount": rng.randint(1, 500) * 1000,
+                           "date": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/2026"}
+            else:
+                kind, method = "update", "PATCH"
+                path = f"/api/clients/{rng.randint(1, ids['clients'])}"
+                payload = {"contact": f"03{rng.randrange(10**9):09d}"}
+            start = time.perf_counter()
+            try:
+                status, _reply = await conn.request(method, path, payload)
+            except (OSError, ValueError, asyncio.IncompleteReadError) as error:
+                errors.append(f"{kind}: {error!r}")
+                conn.close()
+                conn = Connection("127.0.0.1", port, token)
+                continue
+            samples.setdefault(kind, []).append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(f"{kind}: HTTP {status}")
+    finally:
+        conn.close()
+
+
+async def run_load(port, clients, seconds, seed):
+    login = Connection("127.0.0.1", port)
+    status, reply = await login.request("POST", "/api/login", {"username": "admin", "password": "123"})
+    if status != 200:
+        raise SystemExit(f"login failed: {reply}")
+    token = reply["token"]
+    login.token = token
+    ids = {}
+    for name in ("clients", "projects"):
+        _status, reply = await login.request("POST", "/api/sql", {"sql": f"SELECT MAX(id) FROM {name}"})
+        ids[name] = reply["rows"][0][0]
+    login.close()
+
+    samples, errors = {}, []
+    until = time.monotonic() + seconds
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(port, token, until, random.Random(seed + i), ids, samples, errors) for i in range(clients)
+    ))
+    return time.perf_counter() - start, samples, errors
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(elapsed, samples, errors):
+    kinds = {}
+    for kind, times in sorted(samples.items()):
+        times = sorted(times)
+        kinds[kind] = {
+            "requests": len(times),
+            "p50_ms": round(statistics.median(times) * 1000, 2),
+            "p95_ms": round(_percentile(times, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(times, 0.99) * 1000, 2),
+        }
+    total = sum(k["requests"] for k in kinds.values())
+    return {"requests": total, "per_second": round(total / elapsed, 1), "errors": len(errors), "kinds": kinds}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.server_load", description="Load-test the API server")
+    parser.add_argument("--scale", default="1k", help=f"one of {', '.join(datagen.SCALES)}")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--clients", type=int, default=200, help="concurrent keep-alive connections")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, help="server reader threads (default: the server's)")
+    parser.add_argument("--out", help="JSON report (default: benchmarks/results/server-<scale>-<time>.json)")
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir(),
+                        help="where generated databases are kept between runs")
+    args = parser.parse_args()
+
+    dataset = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.db")
+    if not os.path.exists(dataset):
+        datagen.generate(dataset, args.scale, args.seed, log=print)
+    work = os.path.join(args.cache_dir, f"firm-bench-{args.scale}-{args.seed}.server.db")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(dataset, work)
+
+    port = _free_port()
+    server = start_server(work, port, args.readers)
+    try:
+        elapsed, samples, errors = asyncio.run(run_load(port, args.clients, args.seconds, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+
+    from modules import db_connection, stats
+
+    db_connection.configure(work)
+    drift = stats.verify()
+    db_connection.close_all()
+
+    report = summarize(elapsed, samples, errors)
+    report["meta"] = {"scale": args.scale, "clients": args.clients, "seconds": args.seconds,
+                      "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    report["counter_drift"] = len(drift)
+    out = args.out or os.path.join(APP_DIR, "benchmarks", "results",
+                                   f"server-{args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for kind, k in report["kinds"].items():
+        print(f"{kind:<9} {k['requests']:>8} requests  p50 {k['p50_ms']:>8.2f} ms  "
+              f"p95 {k['p95_ms']:>8.2f} ms  p99 {k['p99_ms']:>8.2f} ms")
+    print(f"{report['requests']} requests from {args.clients} clients in {elapsed:.1f}s: "
+          f"{report['per_second']}/s, {report['errors']} errors, {len(drift)} counters drifted")
+    for error in sorted(set(errors))[:10]:
+        print(f"  {error}")
+    print(f"report written to {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,272 @@
+import argparse
+import datetime
+import os
+import sys
+import time
+
+# allow `python -m contractingFirmSystem.cli` from the repository folder as well as `python cli.py`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from modules import auth, db_connection, importer
+from modules.db_connection import RemoteError
+from modules.sources import SOURCES
+
+# ---- HEADLESS COMMAND LINE ----
+# The dashboard's reports, imports and maintenance without Qt: nothing here
+# imports PyQt5, and modules that are slow to import (the exporter, NumPy
+# analytics) are imported only by the commands that use them, so a nightly
+# job pays for the data layer and nothing else.
+#
+#     python cli.py --user admin overview
+#     FIRM_PASSWORD=... python cli.py --user admin payroll July --yes
+#
+# The password is read from FIRM_PASSWORD, or asked for when unset.
+
+
+def _money(value):
+    return f"Rs {value:,.2f}"
+
+
+# ---- COMMANDS ----
+def overview(args):
+    from modules import stats
+
+    counts = stats.read_overview()  # trigger-kept counters: constant time at any size
+    print(f"Clients:           {counts['clients']}")
+    print(f"Projects:          {counts['projects']} ({counts['ongoing_projects']} ongoing)")
+    print(f"Payments received: {_money(counts['payments_total'])}")
+
+
+def balances(args):
+    from modules import reports, stats
+
+    rows = reports.project_balances(args.client, args.unpaid, args.limit)
+    print(f"{'Id':>8}  {'Client':<24}{'Project':<32}{'Value':>18}{'Received':>18}{'Outstanding':>18}")
+    for b in rows:
+        print(f"{b.project_id:>8}  {(b.client or '')[:23]:<24}{(b.project or '')[:31]:<32}"
+              f"{b.value:>18,.2f}{b.received:>18,.2f}{b.outstanding:>18,.2f}")
+    if args.client is None:
+        totals = stats.ledger_totals()
+        print(f"{totals['projects']} projects: value {_money(totals['value'])}, "
+              f"received {_money(totals['received'])}, outstanding {_money(totals['outstanding'])}")
+
+
+def cash_flow(args):
+    from modules import reports
+
+    print(reports.describe(reports.cash_flow(args.first_year, args.last_year, args.client)))
+
+
+def forecast(args):
+    from modules import analytics
+
+    print(analytics.describe(analytics.compute(args.months, args.top)))
+
+
+def run_payroll(args):
+    from modules import payroll
+
+    month = args.month.capitalize()
+    try:
+        plan = payroll.preview(month, args.year, args.date_paid)
+    except ValueError as error:  # a --date-paid outside the year
+        raise SystemExit(str(error))
+    print(payroll.describe(plan))
+    print(f"Records dated {plan.date_paid}")
+    if not plan.to_pay:
+        return 0
+    if not args.yes and not (sys.stdin.isatty() and input("Run payroll? [y/N] ").strip().lower() == "y"):
+        print("Not run; pass --yes to run without asking")
+        return 0
+    start = time.perf_counter()
+    inserted = payroll.run(month, args.year, plan.date_paid)  # the date shown above
+    print(f"{inserted} salary records added in {time.perf_counter() - start:.2f}s")
+
+
+def import_csv(args):
+    result = importer.import_csv(
+        args.csv_file, args.entity, args.batch,
+        progress=lambda n: print(f"\r{n} rows read", end="", file=sys.stderr),
+    )
+    print(file=sys.stderr)
+    print(importer.format_report(result))
+    return 1 if result.rejected else 0
+
+
+def export(args):
+    from modules import exporter  # its XLSX writer pulls in xml and urllib
+
+    start = time.perf_counter()
+    written = exporter.export_view(
+        args.output, SOURCES[args.what], title=args.what.capitalize(),
+        progress=lambda n: print(f"\r{n} rows", end="", file=sys.stderr),
+    )
+    print(file=sys.stderr)
+    print(f"{written} rows written to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+def maintain(args):
+    """Database upkeep; returns 1 when a check finds problems"""
+    from modules import migrations, search, stats
+
+    if db_connection.remote():
+        raise SystemExit("database maintenance runs on the machine that holds the file, without FIRM_SERVER")
+    conn = db_connection.connection()  # opening it brings the schema up to date
+    start = time.perf_counter()
+    if args.task == "migrate":
+        print(f"schema version {migrations.current_version(conn)}")
+    elif args.task == "verify":
+        problems = stats.verify()
+        for name, stored_value, actual_value in problems:
+            print(f"{name}: stored {stored_value}, actual {actual_value}")
+        print("Counters match the base tables" if not problems else f"{len(problems)} counter(s) drifted")
+        return 1 if problems else 0
+    elif args.task == "rebuild":
+        stats.rebuild()
+        stats.rebuild_project_totals()
+        stats.rebuild_cash_flow()
+        search.rebuild()
+        print("Overview counters, project totals, cash-flow rollups and search indexes rebuilt")
+    elif args.task == "check":
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check") if row[0] != "ok"]
+        print("\n".join(problems) or "Integrity check passed")
+        return 1 if problems else 0
+    elif args.task == "optimize":
+        conn.execute("PRAGMA optimize")
+        print("Query planner statistics refreshed")
+    elif args.task == "vacuum":
+        conn.execute("VACUUM")
+        print("Database file compacted")
+    elif args.task == "backup":
+        if not args.path:
+            raise SystemExit("backup needs a destination file")
+        import sqlite3
+
+        target = sqlite3.connect(args.path)
+        conn.backup(target)  # a consistent copy even while the dashboard writes
+        target.close()
+        print(f"Backed up to {args.path}")
+    print(f"done in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def sync(args):
+    """Exchange changes with other sites; returns 1 when rows were rejected"""
+    from modules import sync
+
+    if db_connection.remote():
+        raise SystemExit("sync runs on the machine that holds the file, without FIRM_SERVER")
+    try:
+        if args.action == "status":
+            site_id, name = sync.site()
+            print(f"This site: {name} ({site_id})")
+            for peer in sync.peers():
+                print(f"  {peer.name or peer.site[:8]:<24} {peer.pending:>8} changes not yet confirmed")
+        elif args.action == "clone":
+            site_id = sync.clone(args.path, args.name)
+            print(f"Copied to {args.path} as site '{args.name}' ({site_id})")
+        elif args.action == "export":
+            rows, deletes, seconds = sync.export_changes(args.path, args.site)
+            print(f"{rows} rows and {deletes} deletes written to {args.path} in {seconds:.2f}s")
+        elif args.action == "import":
+            report = sync.import_changes(
+                args.path, progress=lambda n: print(f"\r{n} rows read", end="", file=sys.stderr),
+            )
+            print(file=sys.stderr)
+            print(sync.format_report(report))
+            return 1 if report.rejected else 0
+        elif args.action == "prune":
+            print(f"{sync.prune()} confirmed log entries removed")
+    except ValueError as error:
+        raise SystemExit(str(error))
+
+
+# ---- ARGUMENTS ----
+def build_parser():
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(prog="python cli.py", description="Contracting firm data without the dashboard")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    parser.add_argument("--user", default=os.environ.get("FIRM_USER"), help="login name (default: $FIRM_USER)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("overview", help="counts and totals from the Overview tab")
+    command.set_defaults(run=overview)
+
+    command = commands.add_parser("balances", help="value, received and outstanding per project")
+    command.add_argument("--client", type=int, help="only this client's projects")
+    command.add_argument("--unpaid", action="store_true", help="only projects with a balance outstanding")
+    command.add_argument("--limit", type=int, default=20, help="largest balances shown (default: 20)")
+    command.set_defaults(run=balances)
+
+    command = commands.add_parser("cash-flow", help="monthly income, payroll and net")
+    command.add_argument("--from", dest="first_year", type=int, help="first year (default: earliest with data)")
+    command.add_argument("--to", dest="last_year", type=int, help="last year (default: latest with data)")
+    command.add_argument("--client", type=int, help="one client's income by month")
+    command.set_defaults(run=cash_flow)
+
+    command = commands.add_parser("forecast", help="receivables aging and cash forecast")
+    command.add_argument("--months", type=int, default=6, help="months to forecast")
+    command.add_argument("--top", type=int, default=10, help="clients listed by receivables")
+    command.set_defaults(run=forecast)
+
+    command = commands.add_parser("payroll", help="preview or run a month's payroll")
+    command.add_argument("month", help="month name, e.g. July")
+    command.add_argument("year", type=int, nargs="?", default=today.year)
+    command.add_argument("--date-paid",
+                         help="date written on the records, in YEAR (default: today, or the 1st of MONTH in another year)")
+    command.add_argument("--yes", action="store_true", help="run without asking")
+    command.set_defaults(run=run_payroll)
+
+    command = commands.add_parser("import", help="import a CSV file")
+    command.add_argument("entity", choices=sorted(importer.SPECS))
+    command.add_argument("csv_file")
+    command.add_argument("--batch", type=int, default=20000, help="rows per transaction")
+    command.set_defaults(run=import_csv, profile="bulk")
+
+    command = commands.add_parser("export", help="export a table to CSV or XLSX")
+    command.add_argument("what", choices=sorted(SOURCES))
+    command.add_argument("output", help="output file, .csv or .xlsx")
+    command.set_defaults(run=export)
+
+    command = commands.add_parser("db", help="database maintenance")
+    command.add_argument("task", choices=("migrate", "verify", "rebuild", "check", "optimize", "vacuum", "backup"))
+    command.add_argument("path", nargs="?", help="destination file for backup")
+    command.set_defaults(run=maintain)
+
+    command = commands.add_parser("sync", help="exchange changes with other sites' copies of the database")
+    actions = command.add_subparsers(dest="action", required=True)
+    actions.add_parser("status", help="this site and how far each other site is behind")
+    action = actions.add_parser("clone", help="copy this database as a new site (instead of copying firm.db)")
+    action.add_argument("path", help="the new site's database file")
+    action.add_argument("--name", required=True, help="the new site's name, e.g. \"Laptop 1\"")
+    action = actions.add_parser("export", help="write the changes another site has not confirmed yet")
+    action.add_argument("site", help="the other site's name or id")
+    action.add_argument("path", help="sync file to write")
+    action = actions.add_parser("import", help="apply a sync file another site wrote for this one")
+    action.add_argument("path", help="sync file to read")
+    actions.add_parser("prune", help="drop logged changes every site has confirmed")
+    command.set_defaults(run=sync)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db_connection.configure(args.db, profile=getattr(args, "profile", "default"))
+    try:
+        if not args.user:
+            raise SystemExit("a login is required: pass --user or set FIRM_USER")
+        password = os.environ.get("FIRM_PASSWORD")
+        if password is None:
+            import getpass
+
+            password = getpass.getpass(f"Password for {args.user}: ")
+        if auth.authenticate(args.user, password) is None:
+            raise SystemExit("Invalid username or password")
+        return args.run(args) or 0
+    except RemoteError as error:
+        raise SystemExit(f"Server: {error}")
+    finally:
+        db_connection.close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
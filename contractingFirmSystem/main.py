@@ -1,20 +1,206 @@
 import sys
-import sqlite3
-from PyQt5 import QtWidgets
+import time
+STARTED = time.perf_counter()
+
+from PyQt5 import QtCore, QtWidgets
+from modules import (
+    analytics, db_connection, exporter, importer, payroll, reports, repositories, startup, stats, tracing,
+)
+from modules.auth import authenticate
+from modules.event_bridge import ChangeBridge
+from modules.lookup_combo import LookupCombo
+from modules.query_executor import QueryExecutor
+from modules.db_connection import RemoteError
+from modules.search_bar import SearchBar
+from modules.sources import (
+    CLIENTS_SOURCE, EMPLOYEES_SOURCE, LEDGER_SOURCE, MACHINES_SOURCE, PAYMENTS_SOURCE, PROJECTS_SOURCE,
+    SALARY_SOURCE,
+)
+from modules.table_model import SqlTableModel, add_filter_row
 from ui.login_ui import Ui_MainWindow
 from ui.dashboard_ui import Ui_DashboardWindow
 
 # ---- DASHBOARD WINDOW ----
+EXTERNAL_POLL_MS = 2000  # how often to check for writes by other processes
+
+
+def fill_table(table, headers, rows):
+    """Show rows in a QTableWidget; amounts are formatted, None is left blank"""
+    table.clear()
+    table.setColumnCount(len(headers))
+    table.setHorizontalHeaderLabels(headers)
+    table.setRowCount(len(rows))
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            text = "" if value is None else f"{value:,.0f}" if isinstance(value, float) else str(value)
+            item = QtWidgets.QTableWidgetItem(text)
+            if isinstance(value, float):
+                item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+            table.setItem(r, c, item)
+
+
+AGING_HEADERS = ("Client", "Outstanding") + analytics.AGING_BUCKETS + ("Days to pay",)
+FORECAST_HEADERS = ("Month", "Income", "Payroll", "Cash position")
+
+
+def aging_rows(result):
+    return [(c.name, c.outstanding) + c.buckets + (c.days_to_pay,) for c in result.clients]
+
+
+def forecast_rows(result):
+    return [(reports.month_label(f.month), f.income, f.payroll, f.position) for f in result.forecast]
+
+
+def export_overview(path, progress=None, cancelled=None, title="Export"):
+    """What the Overview tab shows: its counters and figures, then the aging and forecast tables below them"""
+    counts = stats.read_overview()
+    result = analytics.compute()
+    rows = [
+        ("Total clients", counts["clients"]),
+        ("Total projects", counts["projects"]),
+        ("Ongoing projects", counts["ongoing_projects"]),
+        ("Total payments", counts["payments_total"]),
+        ("Outstanding", result.outstanding),
+        ("Average days to pay", result.days_to_pay),
+        ("Payroll run-rate a month", result.payroll_run_rate),
+        ("Cash position", result.position),
+        (),
+        AGING_HEADERS,
+        *aging_rows(result),
+        (),
+        FORECAST_HEADERS,
+        *forecast_rows(result),
+    ]
+    return exporter.export_rows(path, ("Metric", "Value"), rows, progress, cancelled, title)
+
+
+def export_cash_flow(path, first_year, last_year, client_id, progress=None, cancelled=None, title="Export"):
+    """The months the Reports tab charts, as rows for exporter.export_rows"""
+    report = reports.cash_flow(first_year, last_year, client_id)
+    return exporter.export_rows(
+        path, ("Month", "Income", "Payroll", "Net"),
+        [(reports.month_label(m.month), m.income, m.payroll, m.net) for m in report.months],
+        progress, cancelled, title,
+    )
+
+# ------------------ Modern Dark Theme ------------------
+DASHBOARD_STYLESHEET = """
+    /* Main Window and central widget */
+    QMainWindow, QWidget {
+        background-color: #121212;
+        color: #e0e0e0;
+        font-family: "Segoe UI", Arial, sans-serif;
+        font-size: 12pt;
+    }
+
+    /* Buttons */
+    QPushButton {
+        background-color: #2c2c2c;
+        color: #e0e0e0;
+        border: 1px solid #3a3a3a;
+        border-radius: 6px;
+        padding: 8px;
+    }
+    QPushButton:hover {
+        background-color: #3a3a3a;
+    }
+    QPushButton:pressed {
+        background-color: #505050;
+    }
+
+    /* Labels */
+    QLabel {
+        color: #e0e0e0;
+    }
+
+    /* LineEdits, TextEdits, PlainTextEdits */
+    QLineEdit, QTextEdit, QPlainTextEdit {
+        background-color: #1e1e1e;
+        color: #e0e0e0;
+        border: 1px solid #3a3a3a;
+        border-radius: 4px;
+        padding: 4px;
+    }
+
+    /* ComboBoxes */
+    QComboBox {
+        background-color: #1e1e1e;
+        color: #e0e0e0;
+        border: 1px solid #3a3a3a;
+        border-radius: 4px;
+        padding: 4px;
+    }
+    QComboBox QAbstractItemView {
+        background-color: #1e1e1e;
+        color: #e0e0e0;
+        selection-background-color: #3a3a3a;
+    }
+
+    /* Tables */
+    QTableWidget, QTableView {
+        background-color: #1e1e1e;
+        color: #e0e0e0;
+        gridline-color: #3a3a3a;
+        border: 1px solid #3a3a3a;
+    }
+    QHeaderView::section {
+        background-color: #2c2c2c;
+        color: #e0e0e0;
+        padding: 4px;
+        border: 1px solid #3a3a3a;
+    }
+
+    /* TabWidget */
+    QTabWidget::pane {
+        border: 1px solid #3a3a3a;
+        margin: 10px;
+    }
+    QTabBar::tab {
+        background: #2c2c2c;
+        color: #e0e0e0;
+        padding: 8px 15px;
+        border-top-left-radius: 6px;
+        border-top-right-radius: 6px;
+    }
+    QTabBar::tab:selected {
+        background: #3a3a3a;
+        font-weight: bold;
+    }
+
+    /* ScrollBars */
+    QScrollBar:vertical, QScrollBar:horizontal {
+        background: #1e1e1e;
+        width: 12px;
+        height: 12px;
+        margin: 0px;
+    }
+    QScrollBar::handle {
+        background: #3a3a3a;
+        border-radius: 6px;
+    }
+    QScrollBar::handle:hover {
+        background: #505050;
+    }
+    QScrollBar::add-line, QScrollBar::sub-line {
+        background: none;
+    }
+"""
+
+
 class DashboardApp(QtWidgets.QMainWindow):
-    def __init__(self, username):
+    # status bar text from long jobs on worker threads (delivered queued)
+    task_progress = QtCore.pyqtSignal(str)
+
+    def __init__(self, username=None):
         super(DashboardApp, self).__init__()
+        # styled before the widgets exist, so each is polished once instead
+        # of being restyled when a sheet is set on the finished window
+        self.setStyleSheet(DASHBOARD_STYLESHEET)
         self.ui = Ui_DashboardWindow()
         self.ui.setupUi(self)
-        
-        # 1. Make window full screen
-        self.showMaximized()
+        startup.mark("dashboard widgets")
 
-        # 2. Apply spacing and margins to all tabs
+        # Apply spacing and margins to all tabs
         tab_widget = self.ui.main_tabs
         for i in range(tab_widget.count()):
             page = tab_widget.widget(i)
@@ -25,250 +211,334 @@ class DashboardApp(QtWidgets.QMainWindow):
             layout.setSpacing(15)                  
             layout.setContentsMargins(20, 20, 20, 20)
 
-        # 3. Fix all buttons inside central widget
-        for button in self.ui.centralwidget.findChildren(QtWidgets.QPushButton):
-            button.setSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed)
-            button.setMaximumWidth(120)
-
-        # 4. Make all tables expand properly (only horizontal stretch)
-        for table in self.ui.centralwidget.findChildren(QtWidgets.QTableWidget):
-            table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)  # stretch columns
-            table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)  # keep rows natural
-
-        # Increase font size for buttons
-        for button in self.ui.centralwidget.findChildren(QtWidgets.QPushButton):
-            font = button.font()
-            font.setPointSize(12)  
-            button.setFont(font)
-            button.setMinimumHeight(35)  
-
-        # Increase font size for labels
-        for label in self.ui.centralwidget.findChildren(QtWidgets.QLabel):
-            font = label.font()
-            font.setPointSize(12)
-            label.setFont(font)
-
-        # Increase font size for LineEdits and TextEdits
-        for edit in self.ui.centralwidget.findChildren((QtWidgets.QLineEdit, QtWidgets.QTextEdit, QtWidgets.QPlainTextEdit)):
-            font = edit.font()
-            font.setPointSize(12)
-            edit.setFont(font)
-            edit.setMinimumHeight(30) 
-
-        # Increase font size for ComboBoxes
-        for combo in self.ui.centralwidget.findChildren(QtWidgets.QComboBox):
-            font = combo.font()
-            font.setPointSize(12)
-            combo.setFont(font)
-            combo.setMinimumHeight(30)  
-
-        # ------------------ Modern Dark Theme ------------------
-        dark_stylesheet = """
-        /* Main Window and central widget */
-        QMainWindow, QWidget {
-            background-color: #121212;
-            color: #e0e0e0;
-            font-family: "Segoe UI", Arial, sans-serif;
-            font-size: 12pt;
-        }
-
-        /* Buttons */
-        QPushButton {
-            background-color: #2c2c2c;
-            color: #e0e0e0;
-            border: 1px solid #3a3a3a;
-            border-radius: 6px;
-            padding: 8px;
-        }
-        QPushButton:hover {
-            background-color: #3a3a3a;
-        }
-        QPushButton:pressed {
-            background-color: #505050;
-        }
-
-        /* Labels */
-        QLabel {
-            color: #e0e0e0;
-        }
-
-        /* LineEdits, TextEdits, PlainTextEdits */
-        QLineEdit, QTextEdit, QPlainTextEdit {
-            background-color: #1e1e1e;
-            color: #e0e0e0;
-            border: 1px solid #3a3a3a;
-            border-radius: 4px;
-            padding: 4px;
-        }
-
-        /* ComboBoxes */
-        QComboBox {
-            background-color: #1e1e1e;
-            color: #e0e0e0;
-            border: 1px solid #3a3a3a;
-            border-radius: 4px;
-            padding: 4px;
-        }
-        QComboBox QAbstractItemView {
-            background-color: #1e1e1e;
-            color: #e0e0e0;
-            selection-background-color: #3a3a3a;
-        }
-
-        /* Tables */
-        QTableWidget, QTableView {
-            background-color: #1e1e1e;
-            color: #e0e0e0;
-            gridline-color: #3a3a3a;
-            border: 1px solid #3a3a3a;
-        }
-        QHeaderView::section {
-            background-color: #2c2c2c;
-            color: #e0e0e0;
-            padding: 4px;
-            border: 1px solid #3a3a3a;
-        }
-
-        /* TabWidget */
-        QTabWidget::pane {
-            border: 1px solid #3a3a3a;
-            margin: 10px;
-        }
-        QTabBar::tab {
-            background: #2c2c2c;
-            color: #e0e0e0;
-            padding: 8px 15px;
-            border-top-left-radius: 6px;
-            border-top-right-radius: 6px;
-        }
-        QTabBar::tab:selected {
-            background: #3a3a3a;
-            font-weight: bold;
-        }
-
-        /* ScrollBars */
-        QScrollBar:vertical, QScrollBar:horizontal {
-            background: #1e1e1e;
-            width: 12px;
-            height: 12px;
-            margin: 0px;
-        }
-        QScrollBar::handle {
-            background: #3a3a3a;
-            border-radius: 6px;
-        }
-        QScrollBar::handle:hover {
-            background: #505050;
-        }
-        QScrollBar::add-line, QScrollBar::sub-line {
-            background: none;
-        }
-        """
-
-        self.setStyleSheet(dark_stylesheet)
+        # Size buttons, inputs and tables in one walk over the widgets; fonts
+        # (12pt everywhere) come from the stylesheet
+        for widget in self.ui.centralwidget.findChildren(QtWidgets.QWidget):
+            if isinstance(widget, QtWidgets.QPushButton):
+                widget.setSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed)
+                widget.setMaximumWidth(120)
+                widget.setMinimumHeight(35)
+            elif isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QTextEdit, QtWidgets.QPlainTextEdit,
+                                     QtWidgets.QComboBox)):
+                widget.setMinimumHeight(30)
+            elif isinstance(widget, QtWidgets.QTableView):
+                widget.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)  # stretch columns
+                # fixed row height: ResizeToContents would measure every row and defeat lazy fetching
+                widget.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+                widget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        startup.mark("dashboard styling")
+
+        self.username = None
+        if username:
+            self.bind_user(username)
 
+        self.ui.logout_button.clicked.connect(self.logout)
 
-        self.showMaximized()  
-        self.username = username
-        self.setWindowTitle(f"Dashboard - Logged in as {self.username}")
-
-        self.ui.label.setText(f"Welcome, {self.username} ")
+        # database work runs on worker threads; the status bar shows when it is busy
+        self.executor = QueryExecutor(parent=self)
+        self.busy_indicator = QtWidgets.QProgressBar()
+        self.busy_indicator.setRange(0, 0)  # indeterminate
+        self.busy_indicator.setMaximumWidth(160)
+        self.busy_indicator.setVisible(False)
+        self.ui.statusbar.addPermanentWidget(self.busy_indicator)
+        self.executor.busy_changed.connect(self.busy_indicator.setVisible)
+
+        # list tabs are backed by lazily fetched SQL models
+        self.clients_model = SqlTableModel(CLIENTS_SOURCE, executor=self.executor, parent=self)
+        self.ui.clients_table.setModel(self.clients_model)
+        self.projects_model = SqlTableModel(PROJECTS_SOURCE, executor=self.executor, parent=self)
+        self.ui.projects_table.setModel(self.projects_model)
+        self.payments_model = SqlTableModel(PAYMENTS_SOURCE, executor=self.executor, parent=self)
+        self.ui.payments_table.setModel(self.payments_model)
+        self.ledger_model = SqlTableModel(LEDGER_SOURCE, executor=self.executor, parent=self)
+        self.ui.ledger_table.setModel(self.ledger_model)
+        self.machines_model = SqlTableModel(MACHINES_SOURCE, executor=self.executor, parent=self)
+        self.ui.machines_table.setModel(self.machines_model)
+        self.employees_model = SqlTableModel(EMPLOYEES_SOURCE, executor=self.executor, parent=self)
+        self.ui.employees_table.setModel(self.employees_model)
+        self.salary_model = SqlTableModel(SALARY_SOURCE, executor=self.executor, parent=self)
+        self.ui.salary_table.setModel(self.salary_model)
+        self.ui.salary_table.horizontalHeader().setStretchLastSection(True)
 
-        self.ui.logout_button.clicked.connect(self.logout)
+        # header clicks sort and the filter boxes narrow rows, both in SQL
+        self.filter_rows = {}
+        for table in (self.ui.clients_table, self.ui.projects_table, self.ui.payments_table, self.ui.ledger_table,
+                      self.ui.machines_table, self.ui.employees_table, self.ui.salary_table):
+            model = table.model()
+            order = QtCore.Qt.DescendingOrder if model.state.descending else QtCore.Qt.AscendingOrder
+            table.horizontalHeader().setSortIndicator(0, order)
+            table.setSortingEnabled(True)
+            self.filter_rows[table] = add_filter_row(table, model)
+
+        # dropdowns share the cached id -> name lookups and match typed text anywhere in a name
+        self.client_combo = LookupCombo(self.ui.project_client_dropdown, "clients", self.executor)
+        self.project_combo = LookupCombo(self.ui.payment_project_dropdown, "projects", self.executor)
+        self.salary_employee_combo = LookupCombo(
+            self.ui.salary_employee_dropdown, "active_employees", self.executor
+        )
+        self.report_client_combo = LookupCombo(self.ui.report_client_dropdown, "clients", self.executor)
+
+        # the Reports tab starts on the years that have data; any change redraws it
+        self.report_years_set = False
+        self.ui.report_by_client_check.toggled.connect(self.ui.report_client_dropdown.setEnabled)
+        for signal in (self.ui.report_from_year.valueChanged, self.ui.report_to_year.valueChanged,
+                       self.ui.report_by_client_check.toggled):
+            signal.connect(lambda *_: self.load_reports())
+        self.ui.report_client_dropdown.currentIndexChanged.connect(
+            lambda _: self.ui.report_by_client_check.isChecked() and self.load_reports()
+        )
+
+        # global search; choosing a result jumps to its row
+        self.search_bar = SearchBar(self.executor, self)
+        self.ui.gridLayout.addWidget(self.search_bar, 0, 1, 1, 1)
+        self.search_bar.activated.connect(self.jump_to)
+
+        file_menu = self.ui.menubar.addMenu("&File")
+        file_menu.addAction("Import CSV...", self.import_csv)
+        file_menu.addAction("Export Current Tab...", self.export_current_tab, "Ctrl+E")
+        self.task_progress.connect(lambda message: self.ui.statusbar.showMessage(message, 5000))
 
-        self.load_overview_data()
-        
         self.ui.add_client_button.clicked.connect(self.add_client)
         self.ui.delete_client_button.clicked.connect(self.delete_client)
-        self.load_clients()
         
-        self.populate_client_dropdown()
-        self.populate_project_dropdown()
-        self.load_projects()
         self.ui.add_project_button.clicked.connect(self.add_project)
         self.ui.delete_project_button.clicked.connect(self.delete_project)
 
-        self.populate_project_dropdown()
         self.ui.add_payment_button.clicked.connect(self.add_payment)
         self.ui.delete_payment_button.clicked.connect(self.delete_payment)
-        self.load_payments()
         
         self.ui.add_machine_button.clicked.connect(self.add_machine)
         self.ui.delete_machine_button.clicked.connect(self.delete_machine)
-        self.load_machines()
         
         self.ui.add_employee_btn.clicked.connect(self.add_employee)
         self.ui.update_employee_btn.clicked.connect(self.update_employee)
         self.ui.delete_employee_btn.clicked.connect(self.delete_employee)
-        self.ui.employees_table.itemClicked.connect(lambda _: self.on_employee_table_click())
-        self.load_employees()
+        # the form follows the current row however it was chosen (mouse, keyboard, search);
+        # a click on the current row reloads it
+        self.ui.employees_table.selectionModel().currentRowChanged.connect(
+            lambda *_: self.on_employee_table_click()
+        )
+        self.ui.employees_table.clicked.connect(lambda _: self.on_employee_table_click())
+        self.editing_employee = None  # (id, version) of the row loaded into the employee form
         
-        self.load_salary_employees()
-        self.load_salary_table()
         self.ui.add_salary_button.clicked.connect(self.add_salary_record)
+        self.ui.run_payroll_button.clicked.connect(self.run_payroll)
         self.ui.delete_salary_button.clicked.connect(self.delete_salary_record)
 
+        # each tab loads on its first visit; a tab whose data changed goes
+        # stale and reloads when next shown. Dropdowns refresh whenever their
+        # tab is shown, which costs nothing while their lookup is cached.
+        self.tab_loaders = {
+            self.ui.Overview: (self.load_overview,),
+            self.ui.Clients: (self.load_clients,),
+            self.ui.Projects: (self.load_projects,),
+            self.ui.Payments: (self.load_payments,),
+            self.ui.Ledger: (self.load_ledger,),
+            self.ui.Reports: (self.load_reports,),
+            self.ui.Machines: (self.load_machines,),
+            self.ui.Employees: (self.load_employees,),
+            self.ui.tab: (self.load_salary_table,),
+        }
+        self.tab_lookups = {
+            self.ui.Projects: self.client_combo,
+            self.ui.Payments: self.project_combo,
+            self.ui.tab: self.salary_employee_combo,
+            self.ui.Reports: self.report_client_combo,
+        }
+        self.stale_tabs = set(self.tab_loaders)
+        self.ui.main_tabs.currentChanged.connect(self.on_tab_changed)
+        self.on_tab_changed(self.ui.main_tabs.currentIndex())
+
+        # committed writes arrive as change events (modules/events.py), from this
+        # window, from background jobs, or, via PRAGMA data_version, from other processes
+        self.table_tabs = {
+            "clients": (self.ui.Clients, self.clients_model),
+            "projects": (self.ui.Projects, self.projects_model),
+            "payments": (self.ui.Payments, self.payments_model),
+            "machines": (self.ui.Machines, self.machines_model),
+            "employees": (self.ui.Employees, self.employees_model),
+            "employee_salaries": (self.ui.tab, self.salary_model),
+        }
+        # tabs listing names joined from another table; edits and deletes there change them
+        self.joined_tabs = {"clients": self.ui.Projects, "projects": self.ui.Payments, "employees": self.ui.tab}
+        # tabs summarising other tables; any write to those changes them
+        self.summary_tabs = {
+            self.ui.Overview: {"clients", "projects", "payments", "employee_salaries"},
+            self.ui.Ledger: {"clients", "projects", "payments"},
+            self.ui.Reports: {"projects", "payments", "employee_salaries"},
+        }
+        # connected to a server (FIRM_SERVER), its change feed already reports everyone's writes
+        watch_ms = None if db_connection.remote() else EXTERNAL_POLL_MS
+        self.changes = ChangeBridge(watch_ms=watch_ms, parent=self)
+        self.changes.changed.connect(self.on_data_changed)
+        startup.mark("dashboard setup")
+
+    def bind_user(self, username):
+        self.username = username
+        self.setWindowTitle(f"Dashboard - Logged in as {self.username}")
+        self.ui.label.setText(f"Welcome, {self.username} ")
+
 
     def logout(self):
         self.close()
         self.login_window = LoginApp()
         self.login_window.show()
 
-    def load_overview_data(self):
-        """Fetch total clients, projects, ongoing projects from database"""
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-
-        cur.execute("SELECT COUNT(*) FROM clients")
-        total_clients = cur.fetchone()[0]
-
-        cur.execute("SELECT COUNT(*) FROM projects")
-        total_projects = cur.fetchone()[0]
-
-        cur.execute("SELECT COUNT(*) FROM projects WHERE status='ongoing'")
-        ongoing_projects = cur.fetchone()[0]
-
-        conn.close()
+    def closeEvent(self, event):
+        # results arriving after the window is gone would touch deleted widgets
+        self.changes.close()
+        self.executor.cancel_all()
+        super(DashboardApp, self).closeEvent(event)
+
+    def show_db_error(self, error):
+        QtWidgets.QMessageBox.critical(self, "Database Error", str(error))
+
+    def on_tab_changed(self, index):
+        """Load a tab the first time it is shown, or again if it went stale"""
+        page = self.ui.main_tabs.widget(index)
+        if page in self.stale_tabs:
+            self.stale_tabs.discard(page)
+            for load in self.tab_loaders[page]:
+                load()
+        if page in self.tab_lookups:
+            self.tab_lookups[page].refresh()
+
+    def mark_stale(self, *pages):
+        """Data shown on these tabs changed: reload the visible one, the rest on their next visit"""
+        for page in pages:
+            self.stale_tabs.add(page)
+        self.on_tab_changed(self.ui.main_tabs.currentIndex())
+
+    def on_data_changed(self, changes):
+        """Bring every view up to date after a batch of committed changes"""
+        if any(change.table is None for change in changes):
+            self.mark_stale(*self.tab_loaders)  # another process wrote: anything may differ
+            return
+        by_table = {}
+        for change in changes:
+            by_table.setdefault(change.table, []).append(change)
+        stale = set()
+        for table, table_changes in by_table.items():
+            if table in self.table_tabs:
+                page, model = self.table_tabs[table]
+                # loaded lists re-read just the changed rows; bulk writes reload
+                if not model.apply_changes(table_changes):
+                    stale.add(page)
+            stale.update(page for page, tables in self.summary_tabs.items() if table in tables)
+            if table in self.joined_tabs and any(c.op != "insert" for c in table_changes):
+                stale.add(self.joined_tabs[table])
+        self.mark_stale(*stale)  # also refreshes the visible tab's dropdown
 
-        # update labels in UI
-        self.ui.clients_count_label.setText(str(total_clients))
-        self.ui.projects_count_label.setText(str(total_projects))
-        self.ui.payments_sum_label.setText(str(ongoing_projects))
-        
     def load_overview(self):
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-
-        cur.execute("SELECT COUNT(*) FROM clients")
-        clients_count = cur.fetchone()[0]
-        self.ui.clients_count_label.setText(str(clients_count))
+        def show(counts):
+            self.ui.clients_count_label.setText(str(counts["clients"]))
+            self.ui.projects_count_label.setText(str(counts["projects"]))
+            self.ui.payments_sum_label.setText(f"Rs {counts['payments_total']}")
+            startup.mark("overview data")
+
+        self.executor.submit(stats.read_overview, on_result=show, key="overview")
+        self.executor.submit(
+            analytics.compute, on_result=self.show_analytics, on_error=self.show_db_error, key="analytics"
+        )
+
+    def show_analytics(self, result):
+        """Receivables aging by client and the cash forecast, from modules/analytics.py"""
+        days = f"{result.days_to_pay:.0f} days" if result.days_to_pay is not None else "no dated payments"
+        self.ui.analytics_summary_label.setText(
+            f"Outstanding: Rs {result.outstanding:,.2f}    Average time to pay: {days}    "
+            f"Payroll run-rate: Rs {result.payroll_run_rate:,.2f} a month    "
+            f"Cash position: Rs {result.position:,.2f}"
+        )
+        fill_table(self.ui.aging_table, AGING_HEADERS, aging_rows(result))
+        fill_table(self.ui.forecast_table, FORECAST_HEADERS, forecast_rows(result))
+
+
+    def jump_to(self, entity, row_id):
+        """Show one search result: switch tab and select its row"""
+        page, table = {
+            "clients": (self.ui.Clients, self.ui.clients_table),
+            "projects": (self.ui.Projects, self.ui.projects_table),
+            "employees": (self.ui.Employees, self.ui.employees_table),
+            "machines": (self.ui.Machines, self.ui.machines_table),
+        }[entity]
+        self.ui.main_tabs.setCurrentWidget(page)
+        model = table.model()
+        row = model.row_of(row_id)
+        if row is not None:
+            table.selectRow(row)
+            table.scrollTo(model.index(row, 0))
+            return
 
-        cur.execute("SELECT COUNT(*) FROM projects")
-        projects_count = cur.fetchone()[0]
-        self.ui.projects_count_label.setText(str(projects_count))
+        # not among the loaded rows (keyset pages have no offsets): narrow to its ID
+        def reset():
+            model.modelReset.disconnect(reset)
+            if model.rowCount():
+                table.selectRow(0)
 
-        cur.execute("SELECT IFNULL(SUM(amount), 0) FROM payments")
-        payments_total = cur.fetchone()[0]
-        self.ui.payments_sum_label.setText(f"Rs {payments_total}")
+        model.modelReset.connect(reset)
+        self.filter_rows[table].show_only(0, f"={row_id}")
 
-        conn.close()
+    def import_csv(self):
+        """Bulk import a CSV file into clients, employees, machines or payments"""
+        entities = {spec.label: name for name, spec in importer.SPECS.items()}
+        label, ok = QtWidgets.QInputDialog.getItem(self, "Import CSV", "Import into:", list(entities), 0, False)
+        if not ok:
+            return
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, f"Import {label}", "", "CSV files (*.csv);;All files (*)"
+        )
+        if not path:
+            return
+        entity = entities[label]
+
+        def done(report):
+            QtWidgets.QMessageBox.information(self, "Import", importer.format_report(report))
+
+        self.executor.submit(
+            importer.import_csv, path, entity,
+            progress=lambda rows: self.task_progress.emit(f"Importing {label}: {rows} rows read"),
+            on_result=done, on_error=self.show_db_error,
+        )
+
+    def export_current_tab(self):
+        """Stream the current tab, as sorted and filtered, to a CSV or XLSX file"""
+        page = self.ui.main_tabs.currentWidget()
+        title = self.ui.main_tabs.tabText(self.ui.main_tabs.currentIndex()).strip() or "Export"
+        if page is self.ui.Overview:
+            job = (export_overview,)
+        elif page is self.ui.Reports:
+            params = self.report_params()
+            if params is None:
+                QtWidgets.QMessageBox.warning(self, "Export", "Choose a client to export their report")
+                return
+            job = (export_cash_flow,) + params
+        else:
+            table = page.findChild(QtWidgets.QTableView)
+            if table is None:
+                QtWidgets.QMessageBox.information(self, "Export", f"The {title} tab has no table to export")
+                return
+            job = (exporter.export_view, table.model().source, table.model().state)
 
+        path, chosen = QtWidgets.QFileDialog.getSaveFileName(
+            self, f"Export {title}", title, "CSV files (*.csv);;Excel workbooks (*.xlsx)"
+        )
+        if not path:
+            return
+        if not path.lower().endswith((".csv", ".xlsx")):
+            path += ".xlsx" if "xlsx" in chosen else ".csv"
+
+        progress = lambda rows: self.task_progress.emit(f"Exporting {title}: {rows} rows")
+        cancelled = lambda: future.cancelled
+        future = self.executor.submit(
+            job[0], path, *job[1:], progress=progress, cancelled=cancelled, title=title,
+            on_result=lambda rows: QtWidgets.QMessageBox.information(
+                self, "Export", f"{rows} rows written to {path}"),
+            on_error=self.show_db_error,
+        )
 
     def load_clients(self):
         """Load all clients into the table"""
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM clients")
-        clients = cur.fetchall()
-        conn.close()
-
-        self.ui.clients_table.setRowCount(len(clients))
-        self.ui.clients_table.setColumnCount(4)
-        self.ui.clients_table.setHorizontalHeaderLabels(["ID", "Name", "Contact", "Address"])
-
-        for row_idx, row_data in enumerate(clients):
-            for col_idx, value in enumerate(row_data):
-                self.ui.clients_table.setItem(row_idx, col_idx, QtWidgets.QTableWidgetItem(str(value)))
+        self.clients_model.reload()
 
     def add_client(self):
         """Add new client to database"""
@@ -280,70 +550,46 @@ class DashboardApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Input Error", "Client name is required")
             return
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("INSERT INTO clients (name, contact, address) VALUES (?, ?, ?)", (name, contact, address))
-        conn.commit()
-        conn.close()
+        def saved(_):
+            QtWidgets.QMessageBox.information(self, "Success", "Client added successfully!")
+            self.ui.client_name_input.clear()
+            self.ui.client_contact_input.clear()
+            self.ui.client_address_input.clear()
 
-        QtWidgets.QMessageBox.information(self, "Success", "Client added successfully!")
-        self.ui.client_name_input.clear()
-        self.ui.client_contact_input.clear()
-        self.ui.client_address_input.clear()
-        self.load_clients()
+        self.executor.submit(
+            repositories.clients.insert,
+            name=name, contact=contact, address=address,
+            on_result=saved, on_error=self.show_db_error,
+        )
 
     def delete_client(self):
         """Delete selected client"""
-        selected_row = self.ui.clients_table.currentRow()
+        selected_row = self.ui.clients_table.currentIndex().row()
         if selected_row == -1:
             QtWidgets.QMessageBox.warning(self, "Selection Error", "Please select a client to delete")
             return
 
-        client_id = self.ui.clients_table.item(selected_row, 0).text()
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM clients WHERE id=?", (client_id,))
-        conn.commit()
-        conn.close()
+        client_id = self.clients_model.row_id(selected_row)
+
+        def deleted(_):
+            QtWidgets.QMessageBox.information(self, "Deleted", "Client removed successfully!")
 
-        QtWidgets.QMessageBox.information(self, "Deleted", "Client removed successfully!")
-        self.load_clients()
+        self.executor.submit(
+            repositories.clients.delete, client_id,
+            on_result=deleted, on_error=self.show_db_error,
+        )
         
     def load_projects(self):
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT projects.id, clients.name, projects.project_name, 
-                projects.project_value, projects.status
-            FROM projects
-            LEFT JOIN clients ON projects.client_id = clients.id
-        """)
-        rows = cur.fetchall()
-        conn.close()
-
-        self.ui.projects_table.setRowCount(len(rows))
-        self.ui.projects_table.setColumnCount(5)
-        self.ui.projects_table.setHorizontalHeaderLabels([
-            "ID", "Client", "Project Name", "Value", "Status"
-        ])
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.ui.projects_table.setItem(r, c, QtWidgets.QTableWidgetItem(str(val)))
+        self.projects_model.reload()
         
     def populate_client_dropdown(self):
-        self.ui.project_client_dropdown.clear()
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT id, name FROM clients")
-        clients = cur.fetchall()
-        conn.close()
-
-        for cid, name in clients:
-            self.ui.project_client_dropdown.addItem(name, cid)
+        self.client_combo.refresh()
 
     def add_project(self):
-        client_id = self.ui.project_client_dropdown.currentData()
+        client_id = self.client_combo.current_id()
+        if client_id is None and self.ui.project_client_dropdown.currentText().strip():
+            QtWidgets.QMessageBox.warning(self, "Error", "Choose a client from the list")
+            return
         name = self.ui.project_name_input.text()
         value = self.ui.project_value_input.text()
         start = self.ui.project_start_date.text()
@@ -353,75 +599,46 @@ class DashboardApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Error", "Project name required")
             return
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO projects (client_id, project_name, project_value, start_date, end_date)
-            VALUES (?, ?, ?, ?, ?)
-        """, (client_id, name, value, start, end))
-        conn.commit()
-        conn.close()
-
-        QtWidgets.QMessageBox.information(self, "Success", "Project added")
-        self.load_projects()
-        self.populate_project_dropdown()  # refresh payments dropdown
+        def saved(_):
+            QtWidgets.QMessageBox.information(self, "Success", "Project added")
+
+        self.executor.submit(
+            repositories.projects.insert,
+            client_id=client_id, project_name=name, project_value=value, start_date=start, end_date=end,
+            on_result=saved, on_error=self.show_db_error,
+        )
         
     def delete_project(self):
-        row = self.ui.projects_table.currentRow()
+        row = self.ui.projects_table.currentIndex().row()
         if row == -1:
             QtWidgets.QMessageBox.warning(self, "Error", "Select a project to delete")
             return
 
-        project_id = self.ui.projects_table.item(row, 0).text()
+        project_id = self.projects_model.row_id(row)
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM projects WHERE id=?", (project_id,))
-        conn.commit()
-        conn.close()
+        def deleted(_):
+            QtWidgets.QMessageBox.information(self, "Deleted", "Project removed")
 
-        QtWidgets.QMessageBox.information(self, "Deleted", "Project removed")
-        self.load_projects()
-        self.populate_project_dropdown()
+        self.executor.submit(
+            repositories.projects.delete, project_id,
+            on_result=deleted, on_error=self.show_db_error,
+        )
 
 
     def populate_project_dropdown(self):
         """Load projects for payment selection"""
-        self.ui.payment_project_dropdown.clear()
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT id, project_name FROM projects")
-        projects = cur.fetchall()
-        conn.close()
-
-        for pid, name in projects:
-            self.ui.payment_project_dropdown.addItem(name, pid)
+        self.project_combo.refresh()
 
     def load_payments(self):
         """Load payments into table"""
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT p.id, pr.project_name, p.amount, p.date
-            FROM payments p
-            LEFT JOIN projects pr ON p.project_id = pr.id
-        """)
-        rows = cur.fetchall()
-        conn.close()
-
-        self.ui.payments_table.setRowCount(len(rows))
-        self.ui.payments_table.setColumnCount(4)
-        self.ui.payments_table.setHorizontalHeaderLabels([
-            "ID", "Project", "Amount", "Date"
-        ])
-
-        for r, row in enumerate(rows):
-            for c, value in enumerate(row):
-                self.ui.payments_table.setItem(r, c, QtWidgets.QTableWidgetItem(str(value)))
+        self.payments_model.reload()
 
     def add_payment(self):
         """Insert new payment"""
-        project_id = self.ui.payment_project_dropdown.currentData()
+        project_id = self.project_combo.current_id()
+        if project_id is None and self.ui.payment_project_dropdown.currentText().strip():
+            QtWidgets.QMessageBox.warning(self, "Input Error", "Choose a project from the list")
+            return
         amount = self.ui.payment_amount_input.text()
         date = self.ui.payment_date_input.text()
 
@@ -429,51 +646,85 @@ class DashboardApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Input Error", "Payment amount required")
             return
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO payments (project_id, amount, date)
-            VALUES (?, ?, ?)
-        """, (project_id, amount, date))
-        conn.commit()
-        conn.close()
+        def saved(_):
+            QtWidgets.QMessageBox.information(self, "Saved", "Payment added!")
 
-        QtWidgets.QMessageBox.information(self, "Saved", "Payment added!")
-        self.load_payments()
+        self.executor.submit(
+            repositories.payments.insert,
+            project_id=project_id, amount=amount, date=date,
+            on_result=saved, on_error=self.show_db_error,
+        )
 
     def delete_payment(self):
-        row = self.ui.payments_table.currentRow()
+        row = self.ui.payments_table.currentIndex().row()
         if row == -1:
             QtWidgets.QMessageBox.warning(self, "Select Payment", "Select a row to delete")
             return
 
-        payment_id = self.ui.payments_table.item(row, 0).text()
-
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM payments WHERE id=?", (payment_id,))
-        conn.commit()
-        conn.close()
+        payment_id = self.payments_model.row_id(row)
+
+        def deleted(_):
+            QtWidgets.QMessageBox.information(self, "Deleted", "Payment removed")
+
+        self.executor.submit(
+            repositories.payments.delete, payment_id,
+            on_result=deleted, on_error=self.show_db_error,
+        )
+
+    def load_ledger(self):
+        """Per-project value, received and outstanding, with totals over all projects"""
+        def show(totals):
+            self.ui.ledger_totals_label.setText(
+                f"{totals['projects']} projects    Value: Rs {totals['value']:,.2f}    "
+                f"Received: Rs {totals['received']:,.2f}    Outstanding: Rs {totals['outstanding']:,.2f}"
+            )
+
+        self.ledger_model.reload()
+        self.executor.submit(stats.ledger_totals, on_result=show, key="ledger_totals")
+
+    def report_params(self):
+        """(first year, last year, client id) the Reports tab asks for, or None while no client is chosen"""
+        first = last = None
+        if self.report_years_set:
+            first, last = sorted((self.ui.report_from_year.value(), self.ui.report_to_year.value()))
+        client_id = None
+        if self.ui.report_by_client_check.isChecked():
+            client_id = self.report_client_combo.current_id()
+            if client_id is None:
+                return None
+        return first, last, client_id
+
+    def load_reports(self):
+        """Chart income, payroll and net cash flow by month, firm-wide or for one client"""
+        params = self.report_params()
+        if params is None:
+            self.ui.report_summary_label.setText("Choose a client")
+            return
 
-        QtWidgets.QMessageBox.information(self, "Deleted", "Payment removed")
-        self.load_payments()
+        def show(report):
+            if not self.report_years_set:
+                self.report_years_set = True
+                for spin, year in ((self.ui.report_from_year, report.first_year),
+                                   (self.ui.report_to_year, report.last_year)):
+                    spin.blockSignals(True)
+                    spin.setValue(year)
+                    spin.blockSignals(False)
+            self.ui.report_chart.set_months(report.months)
+            income = sum(m.income for m in report.months)
+            text = f"Income: Rs {income:,.2f}"
+            if report.client_id is None:
+                payroll = sum(m.payroll for m in report.months)
+                text += f"    Payroll: Rs {payroll:,.2f}    Net: Rs {income - payroll:,.2f}"
+            if report.undated:
+                text += f"    ({report.undated} records with unreadable dates left out)"
+            self.ui.report_summary_label.setText(text)
+
+        self.executor.submit(
+            reports.cash_flow, *params, on_result=show, on_error=self.show_db_error, key="reports"
+        )
         
     def load_machines(self):
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM machines")
-        rows = cur.fetchall()
-        conn.close()
-
-        self.ui.machines_table.setRowCount(len(rows))
-        self.ui.machines_table.setColumnCount(6)
-        self.ui.machines_table.setHorizontalHeaderLabels([
-            "ID", "Name", "Type", "Purchase Date", "Cost", "Status"
-        ])
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.ui.machines_table.setItem(r, c, QtWidgets.QTableWidgetItem(str(val)))
+        self.machines_model.reload()
                 
     def add_machine(self):
         name = self.ui.machine_name_input.text()
@@ -486,221 +737,184 @@ class DashboardApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Error", "Machine name is required")
             return
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO machines (machine_name, machine_type, purchase_date, cost, status)
-            VALUES (?, ?, ?, ?, ?)
-        """, (name, type_, date, cost, status))
-        conn.commit()
-        conn.close()
+        def saved(_):
+            QtWidgets.QMessageBox.information(self, "Success", "Machine added")
 
-        QtWidgets.QMessageBox.information(self, "Success", "Machine added")
-        self.load_machines()
+        self.executor.submit(
+            repositories.machines.insert,
+            machine_name=name, machine_type=type_, purchase_date=date, cost=cost, status=status,
+            on_result=saved, on_error=self.show_db_error,
+        )
 
     def delete_machine(self):
-        row = self.ui.machines_table.currentRow()
+        row = self.ui.machines_table.currentIndex().row()
         if row == -1:
             QtWidgets.QMessageBox.warning(self, "Error", "Select a machine to delete")
             return
 
-        machine_id = self.ui.machines_table.item(row, 0).text()
+        machine_id = self.machines_model.row_id(row)
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM machines WHERE id=?", (machine_id,))
-        conn.commit()
-        conn.close()
+        def deleted(_):
+            QtWidgets.QMessageBox.information(self, "Deleted", "Machine removed")
 
-        QtWidgets.QMessageBox.information(self, "Deleted", "Machine removed")
-        self.load_machines()
+        self.executor.submit(
+            repositories.machines.delete, machine_id,
+            on_result=deleted, on_error=self.show_db_error,
+        )
         
     def load_employees(self):
         """Load employees into table"""
-        try:
-            conn = sqlite3.connect("database/firm.db")
-            cur = conn.cursor()
-            cur.execute("SELECT id, name, phone, cnic, designation, salary, status FROM employees")
-            rows = cur.fetchall()
-        finally:
-            conn.close()
-
-        self.ui.employees_table.setRowCount(len(rows))
-        self.ui.employees_table.setColumnCount(7)
-        self.ui.employees_table.setHorizontalHeaderLabels(["ID","Name","Phone","CNIC","Designation","Salary","Status"])
-
-        for r, row in enumerate(rows):
-            for c, val in enumerate(row):
-                self.ui.employees_table.setItem(r, c, QtWidgets.QTableWidgetItem(str(val)))
+        self.employees_model.reload()
 
     def add_employee(self):
         """Insert new employee"""
-        try:
-            name = self.ui.employee_name_input.text().strip()
-            phone = self.ui.employee_phone_input.text().strip()
-            cnic = self.ui.employee_cnic_input.text().strip()
-            designation = self.ui.employee_designation_input.currentText()
-            salary_text = self.ui.employee_salary_input.text().strip()
-
-            if not name:
-                QtWidgets.QMessageBox.warning(self, "Input Error", "Employee name is required")
-                return
+        name = self.ui.employee_name_input.text().strip()
+        phone = self.ui.employee_phone_input.text().strip()
+        cnic = self.ui.employee_cnic_input.text().strip()
+        designation = self.ui.employee_designation_input.currentText()
+        salary_text = self.ui.employee_salary_input.text().strip()
 
-            # validate salary
-            try:
-                salary = float(salary_text) if salary_text else 0.0
-            except ValueError:
-                QtWidgets.QMessageBox.warning(self, "Input Error", "Salary must be a number")
-                return
+        if not name:
+            QtWidgets.QMessageBox.warning(self, "Input Error", "Employee name is required")
+            return
 
-            conn = sqlite3.connect("database/firm.db")
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO employees (name, phone, cnic, designation, salary)
-                VALUES (?, ?, ?, ?, ?)
-            """, (name, phone, cnic, designation, salary))
-            conn.commit()
-            conn.close()
+        # validate salary
+        try:
+            salary = float(salary_text) if salary_text else 0.0
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self, "Input Error", "Salary must be a number")
+            return
 
+        def saved(_):
             QtWidgets.QMessageBox.information(self, "Success", "Employee added")
             # Clear inputs
             self.ui.employee_name_input.clear()
             self.ui.employee_phone_input.clear()
             self.ui.employee_cnic_input.clear()
             self.ui.employee_salary_input.clear()
-            # Refresh table
-            self.load_employees()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to add employee:\n{e}")
+
+        self.executor.submit(
+            repositories.employees.insert,
+            name=name, phone=phone, cnic=cnic, designation=designation, salary=salary,
+            on_result=saved,
+            on_error=lambda e: QtWidgets.QMessageBox.critical(self, "Error", f"Failed to add employee:\n{e}"),
+        )
 
     def update_employee(self):
         """Update selected employee"""
+        row = self.ui.employees_table.currentIndex().row()
+        if row == -1:
+            QtWidgets.QMessageBox.warning(self, "Selection Error", "Select an employee to update")
+            return
+
+        emp_id = self.employees_model.row_id(row)
+        name = self.ui.employee_name_input.text().strip()
+        phone = self.ui.employee_phone_input.text().strip()
+        cnic = self.ui.employee_cnic_input.text().strip()
+        designation = self.ui.employee_designation_input.currentText()
+        salary_text = self.ui.employee_salary_input.text().strip()
+
+        if not name:
+            QtWidgets.QMessageBox.warning(self, "Input Error", "Employee name is required")
+            return
+
         try:
-            row = self.ui.employees_table.currentRow()
-            if row == -1:
-                QtWidgets.QMessageBox.warning(self, "Selection Error", "Select an employee to update")
-                return
+            salary = float(salary_text) if salary_text else 0.0
+        except ValueError:
+            QtWidgets.QMessageBox.warning(self, "Input Error", "Salary must be a number")
+            return
 
-            emp_id = self.ui.employees_table.item(row, 0).text()
-            name = self.ui.employee_name_input.text().strip()
-            phone = self.ui.employee_phone_input.text().strip()
-            cnic = self.ui.employee_cnic_input.text().strip()
-            designation = self.ui.employee_designation_input.currentText()
-            salary_text = self.ui.employee_salary_input.text().strip()
+        # saved only if nobody else changed the row since it was loaded into the form
+        editing_id, version = self.editing_employee or (None, None)
+        if editing_id != emp_id or version is None:
+            QtWidgets.QMessageBox.warning(
+                self, "Selection Error", "The form is still loading this employee; try again in a moment"
+            )
+            self.on_employee_table_click()
+            return
 
-            if not name:
-                QtWidgets.QMessageBox.warning(self, "Input Error", "Employee name is required")
+        def saved(new_version):
+            if not new_version:
+                QtWidgets.QMessageBox.warning(self, "Employee Deleted", "Someone else deleted this employee")
                 return
+            self.editing_employee = (emp_id, new_version)
+            QtWidgets.QMessageBox.information(self, "Success", "Employee updated")
 
-            try:
-                salary = float(salary_text) if salary_text else 0.0
-            except ValueError:
-                QtWidgets.QMessageBox.warning(self, "Input Error", "Salary must be a number")
+        def failed(error):
+            if isinstance(error, repositories.ConflictError):
+                QtWidgets.QMessageBox.warning(
+                    self, "Employee Changed",
+                    "Someone else saved this employee after you opened it.\n"
+                    "The form now shows their version; make your change again.",
+                )
+                self.on_employee_table_click()
                 return
+            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to update employee:\n{error}")
 
-            conn = sqlite3.connect("database/firm.db")
-            cur = conn.cursor()
-            cur.execute("""
-                UPDATE employees
-                SET name=?, phone=?, cnic=?, designation=?, salary=?
-                WHERE id=?
-            """, (name, phone, cnic, designation, salary, emp_id))
-            conn.commit()
-            conn.close()
-
-            QtWidgets.QMessageBox.information(self, "Success", "Employee updated")
-            self.load_employees()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to update employee:\n{e}")
+        self.executor.submit(
+            repositories.employees.update, emp_id, version,
+            name=name, phone=phone, cnic=cnic, designation=designation, salary=salary,
+            on_result=saved, on_error=failed,
+        )
 
     def delete_employee(self):
         """Delete selected employee"""
-        try:
-            row = self.ui.employees_table.currentRow()
-            if row == -1:
-                QtWidgets.QMessageBox.warning(self, "Selection Error", "Select an employee to delete")
-                return
-
-            emp_id = self.ui.employees_table.item(row, 0).text()
-            confirm = QtWidgets.QMessageBox.question(self, "Confirm", "Delete this employee?",
-                                                     QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
-            if confirm != QtWidgets.QMessageBox.Yes:
-                return
+        row = self.ui.employees_table.currentIndex().row()
+        if row == -1:
+            QtWidgets.QMessageBox.warning(self, "Selection Error", "Select an employee to delete")
+            return
 
-            conn = sqlite3.connect("database/firm.db")
-            cur = conn.cursor()
-            cur.execute("DELETE FROM employees WHERE id=?", (emp_id,))
-            conn.commit()
-            conn.close()
+        emp_id = self.employees_model.row_id(row)
+        confirm = QtWidgets.QMessageBox.question(self, "Confirm", "Delete this employee?",
+                                                 QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No)
+        if confirm != QtWidgets.QMessageBox.Yes:
+            return
 
+        def deleted(_):
             QtWidgets.QMessageBox.information(self, "Deleted", "Employee removed")
-            self.load_employees()
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Error", f"Failed to delete employee:\n{e}")
+
+        self.executor.submit(
+            repositories.employees.delete, emp_id,
+            on_result=deleted,
+            on_error=lambda e: QtWidgets.QMessageBox.critical(self, "Error", f"Failed to delete employee:\n{e}"),
+        )
 
     def on_employee_table_click(self):
         """Load selected employee into form for editing"""
-        row = self.ui.employees_table.currentRow()
+        row = self.ui.employees_table.currentIndex().row()
         if row == -1:
             return
-        try:
-            emp_id = self.ui.employees_table.item(row, 0).text()
-            name = self.ui.employees_table.item(row, 1).text()
-            phone = self.ui.employees_table.item(row, 2).text()
-            cnic = self.ui.employees_table.item(row, 3).text()
-            designation = self.ui.employees_table.item(row, 4).text()
-            salary = self.ui.employees_table.item(row, 5).text()
-
-            self.ui.employee_name_input.setText(name)
-            self.ui.employee_phone_input.setText(phone)
-            self.ui.employee_cnic_input.setText(cnic)
+
+        def show(employee):
+            if employee is None:
+                return  # deleted meanwhile
+            # the values and the version come from one read, so a save checks against what is shown
+            self.editing_employee = (employee.id, employee.version)
+            self.ui.employee_name_input.setText(employee.name or "")
+            self.ui.employee_phone_input.setText(employee.phone or "")
+            self.ui.employee_cnic_input.setText(employee.cnic or "")
             # set designation index safely
-            idx = self.ui.employee_designation_input.findText(designation)
+            idx = self.ui.employee_designation_input.findText(employee.designation or "")
             if idx >= 0:
                 self.ui.employee_designation_input.setCurrentIndex(idx)
-            self.ui.employee_salary_input.setText(salary)
-        except Exception:
-            pass
+            self.ui.employee_salary_input.setText("" if employee.salary is None else str(employee.salary))
+
+        self.executor.submit(
+            repositories.employees.get, self.employees_model.row_id(row),
+            on_result=show, on_error=self.show_db_error, key="employee_form",
+        )
         
     def load_salary_employees(self):
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT id, name FROM employees WHERE status='active'")
-        employees = cur.fetchall()
-        conn.close()
-
-        self.ui.salary_employee_dropdown.clear()
-
-        for emp_id, name in employees:
-            self.ui.salary_employee_dropdown.addItem(name, emp_id)
+        self.salary_employee_combo.refresh()
             
     def load_salary_table(self):
-        self.ui.salary_table.setRowCount(0)
-
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT es.id, e.name, es.salary_amount, es.month, es.date_paid, es.status
-            FROM employee_salaries es
-            JOIN employees e ON es.employee_id = e.id
-            ORDER BY es.id DESC
-        """)
-        records = cur.fetchall()
-        conn.close()
-
-        self.ui.salary_table.setRowCount(len(records))
-        self.ui.salary_table.setColumnCount(6)
-
-        headers = ["ID", "Employee", "Amount", "Month", "Paid On", "Status"]
-        self.ui.salary_table.setHorizontalHeaderLabels(headers)
-        self.ui.salary_table.horizontalHeader().setStretchLastSection(True)
-
-        for row, data in enumerate(records):
-            for col, value in enumerate(data):
-                self.ui.salary_table.setItem(row, col, QtWidgets.QTableWidgetItem(str(value)))
+        self.salary_model.reload()
 
     def add_salary_record(self):
-        employee_id = self.ui.salary_employee_dropdown.currentData()
+        employee_id = self.salary_employee_combo.current_id()
+        if employee_id is None and self.ui.salary_employee_dropdown.currentText().strip():
+            QtWidgets.QMessageBox.warning(self, "Missing Field", "Choose an employee from the list.")
+            return
         amount = self.ui.salary_amount_input.text()
         month = self.ui.salary_month_dropdown.currentText()
         date_paid = self.ui.salary_date_input.text()
@@ -710,41 +924,68 @@ class DashboardApp(QtWidgets.QMainWindow):
             QtWidgets.QMessageBox.warning(self, "Missing Field", "Salary amount is required.")
             return
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-
-        cur.execute("""
-            INSERT INTO employee_salaries (employee_id, salary_amount, month, date_paid, status)
-            VALUES (?, ?, ?, ?, ?)
-        """, (employee_id, amount, month, date_paid, status))
+        def saved(_):
+            QtWidgets.QMessageBox.information(self, "Success", "Salary added successfully!")
 
-        conn.commit()
-        conn.close()
+        self.executor.submit(
+            repositories.salaries.insert,
+            employee_id=employee_id, salary_amount=amount, month=month, date_paid=date_paid, status=status,
+            on_result=saved, on_error=self.show_db_error,
+        )
+        
+    def run_payroll(self):
+        """Pay every active employee for the selected month, after a preview"""
+        month = self.ui.salary_month_dropdown.currentText()
+        year = self.ui.salary_date_input.date().year()
+        date_paid = self.ui.salary_date_input.text()
+        status = self.ui.salary_status_dropdown.currentText() or "Paid"
 
-        QtWidgets.QMessageBox.information(self, "Success", "Salary added successfully!")
+        def confirm(plan):
+            if not plan.to_pay:
+                QtWidgets.QMessageBox.information(self, "Payroll", payroll.describe(plan))
+                return
+            answer = QtWidgets.QMessageBox.question(
+                self, "Run Payroll", payroll.describe(plan) + "\n\nAdd these salary records?",
+                QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
+            )
+            if answer == QtWidgets.QMessageBox.Yes:
+                self.executor.submit(
+                    payroll.run, month, year, date_paid, status,
+                    on_result=done, on_error=self.show_db_error,
+                )
+
+        def done(inserted):
+            QtWidgets.QMessageBox.information(
+                self, "Payroll", f"{inserted} salary records added for {month} {year}."
+            )
+
+        self.executor.submit(
+            payroll.preview, month, year, date_paid,
+            on_result=confirm, on_error=self.show_db_error, key="payroll_preview",
+        )
 
-        self.load_salary_table()
-        
     def delete_salary_record(self):
-        selected = self.ui.salary_table.currentRow()
+        selected = self.ui.salary_table.currentIndex().row()
 
         if selected < 0:
             QtWidgets.QMessageBox.warning(self, "Error", "Select a salary record to delete.")
             return
 
-        salary_id = int(self.ui.salary_table.item(selected, 0).text())
+        salary_id = self.salary_model.row_id(selected)
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM employee_salaries WHERE id=?", (salary_id,))
-        conn.commit()
-        conn.close()
+        def deleted(_):
+            QtWidgets.QMessageBox.information(self, "Deleted", "Salary record deleted.")
 
-        QtWidgets.QMessageBox.information(self, "Deleted", "Salary record deleted.")
-        self.load_salary_table()
+        self.executor.submit(
+            repositories.salaries.delete, salary_id,
+            on_result=deleted, on_error=self.show_db_error,
+        )
 
 
 # ---- LOGIN WINDOW ----
+PREWARM_MAX_AGE = 30  # seconds; older pre-read overview counts are read again at login
+
+
 class LoginApp(QtWidgets.QMainWindow):
     def __init__(self):
         super(LoginApp, self).__init__()
@@ -802,28 +1043,72 @@ class LoginApp(QtWidgets.QMainWindow):
         self.ui.password_input.setEchoMode(QtWidgets.QLineEdit.Password)
         self.ui.login_button.clicked.connect(self.handle_login)
 
+        # build the dashboard while the login form waits for the user
+        self.dashboard = None
+        self._prewarm = self._prewarm_steps()
+        QtCore.QTimer.singleShot(0, self.prewarm)
+
+    def _prewarm_steps(self):
+        # one step per idle slot, so the form stays responsive in between
+        db_connection.connection()  # schema upgrade and statistics refresh
+        startup.mark("database open")
+        if db_connection.remote():
+            return  # a server answers only after login; handle_login builds the dashboard
+        yield
+        self.build_dashboard()
+
+    def build_dashboard(self):
+        self.dashboard = DashboardApp()  # its Overview tab starts loading at once
+        self._prewarmed_at = time.monotonic()
+
+    def prewarm(self):
+        """Run the next pre-warm step, and schedule the one after it"""
+        if next(self._prewarm, StopIteration) is not StopIteration:
+            QtCore.QTimer.singleShot(0, self.prewarm)
+
     def handle_login(self):
         username = self.ui.username_input.text()
         password = self.ui.password_input.text()
+        startup.mark("login form")
 
-        conn = sqlite3.connect("database/firm.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        user = cur.fetchone()
-        conn.close()
+        try:
+            user = authenticate(username, password)
+        except RemoteError as error:
+            QtWidgets.QMessageBox.critical(self, "Server", str(error))
+            return
 
         if user:
-            self.dashboard = DashboardApp(username)
-            self.dashboard.load_overview()
-            self.dashboard.show()
+            for _step in self._prewarm:
+                pass  # logged in before pre-warming finished
+            if self.dashboard is None:
+                self.build_dashboard()
+            if time.monotonic() - self._prewarmed_at > PREWARM_MAX_AGE:
+                self.dashboard.mark_stale(self.dashboard.ui.Overview)
+            self.dashboard.bind_user(username)
+            self.dashboard.showMaximized()
             self.close()
+            startup.mark("login")
+            if startup.enabled():
+                self.dashboard.executor.wait_for_idle()
+                startup.mark("dashboard idle")
+                startup.report()
         else:
             QtWidgets.QMessageBox.warning(self, "Login Failed", "Invalid username or password")
 
 
 # ---- MAIN APP ----
 if __name__ == "__main__":
+    if startup.requested():
+        startup.enable(STARTED)
+        startup.mark("imports")
+    tracer = tracing.enable_from_env()
     app = QtWidgets.QApplication(sys.argv)
+    startup.mark("qt application")
     window = LoginApp()
     window.show()
-    sys.exit(app.exec_())
+    startup.mark("login window")
+    exit_code = app.exec_()
+    if tracer is not None:
+        print(tracer.summary(), file=sys.stderr)
+    db_connection.close_all()
+    sys.exit(exit_code)
@@ -0,0 +1,381 @@
+import argparse
+import datetime
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from modules import dates, db_connection, events
+
+# ---- ANALYTICS ----
+# Payments, projects and salaries are held as columnar NumPy arrays (ids,
+# amounts as float64, dates as int32 day or month numbers) and every figure
+# is computed with whole-array operations, never a loop over rows. The arrays
+# live between refreshes: rows past the highest id seen are appended, rows
+# named by change events (see events.py) are dropped and re-read, and a table
+# whose row count or amount total no longer matches is read again in full.
+# A snapshot next to the database file spares that full read on the next start.
+
+NO_DATE = np.iinfo(np.int32).min  # day or month number of text in no known date format
+AGING_BUCKETS = ("Not due", "1-30 days", "31-60 days", "61-90 days", "Over 90 days", "No due date")
+RUN_RATE_MONTHS = 3   # payroll run-rate: average of the latest months with salary records
+INCOME_MONTHS = 12    # forecast income: average of the complete months before this one
+REREAD_BATCH = 500    # ids per query when re-reading changed rows
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ROWS = 10000  # rows changed since the last snapshot before another is written
+TOLERANCE = 1e-6
+
+ClientAging = namedtuple("ClientAging", "client_id name outstanding buckets days_to_pay")
+ForecastMonth = namedtuple("ForecastMonth", "month income payroll position")
+Analytics = namedtuple(
+    "Analytics",
+    "as_of outstanding buckets clients days_to_pay payroll_run_rate position forecast rows seconds",
+)
+
+
+class _Memo(dict):
+    """Parses each distinct date text once; stored dates repeat a great deal"""
+
+    def __init__(self, parse):
+        super().__init__()
+        self.parse = parse
+
+    def __missing__(self, key):
+        value = self.parse(*key) if isinstance(key, tuple) else self.parse(key)
+        value = self[key] = NO_DATE if value is None else value
+        return value
+
+
+def _payment_rows(cursor):
+    days = _Memo(dates.day_number)
+    return ((row_id, project, amount, days[date]) for row_id, project, amount, date in cursor)
+
+
+def _project_rows(cursor):
+    days = _Memo(dates.day_number)
+    return ((row_id, client, value, days[start], days[end]) for row_id, client, value, start, end in cursor)
+
+
+def _salary_rows(cursor):
+    periods = _Memo(dates.period_number)
+    return ((row_id, amount, periods[month, paid]) for row_id, amount, month, paid in cursor)
+
+
+class Columns:
+    """Columnar copy of one table, brought up to date by refresh()"""
+
+    def __init__(self, table, select, dtype, rows, fingerprint_sql, weight):
+        self.table = table
+        self.select = select            # SELECT ... FROM table; the first column is the id
+        self.dtype = np.dtype(dtype)
+        self.rows = rows                # cursor -> iterator of tuples matching dtype
+        self.fingerprint_sql = fingerprint_sql  # (row count, total of `weight`), cheaply
+        self.weight = weight
+        self.arrays = None              # {column: array}, ordered by id
+        self.unsaved = 0                # rows changed since the last snapshot
+        self._changed = set()
+        self._reload = True
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return 0 if self.arrays is None else len(self.arrays["id"])
+
+    def note(self, change):
+        """Remember a committed write until the next refresh"""
+        with self._lock:
+            if change.ids is None:
+                if change.op != "insert":
+                    self._reload = True  # bulk edit or delete; bulk inserts are new ids anyway
+            else:
+                self._changed.update(change.ids)
+
+    def _read(self, conn, where="", params=()):
+        cursor = conn.execute(f"{self.select} {where} ORDER BY 1", params)
+        block = np.fromiter(self.rows(cursor), self.dtype)
+        return {name: np.ascontiguousarray(block[name]) for name in self.dtype.names}
+
+    def _matches(self, conn):
+        rows, total = conn.execute(self.fingerprint_sql).fetchone()
+        mine = self.arrays[self.weight].sum() if len(self) else 0.0
+        return len(self) == (rows or 0) and abs(mine - (total or 0)) <= TOLERANCE * max(1.0, abs(total or 0))
+
+    def load(self, arrays):
+        """Start from arrays saved earlier; refresh() checks them against the table"""
+        with self._lock:
+            self.arrays, self._reload = arrays, False
+
+    def refresh(self, conn):
+        """Bring the arrays up to date with the table; returns True if anything changed"""
+        with self._lock:
+            changed, reload = self._changed, self._reload
+            self._changed, self._reload = set(), False
+        if not reload and self.arrays is not None:
+            arrays = self.arrays
+            last = int(arrays["id"][-1]) if len(arrays["id"]) else 0
+            parts, dropped = [], 0
+            if changed:
+                keep = ~np.isin(arrays["id"], np.fromiter(changed, np.int64))
+                dropped = len(keep) - int(keep.sum())
+                arrays = {name: column[keep] for name, column in arrays.items()}
+                ids = sorted(i for i in changed if i <= last)
+                for start in range(0, len(ids), REREAD_BATCH):
+                    batch = ids[start:start + REREAD_BATCH]
+                    parts.append(self._read(conn, f"WHERE id IN ({', '.join('?' * len(batch))})", batch))
+            parts.append(self._read(conn, "WHERE id > ?", (last,)))
+            added = sum(len(part["id"]) for part in parts)
+            if added:
+                arrays = {name: np.concatenate([arrays[name]] + [p[name] for p in parts]) for name in arrays}
+                if changed:
+                    order = np.argsort(arrays["id"], kind="stable")
+                    arrays = {name: column[order] for name, column in arrays.items()}
+            self.unsaved += added + dropped
+            self.arrays = arrays
+            if self._matches(conn):
+                return bool(added or dropped)
+        # first read, a bulk write, or another process changed rows it did not add
+        self.arrays = self._read(conn)
+        self.unsaved = SNAPSHOT_ROWS
+        return True
+
+
+PAYMENTS = Columns(
+    "payments",
+    "SELECT id, project_id, IFNULL(amount, 0), date FROM payments",
+    [("id", "i8"), ("project", "i8"), ("amount", "f8"), ("day", "i4")],
+    _payment_rows,
+    # the overview counters hold both, so checking a large table costs nothing
+    "SELECT (SELECT value FROM dashboard_stats WHERE name = 'payments'), "
+    "(SELECT value FROM dashboard_stats WHERE name = 'payments_total')",
+    "amount",
+)
+PROJECTS = Columns(
+    "projects",
+    "SELECT id, IFNULL(client_id, 0), IFNULL(project_value, 0), start_date, end_date FROM projects",
+    [("id", "i8"), ("client", "i8"), ("value", "f8"), ("start", "i4"), ("end", "i4")],
+    _project_rows,
+    "SELECT COUNT(*), TOTAL(project_value) FROM projects",
+    "value",
+)
+SALARIES = Columns(
+    "employee_salaries",
+    "SELECT id, IFNULL(salary_amount, 0), month, date_paid FROM employee_salaries",
+    [("id", "i8"), ("amount", "f8"), ("period", "i4")],
+    _salary_rows,
+    "SELECT IFNULL(SUM(records), 0), IFNULL(SUM(total), 0) FROM salary_month_totals",
+    "amount",
+)
+TABLES = (PAYMENTS, PROJECTS, SALARIES)
+
+_refresh_lock = threading.Lock()
+_snapshot_checked = set()  # database paths whose snapshot has been looked for
+
+
+# ---- SNAPSHOT ----
+def snapshot_path(db_path=None):
+    pool = db_connection.get_pool()
+    db_path = db_path or pool.path
+    return None if db_path == ":memory:" or pool.remote else db_path + ".analytics.npz"
+
+
+def _load_snapshot(path):
+    try:
+        with np.load(path) as saved:
+            if int(saved["version"]) != SNAPSHOT_VERSION:
+                return
+            for columns in TABLES:
+                columns.load({name: saved[f"{columns.table}.{name}"] for name in columns.dtype.names})
+    except (OSError, KeyError, ValueError):
+        pass  # missing or unreadable: the tables are read in full instead
+
+
+def _save_snapshot(path):
+    arrays = {"version": np.array(SNAPSHOT_VERSION)}
+    for columns in TABLES:
+        arrays.update({f"{columns.table}.{name}": column for name, column in columns.arrays.items()})
+    temporary = path + ".tmp.npz"
+    try:
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)
+    except OSError:
+        return  # read-only folder: keep working from memory
+    for columns in TABLES:
+        columns.unsaved = 0
+
+
+def refresh(conn=None):
+    """Bring the cached arrays up to date; returns the seconds it took"""
+    start = time.perf_counter()
+    conn = conn if conn is not None else db_connection.connection()
+    path = snapshot_path()
+    with _refresh_lock:
+        if path is not None and path not in _snapshot_checked:
+            _snapshot_checked.add(path)
+            if all(columns.arrays is None for columns in TABLES) and os.path.exists(path):
+                _load_snapshot(path)
+        for columns in TABLES:
+            columns.refresh(conn)
+        if path is not None and any(columns.unsaved >= SNAPSHOT_ROWS for columns in TABLES):
+            _save_snapshot(path)
+    return time.perf_counter() - start
+
+
+def reset():
+    """Drop the cached arrays; the next refresh reads every table in full"""
+    for columns in TABLES:
+        with columns._lock:
+            columns.arrays, columns._changed, columns._reload = None, set(), True
+
+
+def _on_change(change):
+    for columns in TABLES:
+        if change.table == columns.table:
+            columns.note(change)
+
+
+events.subscribe(_on_change, [columns.table for columns in TABLES])
+
+
+# ---- FIGURES ----
+def _first_day(month):
+    """Day number of the first of a month number (months since January 1970)"""
+    return (datetime.date(1970 + month // 12, month % 12 + 1, 1) - dates.EPOCH).days
+
+
+def _positions(ids, keys):
+    """Index of each key in the sorted array `ids`, or -1; ids are rowids, so a dense table beats searching"""
+    table = np.full(int(ids[-1]) + 2 if len(ids) else 1, -1, np.int64)
+    table[ids] = np.arange(len(ids))
+    return table[np.clip(keys, 0, len(table) - 1)]
+
+
+def _client_names(client_ids, conn):
+    ids = [int(i) for i in client_ids if i]
+    names = dict(conn.execute(
+        f"SELECT id, name FROM clients WHERE id IN ({', '.join('?' * len(ids))})", ids
+    ).fetchall()) if ids else {}
+    return [names.get(int(i), "(no client)" if not i else f"(deleted client {i})") for i in client_ids]
+
+
+def compute(months=6, top=10, today=None, conn=None):
+    """Receivables aging, days-to-pay, payroll run-rate and a cash forecast for `months` ahead.
+
+    Receivables are what each project's value still exceeds its payments by,
+    aged from the project's end date (its start date if it has none). Days to
+    pay run from a project's start to each payment, weighted by amount. The
+    cash position is all payments received less all salaries paid; the
+    forecast adds the average monthly income of the last INCOME_MONTHS
+    complete months, never more than is outstanding, and takes off the
+    payroll run-rate.
+    """
+    conn = conn if conn is not None else db_connection.connection()
+    load_seconds = refresh(conn)
+    start = time.perf_counter()
+    today = today or datetime.date.today()
+    today_day = (today - dates.EPOCH).days
+    this_month = (today.year - 1970) * 12 + today.month - 1
+
+    pay, proj, sal = PAYMENTS.arrays, PROJECTS.arrays, SALARIES.arrays
+
+    # each payment's project, by position in the id-ordered project arrays
+    slot = _positions(proj["id"], pay["project"])
+    linked = slot >= 0
+    slot = slot[linked]
+    received = np.bincount(slot, weights=pay["amount"][linked], minlength=len(proj["id"]))
+    outstanding = np.clip(proj["value"] - received, 0, None)
+
+    due = np.where(proj["end"] != NO_DATE, proj["end"], proj["start"])
+    age = today_day - due.astype(np.int64)
+    bucket = np.select(
+        [due == NO_DATE, age <= 0, age <= 30, age <= 60, age <= 90], [5, 0, 1, 2, 3], default=4
+    )
+    clients, client_of_project = np.unique(proj["client"], return_inverse=True)
+    width = len(AGING_BUCKETS)
+    aging = np.bincount(
+        client_of_project * width + bucket, weights=outstanding, minlength=len(clients) * width
+    ).reshape(len(clients), width)
+
+    # days from project start to payment, weighted by amount, per client and overall
+    started = proj["start"][slot] != NO_DATE
+    dated = (pay["day"][linked] != NO_DATE) & started
+    weights = pay["amount"][linked][dated]
+    waited = (pay["day"][linked][dated].astype(np.int64) - proj["start"][slot][dated]) * weights
+    client_slot = client_of_project[slot][dated]
+    weight_sum = np.bincount(client_slot, weights=weights, minlength=len(clients))
+    waited_sum = np.bincount(client_slot, weights=waited, minlength=len(clients))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days_to_pay = np.where(weight_sum > 0, waited_sum / weight_sum, np.nan)
+    overall_days = waited.sum() / weights.sum() if weights.sum() > 0 else None
+
+    # payroll by period; the run-rate averages the latest months that had any
+    booked = (sal["period"] != NO_DATE) & (sal["period"] <= this_month)
+    run_rate = 0.0
+    if booked.any():
+        periods = sal["period"][booked] - sal["period"][booked].min()
+        totals = np.bincount(periods, weights=sal["amount"][booked])
+        run_rate = float(totals[np.bincount(periods) > 0][-RUN_RATE_MONTHS:].mean())
+
+    # income of the complete months before this one
+    window = (pay["day"] >= _first_day(this_month - INCOME_MONTHS)) & (pay["day"] < _first_day(this_month))
+    income_rate = pay["amount"][window].sum() / INCOME_MONTHS
+
+    position = float(pay["amount"].sum() - sal["amount"].sum())
+    total_outstanding = float(outstanding.sum())
+    ahead = np.arange(1, months + 1)
+    collected = np.minimum(income_rate * ahead, total_outstanding)
+    income = np.diff(collected, prepend=0.0)
+    forecast = [
+        ForecastMonth(f"{(this_month + k) // 12 + 1970:04d}-{(this_month + k) % 12 + 1:02d}",
+                      float(income[k - 1]), run_rate, position + float(collected[k - 1]) - run_rate * k)
+        for k in ahead
+    ]
+
+    owed = aging.sum(axis=1)
+    order = np.argsort(-owed, kind="stable")[:top]
+    order = order[owed[order] > 0]
+    names = _client_names(clients[order], conn)
+    top_clients = [
+        ClientAging(int(clients[i]), name, float(owed[i]), tuple(float(v) for v in aging[i]),
+                    None if np.isnan(days_to_pay[i]) else float(days_to_pay[i]))
+        for i, name in zip(order, names)
+    ]
+    return Analytics(
+        today, total_outstanding, tuple(float(v) for v in aging.sum(axis=0)), top_clients,
+        overall_days, run_rate, position, forecast,
+        {columns.table: len(columns) for columns in TABLES},
+        {"refresh": load_seconds, "compute": time.perf_counter() - start},
+    )
+
+
+def describe(result):
+    lines = [
+        f"Outstanding receivables: Rs {result.outstanding:,.2f}",
+        "  " + ", ".join(f"{label}: Rs {value:,.0f}" for label, value in zip(AGING_BUCKETS, result.buckets)),
+        f"Average days to pay: {result.days_to_pay:.0f}" if result.days_to_pay is not None
+        else "Average days to pay: no dated payments",
+        f"Payroll run-rate: Rs {result.payroll_run_rate:,.2f} a month",
+        f"Cash position (received less salaries paid): Rs {result.position:,.2f}",
+        "",
+        "Largest receivables:",
+    ]
+    lines += [f"  {c.name}: Rs {c.outstanding:,.2f}" for c in result.clients]
+    lines += ["", "Forecast:"]
+    lines += [f"  {f.month}: in Rs {f.income:,.0f}, payroll Rs {f.payroll:,.0f}, position Rs {f.position:,.0f}"
+              for f in result.forecast]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m modules.analytics", description="Receivables and cash forecast")
+    parser.add_argument("--months", type=int, default=6, help="months to forecast")
+    parser.add_argument("--top", type=int, default=10, help="clients listed by receivables")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db)
+    result = compute(args.months, args.top)
+    print(describe(result))
+    print(f"\n{sum(result.rows.values())} rows; refreshed in {result.seconds['refresh']:.2f}s, "
+          f"computed in {result.seconds['compute']:.2f}s")
+    db_connection.close_all()
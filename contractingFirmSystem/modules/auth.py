@@ -0,0 +1,10 @@
+from modules import db_connection, repositories
+
+
+def authenticate(username, password):
+    """Return the (id, username, role) of a matching user, or None"""
+    server = db_connection.remote()
+    if server is not None:
+        return server.login(username, password)  # the server checks, and issues a session
+    user = repositories.users.find_login(username, password)
+    return (user.id, user.username, user.role) if user else None
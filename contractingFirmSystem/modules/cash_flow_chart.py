@@ -0,0 +1,151 @@
+import math
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from modules.reports import MONTH_LABELS, month_label
+
+# ---- CASH-FLOW CHART ----
+# Income and payroll as bars and net cash flow as a line, one slot per month,
+# painted directly with QPainter; a report has at most a few hundred months,
+# so every paint draws all of them.
+
+INCOME_COLOR = QtGui.QColor("#4caf50")
+PAYROLL_COLOR = QtGui.QColor("#e57373")
+NET_COLOR = QtGui.QColor("#64b5f6")
+GRID_COLOR = QtGui.QColor("#333333")
+MARGINS = QtCore.QMargins(80, 34, 16, 28)  # room for axis labels and the legend
+MIN_LABEL_SPACING = 64  # px between month labels on the x axis
+
+
+def _short(value):
+    """Axis label for an amount: 1.5M, 250K, -40K"""
+    for limit, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= limit:
+            return f"{value / limit:g}{suffix}"
+    return f"{value:g}"
+
+
+def _ticks(low, high, count=5):
+    """Round values spanning [low, high] for grid lines"""
+    span = (high - low) or 1.0
+    raw = span / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    first = math.floor(low / step) * step
+    return [first + i * step for i in range(int(math.ceil((high - first) / step)) + 1)]
+
+
+def _labelled(month, every):
+    """Whether the month key starts a labelled stretch of `every` months"""
+    number, year = int(month[5:]), int(month[:4])
+    if every < 12:
+        return (number - 1) % every == 0
+    return number == 1 and year % (every // 12) == 0
+
+
+class CashFlowChart(QtWidgets.QWidget):
+    """Monthly chart of a reports.CashFlowReport; hovering a month shows its figures"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.months = []
+        self.setMouseTracking(True)
+        self.setMinimumHeight(240)
+
+    def set_months(self, months):
+        """Chart a list of reports.MonthTotals; payroll and net of None are left out"""
+        self.months = list(months)
+        self.update()
+
+    def _series(self):
+        series = [("Income", INCOME_COLOR, [m.income for m in self.months])]
+        if self.months and self.months[0].payroll is not None:
+            series.append(("Payroll", PAYROLL_COLOR, [m.payroll for m in self.months]))
+            series.append(("Net", NET_COLOR, [m.net for m in self.months]))
+        return series
+
+    def _plot_rect(self):
+        return self.rect().marginsRemoved(MARGINS)
+
+    def _slot_at(self, x):
+        plot = self._plot_rect()
+        if not self.months or not plot.left() <= x <= plot.right():
+            return None
+        return min(int((x - plot.left()) * len(self.months) / max(plot.width(), 1)), len(self.months) - 1)
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        text_color = self.palette().color(QtGui.QPalette.WindowText)
+        plot = self._plot_rect()
+        series = self._series()
+        values = [v for _, _, points in series for v in points]
+        if not self.months or not any(values):
+            painter.setPen(text_color)
+            empty = "No payments or salaries" if len(series) > 1 else "No payments from this client"
+            painter.drawText(self.rect(), QtCore.Qt.AlignCenter, f"{empty} in these years")
+            return
+
+        ticks = _ticks(min(0.0, *values), max(0.0, *values))
+        low, high = ticks[0], ticks[-1]
+
+        def y_of(value):
+            return plot.bottom() - (value - low) * plot.height() / ((high - low) or 1.0)
+
+        # grid and amount axis
+        metrics = painter.fontMetrics()
+        for tick in ticks:
+            y = round(y_of(tick))
+            painter.setPen(QtGui.QPen(text_color if tick == 0 else GRID_COLOR, 1))
+            painter.drawLine(plot.left(), y, plot.right(), y)
+            painter.setPen(text_color)
+            label_rect = QtCore.QRect(0, y - metrics.height() // 2, plot.left() - 8, metrics.height())
+            painter.drawText(label_rect, QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter, _short(tick))
+
+        # bars side by side in each month's slot, then the net line over them
+        slot = plot.width() / len(self.months)
+        bars = [s for s in series if s[0] != "Net"]
+        bar_width = max(slot * 0.8 / len(bars), 1.0)
+        zero = y_of(0)
+        painter.setPen(QtCore.Qt.NoPen)
+        for i in range(len(self.months)):
+            left = plot.left() + i * slot + slot * 0.1
+            for j, (_, color, points) in enumerate(bars):
+                top = y_of(points[i])
+                painter.setBrush(color)
+                painter.drawRect(QtCore.QRectF(left + j * bar_width, min(top, zero), bar_width, abs(zero - top)))
+        for name, color, points in series:
+            if name == "Net":
+                painter.setPen(QtGui.QPen(color, 2))
+                painter.drawPolyline(QtGui.QPolygonF([
+                    QtCore.QPointF(plot.left() + (i + 0.5) * slot, y_of(v)) for i, v in enumerate(points)
+                ]))
+
+        # month labels, thinned out to whole quarters or years when they would crowd
+        painter.setPen(text_color)
+        every = next((n for n in (1, 3, 6, 12, 24, 60) if n * slot >= MIN_LABEL_SPACING), 120)
+        for i, month in enumerate(self.months):
+            if not _labelled(month.month, every):
+                continue
+            number = int(month.month[5:])
+            text = month.month[:4] if every >= 12 else f"{MONTH_LABELS[number - 1]} {month.month[2:4]}"
+            x = round(plot.left() + i * slot)
+            painter.drawText(x, plot.bottom() + metrics.ascent() + 6, text)
+
+        # legend
+        x = plot.left()
+        for name, color, _ in series:
+            painter.fillRect(x, 10, 12, 12, color)
+            painter.drawText(x + 18, 10 + metrics.ascent() - 1, name)
+            x += 18 + metrics.horizontalAdvance(name) + 20
+
+    def mouseMoveEvent(self, event):
+        i = self._slot_at(event.pos().x())
+        if i is None:
+            QtWidgets.QToolTip.hideText()
+            return
+        month = self.months[i]
+        lines = [month_label(month.month)] + [
+            f"{name}: Rs {points[i]:,.2f}" for name, _, points in self._series()
+        ]
+        QtWidgets.QToolTip.showText(event.globalPos(), "\n".join(lines), self)
@@ -0,0 +1,128 @@
+import datetime
+import re
+
+# ---- STORED DATE TEXT ----
+# Dates are stored as the forms' date fields show them: 'M/D/YYYY' or
+# 'd MMM yyyy' depending on the locale, or ISO 'YYYY-MM-DD' from imports.
+# These build SQL expressions that read a year, a 'YYYY-MM' month key or an
+# ISO date out of any of them, for triggers, reports and list sorting; text in
+# no known format gives NULL.
+# parse() and friends read the same formats in Python.
+
+MONTH_ABBREVIATIONS = "JANFEBMARAPRMAYJUNJULAUGSEPOCTNOVDEC"
+EPOCH = datetime.date(1970, 1, 1)
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"  # UTC timestamp written to updated_at
+
+
+def year_sql(expr):
+    """Four-digit year of a stored date: it leads ISO dates and ends the others"""
+    return f"CASE WHEN {expr} GLOB '[0-9][0-9][0-9][0-9]-*' THEN substr({expr}, 1, 4) ELSE substr({expr}, -4) END"
+
+
+def month_number_sql(expr):
+    """1-12 for a month name or its three-letter abbreviation, in any case"""
+    position = f"instr('{MONTH_ABBREVIATIONS}', upper(substr(trim({expr}), 1, 3)))"
+    return f"(CASE WHEN length(trim({expr})) >= 3 AND {position} % 3 = 1 THEN ({position} + 2) / 3 END)"
+
+
+def month_key_sql(expr):
+    """'YYYY-MM' of a stored date"""
+    mdy = f"CAST({expr} AS INTEGER)"  # the leading number of 'M/D/YYYY'
+    dmy = month_number_sql(f"substr({expr}, instr({expr}, ' ') + 1)")
+    return f"""(CASE
+        WHEN {expr} GLOB '[0-9][0-9][0-9][0-9]-[01][0-9]-*' THEN substr({expr}, 1, 7)
+        WHEN {expr} GLOB '[0-9]*/*/[0-9][0-9][0-9][0-9]' AND {mdy} BETWEEN 1 AND 12
+            THEN substr({expr}, -4) || printf('-%02d', {mdy})
+        WHEN {expr} GLOB '[0-9]* [A-Za-z][A-Za-z][A-Za-z]* [0-9][0-9][0-9][0-9]' AND {dmy} IS NOT NULL
+            THEN substr({expr}, -4) || printf('-%02d', {dmy})
+    END)"""
+
+
+def date_key_sql(expr):
+    """'YYYY-MM-DD' of a stored date, which sorts as the dates do"""
+    mdy_day = f"CAST(substr({expr}, instr({expr}, '/') + 1) AS INTEGER)"
+    dmy = month_number_sql(f"substr({expr}, instr({expr}, ' ') + 1)")
+    return f"""(CASE
+        WHEN {expr} GLOB '[0-9][0-9][0-9][0-9]-[01][0-9]-[0-3][0-9]*' THEN substr({expr}, 1, 10)
+        WHEN {expr} GLOB '[0-9]*/*/[0-9][0-9][0-9][0-9]'
+            THEN substr({expr}, -4) || printf('-%02d-%02d', CAST({expr} AS INTEGER), {mdy_day})
+        WHEN {expr} GLOB '[0-9]* [A-Za-z][A-Za-z][A-Za-z]* [0-9][0-9][0-9][0-9]' AND {dmy} IS NOT NULL
+            THEN substr({expr}, -4) || printf('-%02d-%02d', {dmy}, CAST({expr} AS INTEGER))
+    END)"""
+
+
+def date_sort_sql(expr):
+    """What a list sorts a date column by: date_key_sql(), or the text itself where that is NULL"""
+    return f"IFNULL({date_key_sql(expr)}, {expr})"
+
+
+def period_key_sql(month_expr, date_expr):
+    """'YYYY-MM' of a salary record: its month name in the year it was paid"""
+    year = year_sql(date_expr)
+    number = month_number_sql(month_expr)
+    return f"""(CASE WHEN ({year}) GLOB '[0-9][0-9][0-9][0-9]' AND {number} IS NOT NULL
+        THEN ({year}) || printf('-%02d', {number}) END)"""
+
+
+def month_number(name):
+    """1-12 for a month name or its three-letter abbreviation, or None"""
+    name = (name or "").strip().upper()
+    position = MONTH_ABBREVIATIONS.find(name[:3]) if len(name) >= 3 else -1
+    return position // 3 + 1 if position >= 0 and position % 3 == 0 else None
+
+
+def parse(text):
+    """datetime.date of a stored date, or None"""
+    text = (text or "").strip()
+    try:
+        if "/" in text:
+            month, day, year = text.split("/")
+            return datetime.date(int(year), int(month), int(day))
+        if " " in text:
+            day, name, year = text.split()
+            return datetime.date(int(year), month_number(name), int(day))
+        return datetime.date.fromisoformat(text[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _leading_int(text):
+    """The number at the start of `text`, as CAST(text AS INTEGER) reads it"""
+    number = re.match(r"\s*([+-]?[0-9]*)", text).group(1)
+    return int(number) if number.lstrip("+-") else 0
+
+
+def date_key(text):
+    """'YYYY-MM-DD' of a stored date, read as date_key_sql() does, or None"""
+    text = text or ""
+    if re.match(r"[0-9]{4}-[01][0-9]-[0-3][0-9]", text):
+        return text[:10]
+    if re.fullmatch(r"[0-9].*/.*/[0-9]{4}", text, re.S):
+        return f"{text[-4:]}-{_leading_int(text):02d}-{_leading_int(text[text.index('/') + 1:]):02d}"
+    if re.fullmatch(r"[0-9].* [A-Za-z]{3}.* [0-9]{4}", text, re.S):
+        number = month_number(text[text.index(" ") + 1:])
+        if number is not None:
+            return f"{text[-4:]}-{number:02d}-{_leading_int(text):02d}"
+    return None
+
+
+def year_of(text):
+    """Year of a stored date, read as year_sql() does, or None"""
+    text = text or ""
+    year = text[:4] if text[:4].isdigit() and text[4:5] == "-" else text[-4:]
+    return int(year) if len(year) == 4 and year.isdigit() else None
+
+
+def day_number(text):
+    """Days from 1970-01-01 to a stored date, or None"""
+    date = parse(text)
+    return (date - EPOCH).days if date is not None else None
+
+
+def period_number(month_name, date_text):
+    """Months from January 1970 to a salary record's period, read as period_key_sql() does, or None"""
+    number = month_number(month_name)
+    year = year_of(date_text)
+    if number is None or year is None:
+        return None
+    return (year - 1970) * 12 + number - 1
@@ -0,0 +1,443 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from modules import events, migrations
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.environ.get("FIRM_DB_PATH", os.path.join(BASE_DIR, "database", "firm.db"))
+# e.g. http://office-pc:8765: talk to a modules/server.py instance instead of a file (see remote.py)
+SERVER_URL = os.environ.get("FIRM_SERVER")
+
+# ---- BUSY RETRIES ----
+# busy_timeout makes SQLite itself wait for another writer's lock; when that
+# runs out, BEGIN and COMMIT are tried again a few times after a growing,
+# jittered pause, so several desktops saving at once queue up instead of
+# failing with "database is locked". Nothing inside the transaction is ever
+# repeated: BEGIN has run nothing yet, and a busy COMMIT leaves it open.
+BUSY_RETRIES = 4
+BUSY_BACKOFF = 0.05  # seconds before the first retry; doubles on each one
+
+# ---- PRAGMA PROFILES ----
+# foreign_keys stays off in the default profile: existing firm.db files carry
+# orphaned rows (e.g. payments for deleted projects) and deletes in the
+# dashboard rely on not cascading.
+PRAGMA_PROFILES = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,       # negative = KiB, ~16 MB page cache
+        "busy_timeout": 5000,       # ms
+        "foreign_keys": "OFF",
+        "temp_store": "MEMORY",
+    },
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "busy_timeout": 10000,
+        "foreign_keys": "ON",
+        "temp_store": "MEMORY",
+    },
+    "bulk": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -131072,
+        "busy_timeout": 30000,
+        "foreign_keys": "OFF",
+        "temp_store": "MEMORY",
+    },
+}
+
+
+class DbStats:
+    """Thread-safe counters for connects, queries and time spent executing"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.queries = 0
+            self.query_time = 0.0
+            self.busy_retries = 0
+
+    def add_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def add_query(self, elapsed):
+        with self._lock:
+            self.queries += 1
+            self.query_time += elapsed
+
+    def add_busy(self):
+        with self._lock:
+            self.busy_retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "queries": self.queries,
+                "query_time": self.query_time,
+                "busy_retries": self.busy_retries,
+            }
+
+
+class _CountingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.stats.add_query(time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.stats.add_query(time.perf_counter() - start)
+
+
+class _TracedCursor(_CountingCursor):
+    """Cursor used while a tracer is installed (see tracing.py).
+
+    Each statement stays open until its rows are exhausted, the cursor runs
+    another statement, or the cursor goes away; fetch time and rows count
+    towards it.
+    """
+
+    _statement = None
+
+    def _finish(self):
+        statement = self._statement
+        if statement is not None:
+            self._statement = None
+            if statement.rows == 0 and self.rowcount > 0:
+                statement.rows = self.rowcount  # INSERT / UPDATE / DELETE
+            tracer = self.connection.tracer
+            if tracer is not None:
+                tracer.finish(self.connection, statement)
+
+    def _timed(self, method, *args):
+        statement = self._statement
+        if statement is None:
+            return method(*args)
+        self.connection.trace_current = statement
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            statement.seconds += time.perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        tracer = self.connection.tracer
+        if tracer is not None:
+            self._statement = tracer.begin(self.connection, sql, parameters)
+        result = self._timed(super().execute, sql, parameters)
+        if self.description is None:
+            self._finish()
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        tracer = self.connection.tracer
+        if tracer is not None:
+            self._statement = tracer.begin(self.connection, sql, None)
+        try:
+            return self._timed(super().executemany, sql, seq_of_parameters)
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._statement is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._statement.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._statement is not None:
+            self._statement.rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._statement is not None:
+            self._statement.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._statement is not None:
+            self._statement.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._statement is not None:
+            self._finish()
+
+
+class _CountingConnection(sqlite3.Connection):
+    stats = None
+    tracer = None
+    trace_current = None  # statement the trace/progress callbacks are charged to
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = _CountingCursor if self.tracer is None else _TracedCursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _busy(error):
+    code = getattr(error, "sqlite_errorcode", None)  # Python 3.11+
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+def _run_busy(conn, sql):
+    """Run a BEGIN or COMMIT, retrying while other connections hold the write lock"""
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return conn.execute(sql)
+        except sqlite3.OperationalError as error:
+            if attempt == BUSY_RETRIES or not _busy(error):
+                raise
+            conn.stats.add_busy()
+            time.sleep(BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+class ConnectionPool:
+    """One long-lived connection per thread, opened lazily with a pragma profile.
+
+    The first connection a pool opens upgrades the schema (see migrations.py).
+    """
+
+    remote = False  # see remote.RemotePool
+
+    def __init__(self, path=DB_PATH, profile="default", migrate=True, tracer=None):
+        self.path = path
+        self.tracer = tracer
+        self.migrate = migrate
+        self.pragmas = dict(PRAGMA_PROFILES[profile]) if isinstance(profile, str) else dict(profile)
+        self.stats = DbStats()
+        self._lock = threading.Lock()
+        # keyed by OS thread id rather than threading.local: Qt pool threads drop
+        # their Python thread state between tasks, which would discard a local
+        self._connections = {}  # thread ident -> (connection, python thread or None)
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,       # transactions are explicit, see transaction()
+            check_same_thread=False,    # only so close_all() can close other threads' connections
+            cached_statements=256,
+            factory=_CountingConnection,
+        )
+        conn.stats = self.stats
+        conn.pending_changes = []  # events.Change held until the open transaction commits
+        if self.tracer is not None:
+            conn.tracer = self.tracer
+            self.tracer.install(conn)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        self.stats.add_connect()
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        entry = self._connections.get(threading.get_ident())
+        if entry is not None:
+            return entry[0]
+        conn = self._open()
+        thread = threading.current_thread()
+        if isinstance(thread, threading._DummyThread):
+            thread = None  # foreign (Qt) thread: lives as long as its pool
+        with self._lock:
+            if self.migrate:
+                migrations.migrate(conn)
+                self.migrate = False
+            self._prune()
+            self._connections[threading.get_ident()] = (conn, thread)
+        return conn
+
+    def _prune(self):
+        # Python worker threads come and go; drop connections whose thread has exited
+        for ident, (conn, thread) in list(self._connections.items()):
+            if thread is not None and not thread.is_alive():
+                del self._connections[ident]
+                conn.close()
+
+    @contextmanager
+    def transaction(self, mode="IMMEDIATE"):
+        """BEGIN ... COMMIT on this thread's connection, ROLLBACK on error"""
+        conn = self.connection()
+        if conn.in_transaction:
+            # nested use joins the outer transaction
+            yield conn
+            return
+        _run_busy(conn, f"BEGIN {mode}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            conn.pending_changes.clear()
+            raise
+        else:
+            try:
+                _run_busy(conn, "COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                conn.pending_changes.clear()
+                raise
+            changes, conn.pending_changes = conn.pending_changes, []
+            for change in changes:
+                events.bus.publish(change)
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def execute(self, sql, params=()):
+        """Run a single write statement in its own transaction, return the cursor"""
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def set_tracer(self, tracer):
+        """Install a tracing.Tracer on every connection, current and future (None removes it)"""
+        with self._lock:
+            self.tracer = tracer
+            for conn, _thread in self._connections.values():
+                if conn.tracer is not None:
+                    conn.tracer.uninstall(conn)
+                conn.tracer = tracer
+                conn.trace_current = None
+                if tracer is not None:
+                    tracer.install(conn)
+
+    def close_all(self):
+        with self._lock:
+            for conn, _thread in self._connections.values():
+                conn.close()
+            self._connections.clear()
+
+
+# ---- MODULE LEVEL POOL ----
+# remote.py's error lives here, so code that catches it does not import http.client
+class RemoteError(Exception):
+    """The server refused a request, or cannot be reached"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_tracer = None
+
+
+def _new_pool(path, profile="default", migrate=True):
+    path = path or SERVER_URL or DB_PATH
+    if path.startswith(("http://", "https://")):
+        from modules.remote import RemotePool  # imports this module
+
+        return RemotePool(path)
+    return ConnectionPool(path, profile, migrate, _tracer)
+
+
+def configure(path=None, profile="default", migrate=True):
+    """Replace the shared pool, e.g. to point at another database file or a server URL"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = _new_pool(path, profile, migrate)
+    return _pool
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(None)
+    return _pool
+
+
+def remote():
+    """The remote.RemotePool when the app talks to a server, else None"""
+    pool = get_pool()
+    return pool if pool.remote else None
+
+
+def connection():
+    return get_pool().connection()
+
+
+def transaction(mode="IMMEDIATE"):
+    return get_pool().transaction(mode)
+
+
+def query(sql, params=()):
+    return get_pool().query(sql, params)
+
+
+def query_one(sql, params=()):
+    return get_pool().query_one(sql, params)
+
+
+def execute(sql, params=()):
+    return get_pool().execute(sql, params)
+
+
+def stats():
+    return get_pool().stats.snapshot()
+
+
+def reset_stats():
+    get_pool().stats.reset()
+
+
+def set_tracer(tracer):
+    """Trace the shared pool, and any pool configure() replaces it with"""
+    global _tracer
+    _tracer = tracer
+    get_pool().set_tracer(tracer)
+
+
+def close_all():
+    if _pool is not None:
+        _pool.close_all()
@@ -0,0 +1,56 @@
+from PyQt5 import QtCore
+
+from modules import db_connection, events
+
+
+class ChangeBridge(QtCore.QObject):
+    """Delivers events.Change on the GUI thread, coalesced.
+
+    Changes published on any thread are queued to the GUI thread and held
+    for `debounce_ms`; `changed` then fires once with all of them in order.
+    With `watch_ms` the database is also polled for commits by other
+    processes (events.DataVersionWatcher), which arrive as events.EXTERNAL.
+    """
+
+    changed = QtCore.pyqtSignal(list)   # [events.Change]
+    _arrived = QtCore.pyqtSignal(object)
+
+    def __init__(self, debounce_ms=50, watch_ms=None, bus=events.bus, parent=None):
+        super().__init__(parent)
+        self.bus = bus
+        self._pending = []
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.flush)
+        self._arrived.connect(self._queue, QtCore.Qt.QueuedConnection)
+        self._subscription = subscription = bus.subscribe(self._arrived.emit)
+        self.destroyed.connect(lambda *_: bus.unsubscribe(subscription))
+        self.watcher = None
+        if watch_ms:
+            self.watcher = events.DataVersionWatcher(db_connection.connection, bus)
+            self._watch = QtCore.QTimer(self)
+            self._watch.timeout.connect(self.watcher.poll)
+            self._watch.start(watch_ms)
+            self.watcher.poll()  # baseline version
+
+    def close(self):
+        self.bus.unsubscribe(self._subscription)
+        self._timer.stop()
+        if self.watcher is not None:
+            self._watch.stop()
+
+    def _queue(self, change):
+        self._pending.append(change)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def pending(self):
+        return bool(self._pending)
+
+    def flush(self):
+        """Deliver everything held now instead of when the debounce runs out"""
+        self._timer.stop()
+        changes, self._pending = self._pending, []
+        if changes:
+            self.changed.emit(changes)
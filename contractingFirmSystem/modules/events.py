@@ -0,0 +1,83 @@
+import threading
+from collections import namedtuple
+
+# ---- DATA CHANGE EVENTS ----
+# The data layer publishes one Change per write once it is committed; views
+# and caches subscribe instead of every write deciding what to refresh.
+# Writes made inside a transaction are held on the connection and published
+# by db_connection when the transaction commits (dropped on rollback).
+# Subscribers run on the publishing thread; see event_bridge.py for the
+# Qt side. Pure Python, no Qt or database imports.
+
+Change = namedtuple("Change", "table op ids")  # op: insert/update/delete/external; ids: tuple, or None = unknown
+
+EXTERNAL = Change(None, "external", None)  # another process wrote; anything may have changed
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = []   # (callback, tables or None)
+        self.sequence = 0        # changes published so far
+
+    def subscribe(self, callback, tables=None):
+        """Call `callback(change)` for changes to `tables` (default: all, including EXTERNAL)"""
+        entry = (callback, frozenset(tables) if tables is not None else None)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+        return entry
+
+    def unsubscribe(self, entry):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not entry]
+
+    def publish(self, change):
+        with self._lock:
+            self.sequence += 1
+            subscribers = self._subscribers
+        for callback, tables in subscribers:
+            if tables is None or change.table is None or change.table in tables:
+                callback(change)
+
+
+bus = EventBus()
+
+
+def publish(table, op, ids=None, conn=None):
+    """Publish a write to `table`, or hold it until `conn`'s open transaction commits"""
+    change = Change(table, op, tuple(ids) if ids is not None else None)
+    if conn is not None and conn.in_transaction:
+        conn.pending_changes.append(change)
+    else:
+        bus.publish(change)
+
+
+def subscribe(callback, tables=None):
+    return bus.subscribe(callback, tables)
+
+
+class DataVersionWatcher:
+    """Notices commits by other processes through PRAGMA data_version.
+
+    data_version moves whenever another connection commits, which includes
+    this process's own worker connections; a move with no change published
+    here since the last poll is reported as EXTERNAL. A foreign write landing
+    in the same interval as a local one is taken for local.
+    """
+
+    def __init__(self, connection, bus=bus):
+        self.connection = connection  # callable returning the polling thread's connection
+        self.bus = bus
+        self._version = None
+        self._sequence = bus.sequence
+
+    def poll(self):
+        """Check once; returns True if an external change was published"""
+        version = self.connection().execute("PRAGMA data_version").fetchone()[0]
+        sequence = self.bus.sequence
+        external = self._version is not None and version != self._version and sequence == self._sequence
+        self._version = version
+        if external:
+            self.bus.publish(EXTERNAL)
+        self._sequence = self.bus.sequence
+        return external
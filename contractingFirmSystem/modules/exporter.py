@@ -0,0 +1,190 @@
+import argparse
+import csv
+import io
+import math
+import re
+import sys
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+from modules import db_connection
+from modules.sources import SOURCES
+
+# ---- STREAMING EXPORT ----
+# Rows go from a cursor, FETCH_SIZE at a time, straight into the writer, so
+# memory stays flat however large the result is. XLSX is written as a zip
+# stream of sheet XML with inline strings; no spreadsheet library is needed.
+
+FETCH_SIZE = 2000
+PROGRESS_EVERY = 50000  # rows between progress callbacks
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def iter_rows(sql, params=(), conn=None):
+    """Yield the rows of a query, fetching FETCH_SIZE rows at a time"""
+    conn = conn if conn is not None else db_connection.connection()
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def _counted(rows, progress, cancelled):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_EVERY == 0:
+            if cancelled is not None and cancelled():
+                raise ExportCancelled()
+            if progress:
+                progress(count)
+    if progress:
+        progress(count)
+
+
+def write_csv(path, headers, rows):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+# ---- XLSX ----
+XLSX_MAX_ROWS = 1048576  # per sheet, header included; longer exports continue on a new sheet
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# characters XML 1.0 cannot carry at all
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return f"<c><v>{value!r}</v></c>"
+    text = escape(_INVALID_XML.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_package(sheet_names):
+    """The fixed parts of a workbook with the given sheets: {part name: xml}"""
+    numbers = range(1, len(sheet_names) + 1)
+    sheet_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+    return {
+        "[Content_Types].xml": (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{sheet_type}"/>'
+                      for n in numbers)
+            + "</Types>"
+        ),
+        "_rels/.rels": (
+            f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">'
+            + "".join(f'<Relationship Id="rId{n}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                      for n in numbers)
+            + "</Relationships>"
+        ),
+        "xl/workbook.xml": (
+            f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            + "".join(f'<sheet name="{escape(name)}" sheetId="{n}" r:id="rId{n}"/>'
+                      for n, name in zip(numbers, sheet_names))
+            + "</sheets></workbook>"
+        ),
+    }
+
+
+def write_xlsx(path, headers, rows, sheet_name="Export"):
+    count = 0
+    sheet_name = re.sub(r"[\[\]:*?/\\]", "", sheet_name)[:25] or "Export"
+    header_xml = "<row>" + "".join(_cell(h) for h in headers) + "</row>"
+    rows = iter(rows)
+    sheet_names = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        more = True
+        while more:
+            sheet_names.append(sheet_name if not sheet_names else f"{sheet_name} {len(sheet_names) + 1}")
+            with archive.open(f"xl/worksheets/sheet{len(sheet_names)}.xml", "w", force_zip64=True) as raw:
+                sheet = io.TextIOWrapper(raw, encoding="utf-8")
+                sheet.write(f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}"><sheetData>{header_xml}')
+                more = False
+                for written, row in enumerate(rows, 2):
+                    sheet.write("<row>" + "".join(_cell(v) for v in row) + "</row>")
+                    count += 1
+                    if written == XLSX_MAX_ROWS:
+                        more = True
+                        break
+                sheet.write("</sheetData></worksheet>")
+                sheet.flush()
+                sheet.detach()
+        for name, content in _xlsx_package(sheet_names).items():
+            archive.writestr(name, content)
+    return count
+
+
+def export_rows(path, headers, rows, progress=None, cancelled=None, title="Export"):
+    """Write `rows` to `path` as .xlsx or .csv (by extension); returns the row count.
+
+    `progress(rows_written)` is called every PROGRESS_EVERY rows; a true
+    `cancelled()` stops the export with ExportCancelled.
+    """
+    rows = _counted(rows, progress, cancelled)
+    if path.lower().endswith(".xlsx"):
+        return write_xlsx(path, headers, rows, title)
+    return write_csv(path, headers, rows)
+
+
+def export_query(path, headers, sql, params=(), progress=None, cancelled=None, title="Export"):
+    return export_rows(path, headers, iter_rows(sql, params), progress, cancelled, title)
+
+
+def export_view(path, source, state=None, progress=None, cancelled=None, title="Export"):
+    """Export a list tab as it is sorted and filtered in `state` (default: unfiltered)"""
+    sql, params = source.query(state or source.default_state())
+    return export_query(path, source.headers, sql, params, progress, cancelled, title)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m modules.exporter", description="Export a table or query to CSV or XLSX"
+    )
+    parser.add_argument("what", help=f"one of {', '.join(SOURCES)}, or a SELECT statement")
+    parser.add_argument("output", help="output file, .csv or .xlsx")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db)
+    start = time.perf_counter()
+    report = lambda n: print(f"\r{n} rows", end="", file=sys.stderr)
+    if args.what in SOURCES:
+        written = export_view(args.output, SOURCES[args.what], progress=report, title=args.what.capitalize())
+    else:
+        cursor = db_connection.connection().execute(args.what)
+        headers = [d[0] for d in cursor.description]
+        rows = (row for batch in iter(lambda: cursor.fetchmany(FETCH_SIZE), []) for row in batch)
+        written = export_rows(args.output, headers, rows, progress=report)
+    print(file=sys.stderr)
+    print(f"{written} rows written to {args.output} in {time.perf_counter() - start:.1f}s")
+    db_connection.close_all()
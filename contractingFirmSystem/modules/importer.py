@@ -0,0 +1,236 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import namedtuple
+
+from modules import db_connection, migrations, repositories
+
+# ---- CSV IMPORT ----
+# Rows are validated with the same rules as the dashboard forms, then written
+# with executemany, one transaction per batch. Foreign keys given by name
+# (a payment's project) are resolved from a lookup read once up front.
+
+Field = namedtuple("Field", "column headers coerce lookup required")
+ImportSpec = namedtuple("ImportSpec", "table label fields")
+ImportReport = namedtuple("ImportReport", "imported rejected errors reject_path seconds")
+
+MACHINE_STATUSES = ("Available", "In Use", "Under Repair", "Broken")
+MAX_REPORTED_ERRORS = 100
+
+
+def _text(value):
+    return value.strip() or None
+
+
+def _required(message):
+    def coerce(value):
+        value = value.strip()
+        if not value:
+            raise ValueError(message)
+        return value
+    return coerce
+
+
+def _number(message, required_message=None, default=0.0):
+    def coerce(value):
+        value = value.strip()
+        if not value:
+            if required_message:
+                raise ValueError(required_message)
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(message) from None
+    return coerce
+
+
+def _choice(choices, default):
+    by_name = {c.casefold(): c for c in choices}
+
+    def coerce(value):
+        value = value.strip()
+        if not value:
+            return default
+        try:
+            return by_name[value.casefold()]
+        except KeyError:
+            raise ValueError(f"Status must be one of: {', '.join(choices)}") from None
+    return coerce
+
+
+def _field(column, headers, coerce=_text, lookup=None, required=False):
+    return Field(column, tuple(h.casefold() for h in headers), coerce, lookup, required)
+
+
+SPECS = {
+    "clients": ImportSpec("clients", "Clients", [
+        _field("name", ("name", "client", "client name"), _required("Client name is required"), required=True),
+        _field("contact", ("contact", "phone")),
+        _field("address", ("address",)),
+    ]),
+    "employees": ImportSpec("employees", "Employees", [
+        _field("name", ("name", "employee", "employee name"), _required("Employee name is required"), required=True),
+        _field("phone", ("phone", "contact")),
+        _field("cnic", ("cnic",)),
+        _field("designation", ("designation",)),
+        _field("salary", ("salary",), _number("Salary must be a number")),
+    ]),
+    "machines": ImportSpec("machines", "Machines", [
+        _field("machine_name", ("machine_name", "name", "machine"), _required("Machine name is required"), required=True),
+        _field("machine_type", ("machine_type", "type")),
+        _field("purchase_date", ("purchase_date", "purchase date")),
+        _field("cost", ("cost",), _number("Cost must be a number")),
+        _field("status", ("status",), _choice(MACHINE_STATUSES, MACHINE_STATUSES[0])),
+    ]),
+    "payments": ImportSpec("payments", "Payments", [
+        _field("project_id", ("project", "project_name", "project name", "project_id"),
+               _required("Project is required"), lookup=("projects", "project_name"), required=True),
+        _field("amount", ("amount",), _number("Amount must be a number", "Payment amount required"), required=True),
+        _field("date", ("date",)),
+    ]),
+}
+
+
+def _load_lookup(conn, table, name_column):
+    """({casefolded name: id}, {every id}); names used by more than one row map to None"""
+    lookup, ids = {}, set()
+    for row_id, name in conn.execute(f"SELECT id, {name_column} FROM {table}"):
+        ids.add(row_id)
+        if name is None:
+            continue
+        key = name.strip().casefold()
+        lookup[key] = None if key in lookup else row_id
+    return lookup, ids
+
+
+def _resolver(coerce, lookup, ids, label):
+    def resolve(value):
+        value = coerce(value)
+        key = value.casefold()
+        if lookup.get(key) is not None:
+            return lookup[key]
+        # an id still works when its row's name is shared with another row
+        if value.isdigit() and int(value) in ids:
+            return int(value)
+        if key in lookup:
+            raise ValueError(f"{label} '{value}' matches more than one row")
+        raise ValueError(f"Unknown {label.lower()} '{value}'")
+    return resolve
+
+
+def _columns(spec, header):
+    """Position of each field's column in the CSV header"""
+    positions = {name.strip().casefold(): i for i, name in enumerate(header)}
+    found = []
+    for field in spec.fields:
+        position = next((positions[h] for h in field.headers if h in positions), None)
+        if position is None and field.required:
+            raise ValueError(f"CSV has no '{field.headers[0]}' column")
+        found.append(position)
+    return found
+
+
+def import_csv(path, entity, batch_size=20000, progress=None, reject_path=None):
+    """Import the rows of a CSV file into `entity`; returns an ImportReport.
+
+    Rejected rows are written, with their line number and reason, to
+    `reject_path` (default: <file>.rejected.csv next to the input).
+    `progress(rows_read)` is called after every batch.
+    """
+    spec = SPECS[entity]
+    start = time.perf_counter()
+    conn = db_connection.connection()
+
+    coercers = []
+    for field in spec.fields:
+        if field.lookup:
+            lookup, ids = _load_lookup(conn, *field.lookup)
+            coercers.append(_resolver(field.coerce, lookup, ids, field.headers[0].capitalize()))
+        else:
+            coercers.append(field.coerce)
+
+    repository = repositories.BY_TABLE[spec.table]
+    columns = [f.column for f in spec.fields]
+
+    if reject_path is None:
+        reject_path = os.path.splitext(path)[0] + ".rejected.csv"
+    imported = rejected = 0
+    errors = []
+    reject_file = reject_writer = None
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError("CSV file is empty")
+        positions = _columns(spec, header)
+        pairs = list(zip(positions, coercers))
+        batch = []
+        try:
+            for row in reader:
+                if not any(cell.strip() for cell in row):
+                    continue
+                try:
+                    batch.append(tuple(
+                        coerce(row[pos] if pos is not None and pos < len(row) else "")
+                        for pos, coerce in pairs
+                    ))
+                except ValueError as e:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append((reader.line_num, str(e)))
+                    if reject_writer is None:
+                        reject_file = open(reject_path, "w", newline="", encoding="utf-8")
+                        reject_writer = csv.writer(reject_file)
+                        reject_writer.writerow(["line", "error"] + header)
+                    reject_writer.writerow([reader.line_num, str(e)] + row)
+                    continue
+                if len(batch) >= batch_size:
+                    repository.insert_many(batch, columns)
+                    imported += len(batch)
+                    batch = []
+                    if progress:
+                        progress(imported + rejected)
+            if batch:
+                repository.insert_many(batch, columns)
+                imported += len(batch)
+                if progress:
+                    progress(imported + rejected)
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+
+    migrations.refresh_stats(conn)
+    return ImportReport(
+        imported, rejected, errors, reject_path if rejected else None, time.perf_counter() - start,
+    )
+
+
+def format_report(report):
+    lines = [f"Imported {report.imported} rows in {report.seconds:.1f}s"]
+    if report.rejected:
+        lines.append(f"Rejected {report.rejected} rows (see {report.reject_path})")
+        lines += [f"  line {line}: {error}" for line, error in report.errors[:10]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m modules.importer", description="Import a CSV file")
+    parser.add_argument("entity", choices=sorted(SPECS))
+    parser.add_argument("csv_file")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    parser.add_argument("--batch", type=int, default=20000, help="rows per transaction")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db, profile="bulk")
+    result = import_csv(
+        args.csv_file, args.entity, args.batch,
+        progress=lambda n: print(f"\r{n} rows read", end="", file=sys.stderr),
+    )
+    print(file=sys.stderr)
+    print(format_report(result))
+    db_connection.close_all()
+    sys.exit(1 if result.rejected else 0)
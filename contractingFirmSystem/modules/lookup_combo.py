@@ -0,0 +1,115 @@
+from PyQt5 import QtCore, QtWidgets
+
+from modules import lookups
+
+MAX_MATCHES = 200  # completer rows shown while typing
+
+
+class LookupModel(QtCore.QAbstractListModel):
+    """List model reading a Lookup in place: names for display, ids as UserRole.
+
+    Nothing is copied into Qt items, so a 100k-row lookup costs only the
+    rows a view actually paints.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lookup = None
+        self._rows = []  # row numbers of the lookup shown, in order
+
+    def set_lookup(self, lookup, rows=None):
+        self.beginResetModel()
+        self.lookup = lookup
+        self._rows = rows if rows is not None else range(len(lookup.rows))
+        self.endResetModel()
+
+    def lookup_row(self, row):
+        return self._rows[row]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row_id, name = self.lookup.rows[self._rows[index.row()]]
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            return "" if name is None else str(name)
+        if role == QtCore.Qt.UserRole:
+            return row_id
+        return None
+
+
+class LookupCombo(QtCore.QObject):
+    """Backs a QComboBox with a cached lookup and a substring-matching completer.
+
+    The combo becomes editable; typing shows up to MAX_MATCHES names that
+    contain the text anywhere, and picking one selects it in the combo.
+    """
+
+    def __init__(self, combo, name, executor=None):
+        super().__init__(combo)
+        self.combo = combo
+        self.name = name
+        self.executor = executor
+        self.model = LookupModel(self)
+        self.matches = LookupModel(self)
+
+        combo.setEditable(True)
+        combo.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        # measuring every item for the width or the popup would read them all
+        combo.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        combo.setMinimumContentsLength(20)
+        combo.setModel(self.model)
+        # the popup lays out rows in batches as it scrolls instead of all up front
+        combo.view().setUniformItemSizes(True)
+        combo.view().setLayoutMode(QtWidgets.QListView.Batched)
+        combo.view().setBatchSize(200)
+
+        self.completer = QtWidgets.QCompleter(self.matches, self)
+        self.completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(12)
+        self.completer.popup().setUniformItemSizes(True)
+        combo.setCompleter(self.completer)
+        self.completer.activated[QtCore.QModelIndex].connect(self._picked)
+        combo.lineEdit().textEdited.connect(self._filter)
+
+    def refresh(self):
+        """Show the current lookup; read on a worker only if the cache was invalidated"""
+        lookup = lookups.cached(self.name)
+        if lookup is not None:
+            self._show(lookup)
+        elif self.executor is None:
+            self._show(lookups.get(self.name))
+        else:
+            self.executor.submit(lookups.get, self.name, on_result=self._show, key=("lookup", self.name))
+
+    def _show(self, lookup):
+        if lookup is self.model.lookup:
+            return  # unchanged: keep the selection
+        current = self.current_id()
+        self.model.set_lookup(lookup)
+        self.matches.set_lookup(lookup, [])
+        index = self.combo.findData(current) if current is not None else -1
+        self.combo.setCurrentIndex(index if index >= 0 else 0)
+
+    def _filter(self, text):
+        if self.model.lookup is None:
+            return
+        self.matches.set_lookup(self.model.lookup, lookups.matches(self.model.lookup, text, MAX_MATCHES))
+        self.completer.complete()
+
+    def _picked(self, index):
+        self.combo.setCurrentIndex(self.matches.lookup_row(index.row()))
+
+    def current_id(self):
+        """Id of the selected name, or None if the typed text names no row"""
+        row = self.combo.currentIndex()
+        if row < 0 or self.model.lookup is None:
+            return None
+        if self.combo.currentText() != self.combo.itemText(row):
+            typed = self.combo.currentText().strip().casefold()
+            row = next((r for r, name in enumerate(self.model.lookup.folded) if name == typed), -1)
+            if row < 0:
+                return None
+        return self.model.lookup.rows[row][0]
@@ -0,0 +1,82 @@
+import threading
+from collections import namedtuple
+
+from modules import events, repositories
+
+# ---- LOOKUP CACHE ----
+# The (id, name) lists behind the dashboard dropdowns, read once and kept
+# until a change event (see events.py) touches their table. Every read makes a
+# new Lookup, so a dropdown can tell whether the one it shows is current.
+
+Lookup = namedtuple("Lookup", "name rows folded")  # rows: [(id, name)]; folded: casefolded names
+
+LOOKUPS = {
+    # name: (table whose writes invalidate it, reader)
+    "clients": ("clients", repositories.clients.options),
+    "projects": ("projects", repositories.projects.options),
+    "active_employees": ("employees", repositories.employees.active_options),
+}
+
+_cache = {}
+_versions = {}   # name -> invalidation count, so a read racing a write is not cached
+_lock = threading.Lock()
+
+
+def get(name):
+    """The lookup `name`, read from the database if it is not cached"""
+    with _lock:
+        lookup = _cache.get(name)
+        version = _versions.get(name, 0)
+    if lookup is not None:
+        return lookup
+    rows = LOOKUPS[name][1]()
+    lookup = Lookup(name, rows, [("" if label is None else str(label)).casefold() for _id, label in rows])
+    with _lock:
+        if _versions.get(name, 0) == version:
+            _cache[name] = lookup
+    return lookup
+
+
+def cached(name):
+    """The cached lookup, or None when it has to be read"""
+    return _cache.get(name)
+
+
+def invalidate(table):
+    """Drop every lookup read from `table`"""
+    with _lock:
+        for name, (source_table, _read) in LOOKUPS.items():
+            if source_table == table:
+                _cache.pop(name, None)
+                _versions[name] = _versions.get(name, 0) + 1
+
+
+def clear():
+    with _lock:
+        for name in _cache:
+            _versions[name] = _versions.get(name, 0) + 1
+        _cache.clear()
+
+
+def matches(lookup, text, limit=None):
+    """Row numbers whose name contains `text`, ignoring case, in lookup order"""
+    text = text.strip().casefold()
+    if not text:
+        return list(range(len(lookup.rows)))[:limit]
+    found = []
+    for row, name in enumerate(lookup.folded):
+        if text in name:
+            found.append(row)
+            if len(found) == limit:
+                break
+    return found
+
+
+def _on_change(change):
+    if change.table is None:
+        clear()  # external writer
+    else:
+        invalidate(change.table)
+
+
+events.subscribe(_on_change)
@@ -0,0 +1,700 @@
+import sqlite3
+import sys
+import time
+
+from modules import dates
+
+# ---- SCHEMA MIGRATIONS ----
+# Each entry is (version, description, statements). A database at version N
+# gets every migration above N applied in order, each in its own transaction
+# together with the PRAGMA user_version bump, so an interrupted upgrade can
+# simply be re-run. Version 0 is a firm.db made before migrations existed.
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT DEFAULT 'employee'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        contact TEXT,
+        address TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER,
+        project_name TEXT NOT NULL,
+        project_value REAL DEFAULT 0,
+        start_date TEXT,
+        end_date TEXT,
+        status TEXT DEFAULT 'ongoing',
+        FOREIGN KEY (client_id) REFERENCES clients(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        project_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        date TEXT NOT NULL,
+        FOREIGN KEY (project_id) REFERENCES projects(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS machines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        machine_name TEXT NOT NULL,
+        machine_type TEXT,
+        purchase_date TEXT,
+        cost REAL DEFAULT 0,
+        status TEXT DEFAULT 'available'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        cnic TEXT,
+        designation TEXT,
+        salary REAL,
+        join_date TEXT DEFAULT CURRENT_DATE,
+        status TEXT DEFAULT 'active'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS employee_salaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER,
+        salary_amount REAL,
+        month TEXT,
+        date_paid TEXT,
+        status TEXT,
+        FOREIGN KEY (employee_id) REFERENCES employees(id)
+    )
+    """,
+]
+
+JOIN_AND_FILTER_INDEXES = [
+    # payments LEFT JOIN projects, and per-project sums: covers (project_id, amount, date)
+    "CREATE INDEX IF NOT EXISTS idx_payments_project ON payments(project_id, amount, date)",
+    # projects LEFT JOIN clients
+    "CREATE INDEX IF NOT EXISTS idx_projects_client ON projects(client_id)",
+    # COUNT(*) ... WHERE status='ongoing' is answered from the index alone
+    "CREATE INDEX IF NOT EXISTS idx_projects_status ON projects(status)",
+    # SELECT id, name FROM employees WHERE status='active': partial and covering (id is the rowid)
+    "CREATE INDEX IF NOT EXISTS idx_employees_active_name ON employees(name) WHERE status='active'",
+    "CREATE INDEX IF NOT EXISTS idx_employees_status ON employees(status)",
+    # employee_salaries JOIN employees, and "already paid this month" checks
+    "CREATE INDEX IF NOT EXISTS idx_salaries_employee_month ON employee_salaries(employee_id, month)",
+]
+
+def _bump(name, delta):
+    """Upsert statement adding `delta` (an SQL expression) to one dashboard_stats counter"""
+    return (
+        f"INSERT INTO dashboard_stats (name, value) VALUES ({name}, {delta}) "
+        f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"
+    )
+
+
+def _bump_salary_month(month, amount, records):
+    return (
+        f"INSERT INTO salary_month_totals (month, total, records) VALUES ({month}, {amount}, {records}) "
+        f"ON CONFLICT(month) DO UPDATE SET total = total + excluded.total, "
+        f"records = records + excluded.records;"
+    )
+
+
+def _bump_project(project_id, amount, payments):
+    return (
+        f"INSERT INTO project_totals (project_id, received, payments) VALUES ({project_id}, {amount}, {payments}) "
+        f"ON CONFLICT(project_id) DO UPDATE SET received = received + excluded.received, "
+        f"payments = payments + excluded.payments;"
+    )
+
+
+def _bump_cash_flow(month, income, payments, payroll, salaries):
+    return (
+        f"INSERT INTO cash_flow_months (month, income, payments, payroll, salaries) "
+        f"VALUES ({month}, {income}, {payments}, {payroll}, {salaries}) "
+        f"ON CONFLICT(month) DO UPDATE SET income = income + excluded.income, "
+        f"payments = payments + excluded.payments, payroll = payroll + excluded.payroll, "
+        f"salaries = salaries + excluded.salaries;"
+    )
+
+
+def _bump_client_income(client_id, month, income, payments):
+    return (
+        f"INSERT INTO client_month_income (client_id, month, income, payments) "
+        f"VALUES ({client_id}, {month}, {income}, {payments}) "
+        f"ON CONFLICT(client_id, month) DO UPDATE SET income = income + excluded.income, "
+        f"payments = payments + excluded.payments;"
+    )
+
+
+def _move_project_income(project_id, client_id, sign):
+    """Add (sign '') or remove (sign '-') the monthly income of one project's payments for a client"""
+    return (
+        f"INSERT INTO client_month_income (client_id, month, income, payments) "
+        f"SELECT {client_id}, IFNULL({dates.month_key_sql('date')}, ''), {sign}IFNULL(SUM(amount), 0), {sign}COUNT(*) "
+        f"FROM payments WHERE project_id = {project_id} GROUP BY 2 "
+        f"ON CONFLICT(client_id, month) DO UPDATE SET income = income + excluded.income, "
+        f"payments = payments + excluded.payments;"
+    )
+
+
+def _payment_month(row):
+    return f"IFNULL({dates.month_key_sql(row + '.date')}, '')"
+
+
+def _payment_client(row):
+    return f"IFNULL((SELECT client_id FROM projects WHERE id = {row}.project_id), 0)"
+
+
+def _salary_month(row):
+    return f"IFNULL({dates.period_key_sql(row + '.month', row + '.date_paid')}, '')"
+
+
+def _seed_stats(conn):
+    from modules import stats
+    stats.rebuild(conn)
+
+
+def _seed_project_totals(conn):
+    from modules import stats
+    stats.rebuild_project_totals(conn)
+
+
+def _seed_cash_flow(conn):
+    from modules import stats
+    stats.rebuild_cash_flow(conn)
+
+
+OVERVIEW_COUNTERS = [
+    # counters read by the Overview tab, kept current by triggers; see modules/stats.py
+    """
+    CREATE TABLE IF NOT EXISTS dashboard_stats (
+        name TEXT PRIMARY KEY,
+        value NUMERIC NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS salary_month_totals (
+        month TEXT PRIMARY KEY,
+        total REAL NOT NULL DEFAULT 0,
+        records INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_clients_insert AFTER INSERT ON clients BEGIN
+        {_bump("'clients'", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_clients_delete AFTER DELETE ON clients BEGIN
+        {_bump("'clients'", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_projects_insert AFTER INSERT ON projects BEGIN
+        {_bump("'projects'", 1)}
+        {_bump("'projects_status:' || IFNULL(NEW.status, '')", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_projects_delete AFTER DELETE ON projects BEGIN
+        {_bump("'projects'", -1)}
+        {_bump("'projects_status:' || IFNULL(OLD.status, '')", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_projects_status AFTER UPDATE OF status ON projects
+    WHEN OLD.status IS NOT NEW.status BEGIN
+        {_bump("'projects_status:' || IFNULL(OLD.status, '')", -1)}
+        {_bump("'projects_status:' || IFNULL(NEW.status, '')", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_payments_insert AFTER INSERT ON payments BEGIN
+        {_bump("'payments'", 1)}
+        {_bump("'payments_total'", "IFNULL(NEW.amount, 0)")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_payments_delete AFTER DELETE ON payments BEGIN
+        {_bump("'payments'", -1)}
+        {_bump("'payments_total'", "-IFNULL(OLD.amount, 0)")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_payments_amount AFTER UPDATE OF amount ON payments BEGIN
+        {_bump("'payments_total'", "IFNULL(NEW.amount, 0) - IFNULL(OLD.amount, 0)")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_salaries_insert AFTER INSERT ON employee_salaries BEGIN
+        {_bump_salary_month("IFNULL(NEW.month, '')", "IFNULL(NEW.salary_amount, 0)", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_salaries_delete AFTER DELETE ON employee_salaries BEGIN
+        {_bump_salary_month("IFNULL(OLD.month, '')", "-IFNULL(OLD.salary_amount, 0)", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_stats_salaries_update AFTER UPDATE OF salary_amount, month ON employee_salaries BEGIN
+        {_bump_salary_month("IFNULL(OLD.month, '')", "-IFNULL(OLD.salary_amount, 0)", -1)}
+        {_bump_salary_month("IFNULL(NEW.month, '')", "IFNULL(NEW.salary_amount, 0)", 1)}
+    END
+    """,
+    _seed_stats,
+]
+
+SORT_INDEXES = [
+    # columns the list tabs sort on; the rowid rides along in every index, which
+    # gives the (value, id) order keyset pagination seeks on. Sorting by a joined
+    # column (client name on Projects, say) still sorts in a temp b-tree.
+    "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(project_name)",
+    "CREATE INDEX IF NOT EXISTS idx_projects_value ON projects(project_value)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_amount ON payments(amount)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_date ON payments(date)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(name)",
+    "CREATE INDEX IF NOT EXISTS idx_salaries_month ON employee_salaries(month)",
+    "CREATE INDEX IF NOT EXISTS idx_salaries_date_paid ON employee_salaries(date_paid)",
+]
+
+def _fts_index(table, columns):
+    """External-content FTS5 table over `columns` of `table`, synced by triggers"""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"NEW.{c}" for c in columns)
+    old = ", ".join(f"OLD.{c}" for c in columns)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.id, {old});"
+    insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.id, {new});"
+    return [
+        # prefix='2 3' keeps type-ahead prefixes off the full term scan
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+            {delete_old}
+            {insert_new}
+        END
+        """,
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+SEARCH_INDEXES = (
+    # full-text search bar, see modules/search.py
+    _fts_index("clients", ["name", "contact", "address"])
+    + _fts_index("projects", ["project_name"])
+    + _fts_index("employees", ["name", "cnic", "designation"])
+    + _fts_index("machines", ["machine_name", "machine_type"])
+)
+
+PROJECT_TOTALS = [
+    # payments received per project, read by the Ledger tab; see modules/stats.py.
+    # Keyed by payments.project_id alone, so it always equals the grouped sum of
+    # payments, including any left behind by a deleted project.
+    """
+    CREATE TABLE IF NOT EXISTS project_totals (
+        project_id INTEGER PRIMARY KEY,
+        received REAL NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_totals_payments_insert AFTER INSERT ON payments BEGIN
+        {_bump_project("NEW.project_id", "IFNULL(NEW.amount, 0)", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_totals_payments_delete AFTER DELETE ON payments BEGIN
+        {_bump_project("OLD.project_id", "-IFNULL(OLD.amount, 0)", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_totals_payments_update AFTER UPDATE OF amount, project_id ON payments
+    WHEN OLD.amount IS NOT NEW.amount OR OLD.project_id IS NOT NEW.project_id BEGIN
+        {_bump_project("OLD.project_id", "-IFNULL(OLD.amount, 0)", -1)}
+        {_bump_project("NEW.project_id", "IFNULL(NEW.amount, 0)", 1)}
+    END
+    """,
+    _seed_project_totals,
+]
+
+CASH_FLOW_ROLLUPS = [
+    # money in and out per 'YYYY-MM' month (modules/dates.py reads it out of the
+    # stored date text), for the Reports tab; see modules/reports.py. Each write
+    # adjusts only the month, and for payments the client, it falls in. Dates
+    # in no known format land in month ''. A payment counts for the client of
+    # its project, or client 0 if the project has none or is gone.
+    """
+    CREATE TABLE IF NOT EXISTS cash_flow_months (
+        month TEXT PRIMARY KEY,
+        income REAL NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0,
+        payroll REAL NOT NULL DEFAULT 0,
+        salaries INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS client_month_income (
+        client_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        income REAL NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (client_id, month)
+    ) WITHOUT ROWID
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_payments_insert AFTER INSERT ON payments BEGIN
+        {_bump_cash_flow(_payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1, 0, 0)}
+        {_bump_client_income(_payment_client("NEW"), _payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_payments_delete AFTER DELETE ON payments BEGIN
+        {_bump_cash_flow(_payment_month("OLD"), "-IFNULL(OLD.amount, 0)", -1, 0, 0)}
+        {_bump_client_income(_payment_client("OLD"), _payment_month("OLD"), "-IFNULL(OLD.amount, 0)", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_payments_update AFTER UPDATE OF amount, date, project_id ON payments
+    WHEN OLD.amount IS NOT NEW.amount OR OLD.date IS NOT NEW.date OR OLD.project_id IS NOT NEW.project_id BEGIN
+        {_bump_cash_flow(_payment_month("OLD"), "-IFNULL(OLD.amount, 0)", -1, 0, 0)}
+        {_bump_client_income(_payment_client("OLD"), _payment_month("OLD"), "-IFNULL(OLD.amount, 0)", -1)}
+        {_bump_cash_flow(_payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1, 0, 0)}
+        {_bump_client_income(_payment_client("NEW"), _payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_salaries_insert AFTER INSERT ON employee_salaries BEGIN
+        {_bump_cash_flow(_salary_month("NEW"), 0, 0, "IFNULL(NEW.salary_amount, 0)", 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_salaries_delete AFTER DELETE ON employee_salaries BEGIN
+        {_bump_cash_flow(_salary_month("OLD"), 0, 0, "-IFNULL(OLD.salary_amount, 0)", -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_salaries_update
+    AFTER UPDATE OF salary_amount, month, date_paid ON employee_salaries BEGIN
+        {_bump_cash_flow(_salary_month("OLD"), 0, 0, "-IFNULL(OLD.salary_amount, 0)", -1)}
+        {_bump_cash_flow(_salary_month("NEW"), 0, 0, "IFNULL(NEW.salary_amount, 0)", 1)}
+    END
+    """,
+    # a project changing hands, disappearing or (by id reuse) reappearing moves its payments' income
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_projects_client AFTER UPDATE OF client_id ON projects
+    WHEN OLD.client_id IS NOT NEW.client_id BEGIN
+        {_move_project_income("OLD.id", "IFNULL(OLD.client_id, 0)", "-")}
+        {_move_project_income("NEW.id", "IFNULL(NEW.client_id, 0)", "")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_projects_delete AFTER DELETE ON projects BEGIN
+        {_move_project_income("OLD.id", "IFNULL(OLD.client_id, 0)", "-")}
+        {_move_project_income("OLD.id", 0, "")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_projects_insert AFTER INSERT ON projects BEGIN
+        {_move_project_income("NEW.id", 0, "-")}
+        {_move_project_income("NEW.id", "IFNULL(NEW.client_id, 0)", "")}
+    END
+    """,
+    _seed_cash_flow,
+]
+
+# every row carries a version that each update moves on, so an edit based on
+# an old read can be refused (see Repository.update) instead of overwriting;
+# the trigger moves it for writers that do not, such as older copies of the app
+VERSIONED_TABLES = ("users", "clients", "projects", "payments", "machines", "employees", "employee_salaries")
+
+
+def _row_version(table):
+    return [
+        f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+        f"ALTER TABLE {table} ADD COLUMN updated_at TEXT",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version AFTER UPDATE ON {table}
+        WHEN NEW.version IS OLD.version BEGIN
+            UPDATE {table} SET version = OLD.version + 1, updated_at = {dates.NOW_SQL} WHERE id = NEW.id;
+        END
+        """,
+    ]
+
+
+ROW_VERSIONS = [statement for table in VERSIONED_TABLES for statement in _row_version(table)]
+
+# ---- CHANGE LOG FOR SYNC ----
+# Every row gets a uuid that stays the same in every copy of the database,
+# and triggers log each insert, update and delete in change_log, so
+# modules/sync.py can send another site just what changed since it last
+# confirmed. Upserts log the row id (the row is read at export time); deletes
+# log the uuid and time, and stay as tombstones. origin is the site a change
+# arrived from while sync_apply names it, NULL for local writes.
+NEW_UUID_SQL = "lower(hex(randomblob(16)))"
+
+SYNC_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER,
+        row_uuid TEXT,
+        op TEXT NOT NULL,
+        changed_at TEXT,
+        origin TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_change_log_deletes ON change_log(row_uuid) WHERE op = 'delete'",
+    "CREATE TABLE IF NOT EXISTS sync_apply (origin TEXT, deleted_at TEXT)",
+    "INSERT INTO sync_apply (origin, deleted_at) VALUES (NULL, NULL)",
+    "CREATE TABLE IF NOT EXISTS sync_site (id TEXT NOT NULL, name TEXT)",
+    f"INSERT INTO sync_site (id, name) VALUES ({NEW_UUID_SQL}, 'Head office')",
+    """
+    CREATE TABLE IF NOT EXISTS sync_peers (
+        site TEXT PRIMARY KEY,
+        name TEXT,
+        acked INTEGER NOT NULL DEFAULT 0,
+        received INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+
+def _change_log(table):
+    origin = "(SELECT origin FROM sync_apply)"
+    return [
+        # rows from before the upgrade get their uuid here, unlogged: every copy of the file already has them
+        f"DROP TRIGGER IF EXISTS trg_{table}_version",
+        f"ALTER TABLE {table} ADD COLUMN uuid TEXT",
+        f"UPDATE {table} SET uuid = {NEW_UUID_SQL}",
+        f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uuid ON {table}(uuid)",
+        # as in migration 8, except that a row just given its uuid was not edited
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version AFTER UPDATE ON {table}
+        WHEN NEW.version IS OLD.version AND OLD.uuid IS NOT NULL BEGIN
+            UPDATE {table} SET version = OLD.version + 1, updated_at = {dates.NOW_SQL} WHERE id = NEW.id;
+        END
+        """,
+        # the app's own inserts pass a uuid; this covers everything else
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_uuid AFTER INSERT ON {table} WHEN NEW.uuid IS NULL BEGIN
+            UPDATE {table} SET uuid = {NEW_UUID_SQL} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id, op, origin) VALUES ('{table}', NEW.id, 'upsert', {origin});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id, op, origin) VALUES ('{table}', NEW.id, 'upsert', {origin});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO change_log (table_name, row_id, row_uuid, op, changed_at, origin) VALUES (
+                '{table}', OLD.id, OLD.uuid, 'delete',
+                IFNULL((SELECT deleted_at FROM sync_apply), {dates.NOW_SQL}), {origin}
+            );
+        END
+        """,
+    ]
+
+
+CHANGE_LOG = SYNC_TABLES + [statement for table in VERSIONED_TABLES for statement in _change_log(table)]
+
+# ---- BATCHED ROLLUPS FOR BULK INSERTS ----
+# The cash-flow insert triggers read the month out of the date text and look
+# up the client once per row, which dominated CSV imports. Repository.insert_many
+# sets bulk_insert.active around its batch so they stand aside, then
+# stats.add_cash_flow rolls the new rows up in one grouped pass. Single
+# inserts, updates and deletes still go through the triggers.
+BATCHED_ROLLUPS = [
+    "CREATE TABLE IF NOT EXISTS bulk_insert (active INTEGER NOT NULL)",
+    "INSERT INTO bulk_insert (active) VALUES (0)",
+    "DROP TRIGGER IF EXISTS trg_cash_payments_insert",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_payments_insert AFTER INSERT ON payments
+    WHEN (SELECT active FROM bulk_insert) = 0 BEGIN
+        {_bump_cash_flow(_payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1, 0, 0)}
+        {_bump_client_income(_payment_client("NEW"), _payment_month("NEW"), "IFNULL(NEW.amount, 0)", 1)}
+    END
+    """,
+    "DROP TRIGGER IF EXISTS trg_cash_salaries_insert",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cash_salaries_insert AFTER INSERT ON employee_salaries
+    WHEN (SELECT active FROM bulk_insert) = 0 BEGIN
+        {_bump_cash_flow(_salary_month("NEW"), 0, 0, "IFNULL(NEW.salary_amount, 0)", 1)}
+    END
+    """,
+]
+
+# ---- ONE LOG ENTRY PER WRITE ----
+# An update that leaves version alone (raw SQL, or the uuid fallback) is
+# followed by the version trigger's own UPDATE, which bumps it; logging only
+# updates that change the version records each write once. Bulk inserts log
+# their whole batch in one statement instead (LOG_INSERTED_SQL, from
+# Repository.insert_many), like the cash-flow rollups of migration 10.
+LOG_INSERTED_SQL = (
+    "INSERT INTO change_log (table_name, row_id, op, origin) "
+    "SELECT '{table}', id, 'upsert', (SELECT origin FROM sync_apply) FROM {table} WHERE id > ?"
+)
+
+
+def _log_once(table):
+    origin = "(SELECT origin FROM sync_apply)"
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_log_insert",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_insert AFTER INSERT ON {table}
+        WHEN (SELECT active FROM bulk_insert) = 0 BEGIN
+            INSERT INTO change_log (table_name, row_id, op, origin) VALUES ('{table}', NEW.id, 'upsert', {origin});
+        END
+        """,
+        f"DROP TRIGGER IF EXISTS trg_{table}_log_update",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_update AFTER UPDATE ON {table}
+        WHEN NEW.version IS NOT OLD.version BEGIN
+            INSERT INTO change_log (table_name, row_id, op, origin) VALUES ('{table}', NEW.id, 'upsert', {origin});
+        END
+        """,
+    ]
+
+
+LOG_ONCE = [statement for table in VERSIONED_TABLES for statement in _log_once(table)]
+
+# ---- DATE SORT INDEXES ----
+# Lists sort date columns by their ISO form (dates.date_sort_sql; stored text
+# like 10/1/2024 would sort before 2/1/2023), so the sort indexes of migration
+# 3 on the raw text give way to indexes on that expression.
+DATE_SORT_INDEXES = [
+    "DROP INDEX IF EXISTS idx_payments_date",
+    f"CREATE INDEX IF NOT EXISTS idx_payments_date_sort ON payments({dates.date_sort_sql('date')})",
+    "DROP INDEX IF EXISTS idx_salaries_date_paid",
+    f"CREATE INDEX IF NOT EXISTS idx_salaries_date_paid_sort ON employee_salaries({dates.date_sort_sql('date_paid')})",
+]
+
+MIGRATIONS = [
+    (1, "base schema", BASE_SCHEMA),
+    (2, "indexes for join and filter columns", JOIN_AND_FILTER_INDEXES),
+    (3, "trigger-maintained overview counters", OVERVIEW_COUNTERS),
+    (4, "indexes for list tab sorting", SORT_INDEXES),
+    (5, "full-text search indexes", SEARCH_INDEXES),
+    (6, "per-project payment totals", PROJECT_TOTALS),
+    (7, "monthly cash-flow rollups", CASH_FLOW_ROLLUPS),
+    (8, "row versions for conflict-checked updates", ROW_VERSIONS),
+    (9, "row uuids and change log for sync", CHANGE_LOG),
+    (10, "cash-flow rollups batched for bulk inserts", BATCHED_ROLLUPS),
+    (11, "one change log entry per write", LOG_ONCE),
+    (12, "list sorts on dates by their ISO form", DATE_SORT_INDEXES),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply(conn, version, statements):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # re-check under the write lock: another process may have just migrated
+        if current_version(conn) >= version:
+            conn.execute("ROLLBACK")
+            return False
+        for statement in statements:
+            if callable(statement):
+                statement(conn)
+            else:
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {version}")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return True
+
+
+def refresh_stats(conn, factor=10):
+    """Re-ANALYZE tables whose size is `factor` times off the row count ANALYZE saw.
+
+    Statistics gathered while a table was tiny make the planner prefer full
+    scans over indexes once it has grown. MAX(rowid) is an index seek, so the
+    check is cheap enough to run on every start and after bulk writes.
+    """
+    try:
+        analyzed = conn.execute(
+            "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE idx IS NOT NULL GROUP BY tbl"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []  # never analyzed
+    stale = []
+    for table, rows_seen in analyzed:
+        try:
+            rows_now = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            continue  # WITHOUT ROWID tables
+        if max(rows_now, 1) > factor * max(rows_seen, 1) or max(rows_seen, 1) > factor * max(rows_now, 1):
+            stale.append(table)
+    if stale:
+        conn.execute("PRAGMA analysis_limit = 1000")
+        for table in stale:
+            conn.execute(f'ANALYZE "{table}"')
+    return stale
+
+
+def migrate(conn, log=None):
+    """Bring the database up to LATEST_VERSION; returns the versions applied"""
+    if conn.in_transaction:
+        conn.commit()
+    if current_version(conn) >= LATEST_VERSION:
+        refresh_stats(conn)
+        return []
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+        start = time.perf_counter()
+        if _apply(conn, version, statements):
+            applied.append(version)
+            if log:
+                log(f"migration {version} ({description}) applied in {time.perf_counter() - start:.2f}s")
+    if applied:
+        # a sampled ANALYZE keeps this quick on multi-GB files
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+    return applied
+
+
+if __name__ == "__main__":
+    from modules.db_connection import DB_PATH
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    connection = sqlite3.connect(path, isolation_level=None)
+    done = migrate(connection, log=print)
+    print(f"{path}: schema version {current_version(connection)}" + ("" if done else " (already up to date)"))
+    connection.close()
@@ -0,0 +1,137 @@
+import argparse
+import datetime
+import time
+from collections import namedtuple
+
+from modules import dates, db_connection, events, migrations
+
+# ---- PAYROLL RUN ----
+# employee_salaries.month holds only the month name, so a payroll period is
+# (month name, year of date_paid); see modules/dates.py for how that year is read.
+
+PayrollPlan = namedtuple("PayrollPlan", "month year date_paid to_pay total already_paid no_salary sample")
+
+PAID_YEAR_SQL = dates.year_sql("s.date_paid")
+
+# the index on employee_salaries(employee_id, month) answers this per employee
+ALREADY_PAID_SQL = f"""
+    EXISTS (
+        SELECT 1 FROM employee_salaries s
+        WHERE s.employee_id = e.id AND s.month = :month AND {PAID_YEAR_SQL} = :year
+    )
+"""
+
+DUE_SQL = f"""
+    FROM employees e
+    WHERE e.status = 'active' AND e.salary > 0 AND NOT {ALREADY_PAID_SQL}
+"""
+
+SAMPLE_SIZE = 10
+
+
+def form_date(date):
+    """A date the way the salary form's date field writes it (M/D/YYYY)"""
+    return f"{date.month}/{date.day}/{date.year}"
+
+
+def paid_date(month, year, date_paid=None):
+    """The date_paid a run writes: the one given, which must fall in `year`, else
+    today, or the 1st of the month when paying another year.
+
+    The year of date_paid is the year of the period, so a date outside it would
+    file the records under another year and let this one be paid again.
+    """
+    if date_paid:
+        if dates.year_of(date_paid) != int(year):
+            raise ValueError(f"Date paid {date_paid} is not in {year}")
+        return date_paid
+    today = datetime.date.today()
+    if today.year == int(year):
+        return form_date(today)
+    return form_date(datetime.date(int(year), dates.month_number(month) or 1, 1))
+
+
+def preview(month, year, date_paid=None, conn=None):
+    """What run() would insert, without writing anything"""
+    date_paid = paid_date(month, year, date_paid)
+    conn = conn if conn is not None else db_connection.connection()
+    params = {"month": month, "year": str(year)}
+    to_pay, total = conn.execute(f"SELECT COUNT(*), IFNULL(SUM(e.salary), 0) {DUE_SQL}", params).fetchone()
+    already_paid, no_salary = conn.execute(
+        f"""
+        SELECT
+            IFNULL(SUM(e.salary > 0 AND {ALREADY_PAID_SQL}), 0),
+            IFNULL(SUM(IFNULL(e.salary, 0) <= 0), 0)
+        FROM employees e WHERE e.status = 'active'
+        """,
+        params,
+    ).fetchone()
+    sample = conn.execute(
+        f"SELECT e.id, e.name, e.salary {DUE_SQL} ORDER BY e.name LIMIT {SAMPLE_SIZE}", params
+    ).fetchall()
+    return PayrollPlan(
+        month, year, date_paid,
+        to_pay, total, already_paid, no_salary, sample,
+    )
+
+
+def run(month, year, date_paid=None, status="Paid"):
+    """Insert one salary record per active, unpaid employee; returns the number inserted.
+
+    The check for earlier payments runs inside the same write transaction, so
+    two runs for the same period can never pay anyone twice.
+    """
+    date_paid = paid_date(month, year, date_paid)
+    server = db_connection.remote()
+    if server is not None:
+        return server.run_payroll(month, year, date_paid, status)
+    params = {"month": month, "year": str(year), "status": status, "date_paid": date_paid}
+    with db_connection.transaction() as conn:
+        inserted = conn.execute(
+            f"""
+            INSERT INTO employee_salaries (employee_id, salary_amount, month, date_paid, status, updated_at, uuid)
+            SELECT e.id, e.salary, :month, :date_paid, :status, {dates.NOW_SQL}, {migrations.NEW_UUID_SQL} {DUE_SQL}
+            """,
+            params,
+        ).rowcount
+        if inserted:
+            events.publish("employee_salaries", "insert", None, conn)
+    migrations.refresh_stats(conn)
+    return inserted
+
+
+def describe(plan):
+    lines = [
+        f"Pay {plan.to_pay} employees for {plan.month} {plan.year}, total Rs {plan.total:,.2f}",
+        f"Skipped: {plan.already_paid} already paid, {plan.no_salary} without a salary",
+    ]
+    if plan.sample:
+        lines.append("")
+        lines += [f"  {name}: Rs {salary:,.2f}" for _id, name, salary in plan.sample]
+        if plan.to_pay > len(plan.sample):
+            lines.append(f"  ... and {plan.to_pay - len(plan.sample)} more")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    today = datetime.date.today()
+    parser = argparse.ArgumentParser(prog="python -m modules.payroll", description="Monthly payroll run")
+    parser.add_argument("month", help="month name, e.g. July")
+    parser.add_argument("year", type=int, nargs="?", default=today.year)
+    parser.add_argument("--date-paid", help="date written on the records, in YEAR (default: today, or the 1st of MONTH in another year)")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    parser.add_argument("--yes", action="store_true", help="run without asking")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db)
+    month = args.month.capitalize()
+    try:
+        plan = preview(month, args.year, args.date_paid)
+    except ValueError as error:
+        parser.error(str(error))
+    print(describe(plan))
+    if plan.to_pay and (args.yes or input("Run payroll? [y/N] ").strip().lower() == "y"):
+        start = time.perf_counter()
+        inserted = run(month, args.year, plan.date_paid)
+        print(f"{inserted} salary records added in {time.perf_counter() - start:.2f}s")
+    db_connection.close_all()
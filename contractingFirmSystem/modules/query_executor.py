@@ -0,0 +1,152 @@
+import sys
+import threading
+
+from PyQt5 import QtCore
+
+from modules import db_connection, tracing
+
+
+class QueryFuture:
+    """Handle for a submitted query; results are delivered on the GUI thread"""
+
+    def __init__(self, key=None):
+        self.key = key
+        self.cancelled = False
+        self.done = False
+        self.result = None
+        self.error = None
+        self._on_result = None
+        self._on_error = None
+        self._lock = threading.Lock()
+        self._connection = None  # worker connection while a keyed query runs
+
+    def cancel(self):
+        """Drop the result; a running keyed (read) query is interrupted"""
+        if self.done:
+            return False
+        self.cancelled = True
+        with self._lock:
+            if self._connection is not None:
+                self._connection.interrupt()
+        return True
+
+
+class _TaskSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object, object, object)  # future, result, error
+
+
+class _QueryTask(QtCore.QRunnable):
+    def __init__(self, future, fn, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.origin = None  # submitting caller, recorded only while tracing
+        self.signals = _TaskSignals()
+
+    def run(self):
+        if self.origin is None:
+            self._run()
+        else:
+            with tracing.origin(self.origin):
+                self._run()
+
+    def _run(self):
+        future = self.future
+        result = error = None
+        if not future.cancelled:
+            if future.key is not None:
+                with future._lock:
+                    future._connection = db_connection.connection()
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except Exception as e:
+                error = e
+            finally:
+                with future._lock:
+                    future._connection = None
+        self.signals.finished.emit(future, result, error)
+
+
+class QueryExecutor(QtCore.QObject):
+    """Runs database work on a private QThreadPool.
+
+    Each worker thread uses its own pooled connection from db_connection.
+    Submitting with a `key` cancels the previous request with the same key,
+    so repeated refreshes of one tab only ever deliver the latest result.
+    """
+
+    busy_changed = QtCore.pyqtSignal(bool)
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._pool.setExpiryTimeout(-1)  # keep threads, and their connections, alive
+        self._tasks = {}   # future -> task
+        self._latest = {}  # key -> future
+
+    def submit(self, fn, *args, on_result=None, on_error=None, key=None, **kwargs):
+        if key is not None and key in self._latest:
+            self.cancel(self._latest[key])
+        future = QueryFuture(key)
+        future._on_result = on_result
+        future._on_error = on_error
+        task = _QueryTask(future, fn, args, kwargs)
+        if tracing.active():
+            task.origin = tracing.caller()
+        task.signals.finished.connect(self._on_finished)
+        was_idle = not self._tasks
+        self._tasks[future] = task
+        if key is not None:
+            self._latest[key] = future
+        self._pool.start(task)
+        if was_idle:
+            self.busy_changed.emit(True)
+        return future
+
+    def cancel(self, future):
+        future.cancel()
+        task = self._tasks.get(future)
+        if task is not None and self._pool.tryTake(task):
+            # never started, so no finished signal will arrive
+            self._forget(future)
+
+    def cancel_all(self):
+        for future in list(self._tasks):
+            self.cancel(future)
+
+    def is_busy(self):
+        return bool(self._tasks)
+
+    def wait_for_idle(self, timeout_ms=30000):
+        """Block until all submitted work has run and its callbacks were delivered"""
+        deadline = QtCore.QDeadlineTimer(timeout_ms)
+        while self._tasks and not deadline.hasExpired():
+            self._pool.waitForDone(10)
+            QtCore.QCoreApplication.processEvents()
+        return not self._tasks
+
+    def _forget(self, future):
+        self._tasks.pop(future, None)
+        if future.key is not None and self._latest.get(future.key) is future:
+            del self._latest[future.key]
+        if not self._tasks:
+            self.busy_changed.emit(False)
+
+    def _on_finished(self, future, result, error):
+        self._forget(future)
+        if future.cancelled:
+            return
+        future.done = True
+        future.result = result
+        future.error = error
+        if error is None:
+            if future._on_result is not None:
+                future._on_result(result)
+        elif future._on_error is not None:
+            future._on_error(error)
+        else:
+            sys.excepthook(type(error), error, error.__traceback__)
@@ -0,0 +1,262 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from modules import events, repositories
+from modules.db_connection import DbStats, RemoteError
+
+# ---- SERVER CLIENT ----
+# What db_connection hands out when FIRM_SERVER (or configure()) names a
+# modules/server.py URL instead of a file. Reads keep their SQL: statements go
+# to the server's read-only /api/sql and come back as rows, so list tabs,
+# reports, search and dropdowns work unchanged. Writes cannot run SQL here:
+# repositories, auth and payroll call insert/update/delete/login/run_payroll
+# below, and anything else that opens a transaction (CSV import, counter
+# rebuilds) raises RemoteError. Changes committed on the server, by anyone,
+# arrive through a long-polled feed and are published on the local event bus.
+
+TIMEOUT = 30          # seconds for one request
+FEED_WAIT = 25        # seconds the server holds a /api/changes request open
+FEED_RETRY = (1, 30)  # first and longest pause between failed feed polls, seconds
+
+API_NAMES = {repo.table: name for name, repo in repositories.BY_NAME.items()}  # table -> /api/<name>
+
+
+class Client:
+    """JSON requests to one server; one keep-alive HTTP connection per thread"""
+
+    def __init__(self, url, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.url = url
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.timeout = timeout
+        self.token = None
+        self._lock = threading.Lock()
+        self._connections = {}  # thread ident -> HTTPConnection, as in db_connection
+
+    def _connection(self):
+        ident = threading.get_ident()
+        conn = self._connections.get(ident)
+        if conn is None:
+            make = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = make(self.host, self.port, timeout=self.timeout)
+            with self._lock:
+                self._connections[ident] = conn
+        return conn
+
+    def request(self, method, path, payload=None, timeout=None):
+        """Send one request; returns the decoded JSON reply or raises RemoteError"""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in (1, 2):
+            conn = self._connection()
+            conn.timeout = timeout or self.timeout
+            stale = conn.sock is not None  # kept alive from an earlier request
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as error:
+                conn.close()
+                # a kept-alive connection dropped before any reply (e.g. the server restarted)
+                # is retried once on a new one; anything else may have reached the server
+                dropped = isinstance(error, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if not (stale and dropped and attempt == 1):
+                    raise RemoteError(f"Cannot reach the server at {self.url}: {error}") from None
+        reply = json.loads(data) if data else None
+        if response.status >= 400:
+            message = reply.get("error") if isinstance(reply, dict) else None
+            raise RemoteError(message or f"Server error {response.status}", response.status)
+        return reply
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for conn in connections:
+            conn.close()
+
+
+class RemoteCursor:
+    """The rows of one /api/sql reply, read like an sqlite3 cursor"""
+
+    arraysize = 1
+    lastrowid = None
+    rowcount = -1
+
+    def __init__(self, columns, rows):
+        self.description = [(name, None, None, None, None, None, None) for name in columns] if columns else None
+        self._rows = [tuple(row) for row in rows]
+        self._next = 0
+
+    def fetchone(self):
+        if self._next >= len(self._rows):
+            return None
+        self._next += 1
+        return self._rows[self._next - 1]
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._rows[self._next:self._next + size]
+        self._next += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._next:]
+        self._next = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._rows = []
+
+
+class RemoteConnection:
+    """Stands in for a pool connection: reads go to the server, writes are refused"""
+
+    in_transaction = False
+    tracer = None
+    trace_current = None
+
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+        self.pending_changes = []
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            reply = self.client.request("POST", "/api/sql", {"sql": sql, "params": parameters})
+        finally:
+            self.stats.add_query(time.perf_counter() - start)
+        return RemoteCursor(reply["columns"], reply["rows"])
+
+    def executemany(self, sql, seq_of_parameters):
+        raise RemoteError("Bulk writes are not available when connected to a server")
+
+    def interrupt(self):
+        pass  # the server finishes the statement; the reply is dropped by the caller
+
+    def close(self):
+        pass
+
+
+class ChangeFeed(threading.Thread):
+    """Long-polls /api/changes and republishes what it hears on the local event bus"""
+
+    def __init__(self, client, bus=events.bus):
+        super().__init__(name="change-feed", daemon=True)
+        self.client = client
+        self.bus = bus
+        self.stopped = threading.Event()
+
+    def run(self):
+        sequence, pause = None, FEED_RETRY[0]
+        while not self.stopped.is_set():
+            try:
+                after = "" if sequence is None else f"?after={sequence}&wait={FEED_WAIT}"
+                reply = self.client.request("GET", f"/api/changes{after}", timeout=FEED_WAIT + TIMEOUT)
+            except RemoteError:
+                if sequence is not None:
+                    self.bus.publish(events.EXTERNAL)  # whatever happened meanwhile is unknown
+                sequence = None
+                self.stopped.wait(pause)
+                pause = min(pause * 2, FEED_RETRY[1])
+                continue
+            pause = FEED_RETRY[0]
+            if sequence is not None:
+                for table, op, ids in reply["changes"]:
+                    self.bus.publish(events.Change(table, op, tuple(ids) if ids is not None else None))
+            sequence = reply["sequence"]
+
+    def stop(self):
+        self.stopped.set()
+
+
+class RemotePool:
+    """db_connection's pool when the database lives behind a server (see server.py)"""
+
+    remote = True
+    migrate = False
+
+    def __init__(self, url):
+        self.path = url
+        self.client = Client(url)
+        self.stats = DbStats()
+        self._connection = RemoteConnection(self.client, self.stats)
+        self._feed = None
+
+    # ---- reads ----
+    def connection(self):
+        return self._connection
+
+    def query(self, sql, params=()):
+        return self._connection.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self._connection.execute(sql, params).fetchone()
+
+    def transaction(self, mode="IMMEDIATE"):
+        raise RemoteError("Not available when connected to a server; run it where the database file is")
+
+    def execute(self, sql, params=()):
+        return self.transaction()
+
+    def set_tracer(self, tracer):
+        pass  # statements run on the server; trace them there
+
+    # ---- writes, through the server's API ----
+    def login(self, username, password):
+        """(id, username, role) and a session for later requests, or None"""
+        try:
+            reply = self.client.request("POST", "/api/login", {"username": username, "password": password})
+        except RemoteError as error:
+            if error.status == 401:
+                return None
+            raise
+        self.client.token = reply["token"]
+        if self._feed is None:
+            self._feed = ChangeFeed(self.client)
+            self._feed.start()
+        user = reply["user"]
+        return (user["id"], user["username"], user["role"])
+
+    def insert(self, table, values):
+        return self.client.request("POST", f"/api/{API_NAMES[table]}", values)["id"]
+
+    def update(self, table, row_id, values, expected_version=None):
+        path = f"/api/{API_NAMES[table]}/{row_id}"
+        if expected_version is not None:
+            path += f"?version={expected_version}"
+        try:
+            return self.client.request("PATCH", path, values)["version"]
+        except RemoteError as error:
+            if error.status == 412:  # the server's answer to a stale version
+                raise repositories.ConflictError(table, row_id, expected_version) from None
+            raise
+
+    def delete(self, table, row_id):
+        return self.client.request("DELETE", f"/api/{API_NAMES[table]}/{row_id}")["deleted"]
+
+    def run_payroll(self, month, year, date_paid=None, status="Paid"):
+        payload = {"month": month, "year": year, "date_paid": date_paid, "status": status}
+        return self.client.request("POST", "/api/payroll", payload)["inserted"]
+
+    def close_all(self):
+        if self._feed is not None:
+            self._feed.stop()
+        self.client.close()
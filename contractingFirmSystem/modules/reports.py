@@ -0,0 +1,133 @@
+import argparse
+import datetime
+from collections import namedtuple
+
+from modules import db_connection
+
+# ---- CASH-FLOW REPORTS ----
+# Read from the monthly rollups of migration 7 (cash_flow_months and
+# client_month_income, kept current by triggers), so a report over any span
+# of years reads at most one row per month and never the payments or
+# salaries themselves. Kept free of Qt so command-line tools can share it.
+
+MonthTotals = namedtuple("MonthTotals", "month income payroll net")
+CashFlowReport = namedtuple("CashFlowReport", "first_year last_year client_id months undated")
+ProjectBalance = namedtuple("ProjectBalance", "project_id client project value received outstanding")
+
+MONTH_LABELS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _conn(conn):
+    return conn if conn is not None else db_connection.connection()
+
+
+def month_label(month):
+    """'Mar 2024' for the month key '2024-03'"""
+    return f"{MONTH_LABELS[int(month[5:]) - 1]} {month[:4]}"
+
+
+def year_range(conn=None):
+    """(first, last) year with any payments or salaries, or None if there are none"""
+    first, last = _conn(conn).execute(
+        "SELECT MIN(month), MAX(month) FROM cash_flow_months "
+        "WHERE month != '' AND (payments != 0 OR salaries != 0)"
+    ).fetchone()
+    return (int(first[:4]), int(last[:4])) if first else None
+
+
+def monthly(first_year, last_year, client_id=None, conn=None):
+    """MonthTotals for every month of the years, oldest first.
+
+    With a client_id only that client's income is reported; payroll and net
+    are None since salaries belong to no client.
+    """
+    conn = _conn(conn)
+    span = (f"{first_year:04d}-01", f"{last_year:04d}-12")
+    if client_id is None:
+        found = {month: (income, payroll) for month, income, payroll in conn.execute(
+            "SELECT month, income, payroll FROM cash_flow_months WHERE month BETWEEN ? AND ?", span
+        )}
+    else:
+        found = {month: (income, None) for month, income in conn.execute(
+            "SELECT month, income FROM client_month_income WHERE client_id = ? AND month BETWEEN ? AND ?",
+            (client_id,) + span,
+        )}
+    months = []
+    for year in range(first_year, last_year + 1):
+        for number in range(1, 13):
+            month = f"{year:04d}-{number:02d}"
+            income, payroll = found.get(month, (0.0, None if client_id is not None else 0.0))
+            net = income - payroll if payroll is not None else None
+            months.append(MonthTotals(month, income, payroll, net))
+    return months
+
+
+def undated(client_id=None, conn=None):
+    """Number of payments and salary records whose date could not be read, left out of every report"""
+    conn = _conn(conn)
+    if client_id is None:
+        row = conn.execute("SELECT payments + salaries FROM cash_flow_months WHERE month = ''").fetchone()
+    else:
+        row = conn.execute(
+            "SELECT payments FROM client_month_income WHERE client_id = ? AND month = ''", (client_id,)
+        ).fetchone()
+    return row[0] if row else 0
+
+
+def cash_flow(first_year=None, last_year=None, client_id=None, conn=None):
+    """CashFlowReport for the years (default: every year with data, or the current one)"""
+    conn = _conn(conn)
+    if first_year is None or last_year is None:
+        years = year_range(conn) or (datetime.date.today().year,) * 2
+        first_year = years[0] if first_year is None else first_year
+        last_year = years[1] if last_year is None else last_year
+    return CashFlowReport(
+        first_year, last_year, client_id,
+        monthly(first_year, last_year, client_id, conn), undated(client_id, conn),
+    )
+
+
+def project_balances(client_id=None, unpaid_only=False, limit=None, conn=None):
+    """ProjectBalance rows, largest outstanding first, from the trigger-kept project_totals"""
+    where, params = [], []
+    if client_id is not None:
+        where.append("pr.client_id = ?")
+        params.append(client_id)
+    if unpaid_only:
+        where.append("IFNULL(pr.project_value, 0) > IFNULL(t.received, 0)")
+    sql = (
+        "SELECT pr.id, c.name, pr.project_name, IFNULL(pr.project_value, 0), IFNULL(t.received, 0.0), "
+        "IFNULL(pr.project_value, 0) - IFNULL(t.received, 0) AS outstanding "
+        "FROM projects pr LEFT JOIN clients c ON c.id = pr.client_id "
+        "LEFT JOIN project_totals t ON t.project_id = pr.id"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY outstanding DESC, pr.id"
+        + (" LIMIT ?" if limit is not None else "")
+    )
+    if limit is not None:
+        params.append(limit)
+    return [ProjectBalance(*row) for row in _conn(conn).execute(sql, params)]
+
+
+def describe(report):
+    lines = [f"{'Month':<10}{'Income':>18}{'Payroll':>18}{'Net':>18}"]
+    for m in report.months:
+        payroll = f"{m.payroll:>18,.2f}" if m.payroll is not None else f"{'':>18}"
+        net = f"{m.net:>18,.2f}" if m.net is not None else f"{'':>18}"
+        lines.append(f"{month_label(m.month):<10}{m.income:>18,.2f}{payroll}{net}")
+    if report.undated:
+        lines.append(f"{report.undated} records with unreadable dates are not included")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m modules.reports", description="Monthly cash flow")
+    parser.add_argument("--from", dest="first_year", type=int, help="first year (default: earliest with data)")
+    parser.add_argument("--to", dest="last_year", type=int, help="last year (default: latest with data)")
+    parser.add_argument("--client", type=int, help="one client's income by month")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db)
+    print(describe(cash_flow(args.first_year, args.last_year, args.client)))
+    db_connection.close_all()
@@ -0,0 +1,33 @@
+"""One repository per table; the dashboard reaches the database only through these."""
+
+from modules.repositories.base import ConflictError, Repository
+from modules.repositories.tables import (
+    ClientRepository,
+    EmployeeRepository,
+    MachineRepository,
+    PaymentRepository,
+    ProjectRepository,
+    SalaryRepository,
+    UserRepository,
+)
+
+clients = ClientRepository()
+projects = ProjectRepository()
+payments = PaymentRepository()
+machines = MachineRepository()
+employees = EmployeeRepository()
+salaries = SalaryRepository()
+users = UserRepository()
+
+BY_TABLE = {repo.table: repo for repo in (clients, projects, payments, machines, employees, salaries, users)}
+# the names list tabs, the command line and the server API use
+BY_NAME = {
+    "clients": clients, "projects": projects, "payments": payments, "machines": machines,
+    "employees": employees, "salaries": salaries,
+}
+
+__all__ = [
+    "Repository", "ConflictError", "ClientRepository", "ProjectRepository", "PaymentRepository", "MachineRepository",
+    "EmployeeRepository", "SalaryRepository", "UserRepository",
+    "clients", "projects", "payments", "machines", "employees", "salaries", "users", "BY_TABLE", "BY_NAME",
+]
@@ -0,0 +1,178 @@
+from collections import namedtuple
+from itertools import islice
+
+from modules import dates, db_connection, events, migrations, stats
+
+# ids per statement in the batch methods; a short last batch is padded by
+# repeating its last id, so every batch reuses one cached prepared statement
+BATCH_SIZE = 500
+
+
+def _batches(ids):
+    ids = iter(ids)
+    while True:
+        batch = list(islice(ids, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch + batch[-1:] * (BATCH_SIZE - len(batch))
+
+
+class ConflictError(Exception):
+    """An update was based on a row version that another writer has since replaced"""
+
+    def __init__(self, table, row_id, expected_version):
+        super().__init__(f"{table} row {row_id} was changed by someone else since it was read")
+        self.table = table
+        self.row_id = row_id
+        self.expected_version = expected_version
+
+
+class Repository:
+    """Data access for one table.
+
+    Rows come back as `row_type` namedtuples (id first, then `columns`, then
+    the row's `version` and `updated_at`). The SQL for each operation is built
+    once and reused verbatim, so it stays in the per-connection statement
+    cache (see db_connection). Every write publishes an events.Change once it
+    is committed. Connected to a server (see remote.py), single-row writes go
+    to its API instead.
+    """
+
+    table = None
+    columns = ()
+    row_name = None
+
+    def __init__(self):
+        self.row_type = namedtuple(self.row_name, ("id",) + tuple(self.columns) + ("version", "updated_at"))
+        self._sql = {}
+        self._select = f"SELECT id, {', '.join(self.columns)}, version, updated_at FROM {self.table}"
+
+    def _statement(self, key, build):
+        sql = self._sql.get(key)
+        if sql is None:
+            sql = self._sql[key] = build()
+        return sql
+
+    def _rows(self, sql, params=()):
+        cursor = db_connection.connection().execute(sql, params)
+        make = self.row_type._make
+        return [make(row) for row in cursor.fetchall()]
+
+    def _check(self, names):
+        unknown = set(names) - set(self.columns)
+        if unknown:
+            raise ValueError(f"{self.table} has no column(s) {', '.join(sorted(unknown))}")
+
+    # ---- reads ----
+    def get(self, row_id):
+        rows = self._rows(self._statement("get", lambda: f"{self._select} WHERE id = ?"), (row_id,))
+        return rows[0] if rows else None
+
+    def get_many(self, ids):
+        """Rows for `ids` (missing ids are left out), in id order"""
+        sql = self._statement("get_many", lambda: (
+            f"{self._select} WHERE id IN ({', '.join('?' * BATCH_SIZE)})"
+        ))
+        found = {}
+        for batch in _batches(ids):
+            for row in self._rows(sql, batch):
+                found[row.id] = row
+        return [found[i] for i in sorted(found)]
+
+    def all(self):
+        return self._rows(self._statement("all", lambda: f"{self._select} ORDER BY id"))
+
+    def count(self):
+        sql = self._statement("count", lambda: f"SELECT COUNT(*) FROM {self.table}")
+        return db_connection.query_one(sql)[0]
+
+    # ---- writes ----
+    def insert(self, **values):
+        """Insert one row; returns its id"""
+        self._check(values)
+        server = db_connection.remote()
+        if server is not None:
+            return server.insert(self.table, values)
+        names = tuple(values)
+        sql = self._statement(("insert", names), lambda: self._insert_sql(names))
+        row_id = db_connection.execute(sql, tuple(values.values())).lastrowid
+        events.publish(self.table, "insert", (row_id,), db_connection.connection())
+        return row_id
+
+    def insert_many(self, rows, columns=None):
+        """Insert value sequences given in `columns` order (default: all columns) in one transaction"""
+        names = tuple(columns or self.columns)
+        self._check(names)
+        sql = self._statement(("insert", names), lambda: self._insert_sql(names))
+        with db_connection.transaction() as conn:
+            # the per-row change log and cash-flow triggers stand aside; the batch is handled in one pass below
+            after_id = conn.execute(f"SELECT IFNULL(MAX(id), 0) FROM {self.table}").fetchone()[0]
+            conn.execute("UPDATE bulk_insert SET active = 1")
+            inserted = conn.executemany(sql, rows).rowcount
+            conn.execute("UPDATE bulk_insert SET active = 0")
+            conn.execute(migrations.LOG_INSERTED_SQL.format(table=self.table), (after_id,))
+            if self.table in stats.ADDED_CASH_FLOW_SQL:
+                stats.add_cash_flow(conn, self.table, after_id)
+            events.publish(self.table, "insert", None, conn)
+        return inserted
+
+    def _insert_sql(self, names):
+        return (
+            f"INSERT INTO {self.table} ({', '.join(names)}, updated_at, uuid) "
+            f"VALUES ({', '.join('?' * len(names))}, {dates.NOW_SQL}, {migrations.NEW_UUID_SQL})"
+        )
+
+    def update(self, row_id, expected_version=None, **values):
+        """Set `values` on one row; returns its new version, or 0 if no row changed.
+
+        With `expected_version` (the `version` of the row as read) the update
+        only applies if nobody has changed the row since; otherwise it raises
+        ConflictError and changes nothing.
+        """
+        self._check(values)
+        server = db_connection.remote()
+        if server is not None:
+            return server.update(self.table, row_id, values, expected_version)
+        names = tuple(values)
+        checked = expected_version is not None
+        sql = self._statement(("update", names, checked), lambda: (
+            f"UPDATE {self.table} SET {', '.join(f'{n} = ?' for n in names)}, "
+            f"version = version + 1, updated_at = {dates.NOW_SQL} "
+            f"WHERE id = ?{' AND version = ?' if checked else ''}"
+        ))
+        params = tuple(values.values()) + ((row_id, expected_version) if checked else (row_id,))
+        with db_connection.transaction() as conn:
+            changed = conn.execute(sql, params).rowcount
+            if not changed and checked and self.get(row_id) is not None:
+                raise ConflictError(self.table, row_id, expected_version)
+            if not changed:
+                return 0  # a row that is gone: nothing to tell subscribers
+            version = expected_version + 1 if checked else conn.execute(
+                f"SELECT version FROM {self.table} WHERE id = ?", (row_id,)
+            ).fetchone()[0]
+            events.publish(self.table, "update", (row_id,), conn)
+        return version
+
+    def delete(self, row_id):
+        server = db_connection.remote()
+        if server is not None:
+            return server.delete(self.table, row_id)
+        sql = self._statement("delete", lambda: f"DELETE FROM {self.table} WHERE id = ?")
+        deleted = db_connection.execute(sql, (row_id,)).rowcount
+        if deleted:  # an id already gone changes nothing subscribers show
+            events.publish(self.table, "delete", (row_id,), db_connection.connection())
+        return deleted
+
+    def delete_many(self, ids):
+        """Delete rows by id in one transaction; returns the number deleted"""
+        sql = self._statement("delete_many", lambda: (
+            f"DELETE FROM {self.table} WHERE id IN ({', '.join('?' * BATCH_SIZE)})"
+        ))
+        ids = list(ids)
+        deleted = 0
+        with db_connection.transaction() as conn:
+            for batch in _batches(ids):
+                deleted += conn.execute(sql, batch).rowcount
+            if deleted:
+                events.publish(self.table, "delete", ids, conn)
+        return deleted
@@ -0,0 +1,61 @@
+from modules import db_connection
+from modules.repositories.base import Repository
+
+
+class ClientRepository(Repository):
+    table = "clients"
+    columns = ("name", "contact", "address")
+    row_name = "Client"
+
+    def options(self):
+        """(id, name) pairs for dropdowns"""
+        return db_connection.query("SELECT id, name FROM clients")
+
+
+class ProjectRepository(Repository):
+    table = "projects"
+    columns = ("client_id", "project_name", "project_value", "start_date", "end_date", "status")
+    row_name = "Project"
+
+    def options(self):
+        return db_connection.query("SELECT id, project_name FROM projects")
+
+
+class PaymentRepository(Repository):
+    table = "payments"
+    columns = ("project_id", "amount", "date")
+    row_name = "Payment"
+
+
+class MachineRepository(Repository):
+    table = "machines"
+    columns = ("machine_name", "machine_type", "purchase_date", "cost", "status")
+    row_name = "Machine"
+
+
+class EmployeeRepository(Repository):
+    table = "employees"
+    columns = ("name", "phone", "cnic", "designation", "salary", "join_date", "status")
+    row_name = "Employee"
+
+    def active_options(self):
+        # answered from the partial index on active employees' names
+        return db_connection.query("SELECT id, name FROM employees WHERE status='active'")
+
+
+class SalaryRepository(Repository):
+    table = "employee_salaries"
+    columns = ("employee_id", "salary_amount", "month", "date_paid", "status")
+    row_name = "SalaryRecord"
+
+
+class UserRepository(Repository):
+    table = "users"
+    columns = ("username", "password", "role")
+    row_name = "User"
+
+    def find_login(self, username, password):
+        rows = self._rows(
+            f"{self._select} WHERE username = ? AND password = ?", (username, password)
+        )
+        return rows[0] if rows else None
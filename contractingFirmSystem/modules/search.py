@@ -0,0 +1,94 @@
+import re
+import sys
+from collections import namedtuple
+
+from modules import db_connection
+
+# ---- FULL-TEXT SEARCH ----
+# clients_fts, projects_fts, employees_fts and machines_fts are external-content
+# FTS5 tables kept in sync by the triggers from migration 5. Every term typed is
+# matched as a prefix, and all terms must match.
+
+SearchEntity = namedtuple("SearchEntity", "name label fts table title detail joins")
+SearchHit = namedtuple("SearchHit", "entity id title detail score")
+
+ENTITIES = [
+    SearchEntity(
+        "clients", "Clients", "clients_fts", "clients t",
+        "t.name", "TRIM(IFNULL(t.contact, '') || '  ' || IFNULL(t.address, ''))", "",
+    ),
+    SearchEntity(
+        "projects", "Projects", "projects_fts", "projects t",
+        "t.project_name", "IFNULL(c.name, '') || '  ' || IFNULL(t.status, '')",
+        "LEFT JOIN clients c ON c.id = t.client_id",
+    ),
+    SearchEntity(
+        "employees", "Employees", "employees_fts", "employees t",
+        "t.name", "TRIM(IFNULL(t.designation, '') || '  ' || IFNULL(t.cnic, ''))", "",
+    ),
+    SearchEntity(
+        "machines", "Machines", "machines_fts", "machines t",
+        "t.machine_name", "IFNULL(t.machine_type, '')", "",
+    ),
+]
+
+# bm25 is only computed for the first CANDIDATES matches of each entity, so a
+# one-letter prefix on a million rows costs the same as a rare word
+CANDIDATES = 500
+
+
+def match_expression(text):
+    """FTS5 query for user input: every word as a quoted prefix term, or None"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _search_entity(conn, entity, match, limit):
+    rows = conn.execute(
+        f"""
+        SELECT t.id, {entity.title}, {entity.detail}, m.score
+        FROM (
+            SELECT rowid, bm25({entity.fts}) AS score FROM {entity.fts}
+            WHERE {entity.fts} MATCH ? LIMIT ?
+        ) m
+        JOIN {entity.table} ON t.id = m.rowid {entity.joins}
+        ORDER BY m.score LIMIT ?
+        """,
+        (match, CANDIDATES, limit),
+    ).fetchall()
+    return [SearchHit(entity.name, *row) for row in rows]
+
+
+def search(text, limit=8, conn=None):
+    """Best matches per entity: [(SearchEntity, [SearchHit, ...]), ...], empty groups left out"""
+    match = match_expression(text)
+    if match is None:
+        return []
+    conn = conn if conn is not None else db_connection.connection()
+    results = []
+    for entity in ENTITIES:
+        hits = _search_entity(conn, entity, match, limit)
+        if hits:
+            results.append((entity, hits))
+    return results
+
+
+def rebuild():
+    """Re-index every FTS table from its content table"""
+    with db_connection.transaction() as conn:
+        for entity in ENTITIES:
+            conn.execute(f"INSERT INTO {entity.fts} ({entity.fts}) VALUES ('rebuild')")
+
+
+if __name__ == "__main__":
+    # python -m modules.search <words...> | --rebuild
+    if sys.argv[1:] == ["--rebuild"]:
+        rebuild()
+        print("search indexes rebuilt")
+    else:
+        for entity, hits in search(" ".join(sys.argv[1:])):
+            print(entity.label)
+            for hit in hits:
+                print(f"  {hit.id:>8}  {hit.title}  {hit.detail}")
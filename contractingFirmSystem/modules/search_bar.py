@@ -0,0 +1,109 @@
+from PyQt5 import QtCore, QtWidgets
+
+from modules import search
+
+
+class SearchBar(QtWidgets.QLineEdit):
+    """Type-ahead search box; results drop down grouped by entity.
+
+    Emits `activated(entity name, row id)` when a result is chosen with the
+    mouse or Enter. Searches run on the executor, latest keystroke wins.
+    """
+
+    activated = QtCore.pyqtSignal(str, int)
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.setPlaceholderText("Search clients, projects, employees, machines")
+        self.setClearButtonEnabled(True)
+        self.setMinimumWidth(320)
+
+        self._pending = None
+        self.results = QtWidgets.QTreeWidget(self)
+        self.results.setWindowFlags(QtCore.Qt.ToolTip)  # floats without taking focus
+        self.results.setHeaderHidden(True)
+        self.results.setColumnCount(2)
+        self.results.setRootIsDecorated(False)
+        self.results.setFocusPolicy(QtCore.Qt.NoFocus)
+        self.results.itemClicked.connect(self._choose)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(120)
+        self._timer.timeout.connect(self._search)
+        self.textChanged.connect(self._timer.start)
+
+    def _search(self):
+        text = self.text()
+        if search.match_expression(text) is None:
+            if self._pending is not None:
+                self.executor.cancel(self._pending)
+            self._show([])
+            return
+        self._pending = self.executor.submit(search.search, text, on_result=self._show, key="search")
+
+    def _show(self, groups):
+        self.results.clear()
+        if not groups:
+            self.results.hide()
+            return
+        first = None
+        for entity, hits in groups:
+            header = QtWidgets.QTreeWidgetItem([f"{entity.label} ({len(hits)})"])
+            header.setFlags(QtCore.Qt.ItemIsEnabled)
+            font = header.font(0)
+            font.setBold(True)
+            header.setFont(0, font)
+            self.results.addTopLevelItem(header)
+            for hit in hits:
+                item = QtWidgets.QTreeWidgetItem([f"   {hit.title}", hit.detail or ""])
+                item.setData(0, QtCore.Qt.UserRole, (hit.entity, hit.id))
+                self.results.addTopLevelItem(item)
+                first = first or item
+        self.results.resizeColumnToContents(0)
+        self.results.setCurrentItem(first)
+        rows = self.results.topLevelItemCount()
+        height = min(rows, 16) * self.results.sizeHintForRow(0) + 4
+        self.results.setGeometry(QtCore.QRect(self.mapToGlobal(QtCore.QPoint(0, self.height())),
+                                              QtCore.QSize(max(self.width(), 420), height)))
+        self.results.show()
+
+    def _move(self, step):
+        row = self.results.indexOfTopLevelItem(self.results.currentItem())
+        while 0 <= row + step < self.results.topLevelItemCount():
+            row += step
+            item = self.results.topLevelItem(row)
+            if item.data(0, QtCore.Qt.UserRole) is not None:
+                self.results.setCurrentItem(item)
+                return
+
+    def _choose(self, item):
+        target = item.data(0, QtCore.Qt.UserRole) if item is not None else None
+        if target is None:
+            return
+        self.results.hide()
+        self.activated.emit(*target)
+
+    def keyPressEvent(self, event):
+        if self.results.isVisible():
+            key = event.key()
+            if key in (QtCore.Qt.Key_Down, QtCore.Qt.Key_Up):
+                self._move(1 if key == QtCore.Qt.Key_Down else -1)
+                return
+            if key in (QtCore.Qt.Key_Return, QtCore.Qt.Key_Enter):
+                self._choose(self.results.currentItem())
+                return
+            if key == QtCore.Qt.Key_Escape:
+                self.results.hide()
+                return
+        super().keyPressEvent(event)
+
+    def focusOutEvent(self, event):
+        # a click on the results list arrives after focus leaves; hide a moment later
+        QtCore.QTimer.singleShot(150, self._hide_unless_focused)
+        super().focusOutEvent(event)
+
+    def _hide_unless_focused(self):
+        if not self.hasFocus():
+            self.results.hide()
@@ -0,0 +1,498 @@
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from modules import auth, db_connection, events, payroll, repositories, stats
+from modules.sources import SOURCES, ViewState
+
+# ---- JSON API SERVER ----
+# Serves one firm database to several desktops (FIRM_SERVER=http://host:8765,
+# see remote.py) and to scripts, over HTTP/1.1 keep-alive with JSON bodies.
+# Standard library only:
+#
+#     python -m modules.server --host 0.0.0.0 --port 8765
+#
+# One asyncio loop takes the requests; SQLite work runs on threads:
+#   * readers: a small pool of query_only connections whose authorizer admits
+#     nothing but SELECT (and hides users.password), for lists, reports and
+#     the desktop's own SQL through /api/sql;
+#   * the writer: a single thread and connection. Writes queue up, and each
+#     batch the queue holds runs in one transaction with a savepoint per
+#     write, so a failing write is undone alone and a burst of writes costs
+#     one commit instead of one each.
+# Every committed change (and every write by another process, noticed through
+# PRAGMA data_version) goes into a numbered change log that /api/changes
+# long-polls, so desktops refresh as they do for their own writes.
+#
+# Routes (all but login need "Authorization: Bearer <token>"; a token unused
+# for SESSION_IDLE expires):
+#   POST /api/login {username, password}   -> {token, user}
+#   POST /api/logout
+#   GET  /api/overview                     -> the Overview counters
+#   GET  /api/changes?after=N&wait=S       -> {sequence, changes: [[table, op, ids]]}
+#   POST /api/sql {sql, params}            -> {columns, rows}; one read-only statement, SQL_TIMEOUT at most
+#   POST /api/payroll {month, year, date_paid, status, preview}  date_paid must fall in year
+#   GET  /api/<list>?sort=&desc=&limit=&after=&filter=col:text  -> {headers, rows, next}
+#   POST /api/<table> {column: value}      -> {id}
+#   GET|PATCH|DELETE /api/<table>/<id>     PATCH ?version=N: 412 if the row has moved on; -> {changed, version}
+
+DEFAULT_PORT = 8765
+READERS = min(8, (os.cpu_count() or 1) + 2)
+WRITE_BATCH = 200        # most queued writes committed together
+WRITE_QUEUE = 10000      # queued writes before new ones wait for room
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BODY = 1 << 20       # bytes
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 120       # seconds an idle keep-alive connection is kept
+CHANGE_LOG = 10000       # changes kept for /api/changes; a client further behind gets EXTERNAL
+MAX_WAIT = 30            # longest /api/changes long poll, seconds
+EXTERNAL_POLL = 1.0      # seconds between checks for writes by other processes
+SQL_TIMEOUT = 10         # seconds an /api/sql statement may run before it is interrupted
+SESSION_IDLE = 8 * 3600  # seconds a login token lasts unused; a desktop's change feed keeps its own alive
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+# ---- DATABASE THREADS ----
+def _read_only(action, arg1, arg2, db_name, trigger):
+    """sqlite3 authorizer for reader connections"""
+    if action == sqlite3.SQLITE_READ and arg1 == "users" and arg2 == "password":
+        return sqlite3.SQLITE_IGNORE  # reads as NULL
+    if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE):
+        return sqlite3.SQLITE_OK
+    # opening an FTS5 index (search.py) declares its table and reads data_version;
+    # sqlite_master itself stays unwritable, and query_only refuses any write
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 == "data_version" and arg2 is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _open_reader():
+    conn = db_connection.connection()
+    conn.execute("PRAGMA query_only = ON")
+    conn.set_authorizer(_read_only)  # also refuses PRAGMA, so query_only stays on
+
+
+def _apply(batch):
+    """Run queued writes in one transaction, each in its own savepoint; [(ok, result or error)]"""
+    results = []
+    conn = db_connection.connection()
+    try:
+        with db_connection.transaction() as conn:
+            for fn, args, _future in batch:
+                mark = len(conn.pending_changes)
+                conn.execute("SAVEPOINT queued_write")
+                try:
+                    results.append((True, fn(*args)))
+                except Exception as error:
+                    conn.execute("ROLLBACK TO queued_write")
+                    del conn.pending_changes[mark:]  # its changes were undone
+                    results.append((False, error))
+                conn.execute("RELEASE queued_write")
+    except Exception as error:  # BEGIN or COMMIT failed, e.g. another process held the lock too long
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        conn.pending_changes.clear()
+        return [(False, error)] * len(batch)
+    return results
+
+
+def _run_sql(sql, params):
+    """One statement on a reader connection, encoded here rather than on the event loop"""
+    conn = db_connection.connection()
+    # a timer rather than a progress handler: the tracer (tracing.py) may own that
+    timer = threading.Timer(SQL_TIMEOUT, conn.interrupt)
+    timer.start()
+    try:
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall()
+    except sqlite3.Error as error:
+        if str(error) == "interrupted":
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Query stopped after {SQL_TIMEOUT}s") from None
+        raise HttpError(HTTPStatus.BAD_REQUEST, str(error)) from None
+    finally:
+        timer.cancel()
+    columns = [column[0] for column in cursor.description] if cursor.description else []
+    return _encode({"columns": columns, "rows": rows})
+
+
+def _page(source, state, last_key, limit):
+    """A list page and where the next one starts, encoded on the reader thread"""
+    rows = source.fetch_after(state, last_key, limit)
+    after = [rows[-1][state.sort_column], rows[-1][0]] if len(rows) == limit else None
+    return _encode({"headers": source.headers, "rows": rows, "next": after})
+
+
+def _encode(reply):
+    return json.dumps(reply, separators=(",", ":"), default=str).encode()
+
+
+class _Request:
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        parts = urlsplit(target)
+        self.path = [part for part in parts.path.split("/") if part]
+        self.params = parse_qs(parts.query)
+        self.headers = headers
+        self.body = body
+        self.user = None
+
+    def json(self):
+        try:
+            return json.loads(self.body) if self.body else {}
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body is not JSON") from None
+
+    def param(self, name, cast=str, default=None):
+        values = self.params.get(name)
+        if not values:
+            return default
+        try:
+            return cast(values[-1])
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Bad value for {name}") from None
+
+
+class Server:
+    """The API over db_connection's shared pool; see the top of this module"""
+
+    def __init__(self, readers=READERS):
+        self.readers = ThreadPoolExecutor(readers, "reader", initializer=_open_reader)
+        self.writer = ThreadPoolExecutor(1, "writer")
+        self.sessions = {}  # token -> [(id, username, role), last used (monotonic)]
+        self.log = deque(maxlen=CHANGE_LOG)  # (sequence, events.Change)
+        self.sequence = 0
+        self.requests = 0
+        self._changed = None  # asyncio.Event replaced at every change
+        self._writes = None
+        self._tasks = []
+        self._subscription = None
+
+    # ---- lifecycle ----
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._writes = asyncio.Queue(WRITE_QUEUE)
+        await loop.run_in_executor(self.writer, db_connection.connection)  # schema upgrades run here
+        watcher = events.DataVersionWatcher(db_connection.connection)
+        await loop.run_in_executor(self.writer, watcher.poll)  # baseline version
+        self._subscription = events.subscribe(lambda change: loop.call_soon_threadsafe(self._record, change))
+        self._tasks = [loop.create_task(self._write_loop()), loop.create_task(self._watch(watcher))]
+        return await asyncio.start_server(self._connection, host, port)
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._subscription is not None:
+            events.bus.unsubscribe(self._subscription)
+        self.readers.shutdown(wait=True, cancel_futures=True)
+        self.writer.shutdown(wait=True)
+        db_connection.close_all()
+
+    # ---- change log ----
+    def _record(self, change):
+        self.sequence += 1
+        self.log.append((self.sequence, change))
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _watch(self, watcher):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(EXTERNAL_POLL)
+            try:
+                await loop.run_in_executor(self.writer, watcher.poll)
+            except sqlite3.Error:
+                traceback.print_exc()
+
+    # ---- database work ----
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, fn, *args)
+
+    async def write(self, fn, *args):
+        """Queue a write for the writer thread; returns fn's result once committed"""
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((fn, args, future))
+        return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < WRITE_BATCH and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            results = await loop.run_in_executor(self.writer, _apply, batch)
+            for (_fn, _args, future), (ok, value) in zip(batch, results):
+                if not future.done():  # the client may have gone away
+                    future.set_result(value) if ok else future.set_exception(value)
+
+    # ---- HTTP ----
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                refusal = HTTPStatus.BAD_REQUEST, "Malformed request"
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                    if not line:
+                        break
+                    request, keep_alive = await self._read_request(line, reader)
+                except asyncio.TimeoutError:
+                    break
+                except ValueError:  # readline met a line longer than the stream limit (64 KiB)
+                    request = None
+                    refusal = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request line or header too long"
+                if request is None:
+                    status, body = refusal[0], _encode({"error": refusal[1]})
+                    keep_alive = False
+                else:
+                    status, body = await self._respond(request)
+                head = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                ]
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, line, reader):
+        """(_Request or None if malformed, keep the connection open)"""
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            return None, False
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+            if len(headers) > MAX_HEADERS:
+                return None, False
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            return None, False
+        if not 0 <= length <= MAX_BODY:
+            return None, False
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return _Request(method, target, headers, body), keep_alive
+
+    async def _respond(self, request):
+        self.requests += 1
+        try:
+            status, reply = await self._route(request)
+        except HttpError as error:
+            status, reply = error.status, {"error": error.message}
+        except repositories.ConflictError as error:
+            status, reply = HTTPStatus.PRECONDITION_FAILED, {"error": str(error)}
+        except sqlite3.IntegrityError as error:
+            status, reply = HTTPStatus.CONFLICT, {"error": str(error)}
+        except (ValueError, TypeError) as error:  # e.g. an unknown column
+            status, reply = HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        except Exception as error:
+            traceback.print_exc()
+            status, reply = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)}
+        return status, reply if isinstance(reply, bytes) else _encode(reply)
+
+    async def _route(self, request):
+        path, method = request.path, request.method
+        if len(path) < 2 or path[0] != "api":
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        if path[1:] == ["login"] and method == "POST":
+            return await self.login(request)
+        token = request.headers.get("authorization", "").partition("Bearer ")[2]
+        session = self.sessions.get(token)
+        now = time.monotonic()
+        if session is not None and now - session[1] > SESSION_IDLE:
+            del self.sessions[token]
+            session = None
+        if session is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Log in first")
+        session[1] = now
+        request.user = session[0]
+        name = path[1]
+        if len(path) == 2:
+            route = {
+                ("POST", "logout"): lambda: self.logout(token),
+                ("GET", "overview"): lambda: self.overview(),
+                ("GET", "changes"): lambda: self.changes(request),
+                ("POST", "sql"): lambda: self.sql(request),
+                ("POST", "payroll"): lambda: self.payroll(request),
+            }.get((method, name))
+            if route is not None:
+                return await route()
+            if method == "GET" and name in SOURCES:
+                return await self.list_rows(request, SOURCES[name])
+            if method == "POST" and name in repositories.BY_NAME:
+                return await self.insert(request, repositories.BY_NAME[name])
+        elif len(path) == 3 and name in repositories.BY_NAME:
+            try:
+                row_id = int(path[2])
+            except ValueError:
+                raise HttpError(HTTPStatus.NOT_FOUND) from None
+            repo = repositories.BY_NAME[name]
+            if method == "GET":
+                return await self.get_row(repo, row_id)
+            if method == "PATCH":
+                return await self.update(request, repo, row_id)
+            if method == "DELETE":
+                return HTTPStatus.OK, {"deleted": await self.write(repo.delete, row_id)}
+        raise HttpError(HTTPStatus.NOT_FOUND)
+
+    # ---- endpoints ----
+    async def login(self, request):
+        body = request.json()
+        # on the writer: reader connections cannot see passwords
+        user = await asyncio.get_running_loop().run_in_executor(
+            self.writer, auth.authenticate, str(body.get("username", "")), str(body.get("password", ""))
+        )
+        if user is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Invalid username or password")
+        self._prune_sessions()
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = [user, time.monotonic()]
+        user_id, username, role = user
+        return HTTPStatus.OK, {"token": token, "user": {"id": user_id, "username": username, "role": role}}
+
+    def _prune_sessions(self):
+        """Forget tokens unused for SESSION_IDLE; done at login, the only place they are added"""
+        cutoff = time.monotonic() - SESSION_IDLE
+        for token in [token for token, (_user, used) in self.sessions.items() if used < cutoff]:
+            del self.sessions[token]
+
+    async def logout(self, token):
+        self.sessions.pop(token, None)
+        return HTTPStatus.OK, {}
+
+    async def overview(self):
+        return HTTPStatus.OK, await self.read(stats.read_overview)
+
+    async def changes(self, request):
+        after = request.param("after", int)
+        if after is not None:
+            deadline = time.monotonic() + min(request.param("wait", float, 0), MAX_WAIT)
+            while self.sequence == after and time.monotonic() < deadline:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+        if after is None:
+            changes = []  # a client's starting point
+        elif after > self.sequence or (self.log and self.log[0][0] > after + 1):
+            changes = [events.EXTERNAL]  # the server restarted, or the log moved past the client
+        else:
+            changes = [change for sequence, change in self.log if sequence > after]
+        return HTTPStatus.OK, {"sequence": self.sequence, "changes": [list(change) for change in changes]}
+
+    async def sql(self, request):
+        body = request.json()
+        if not isinstance(body.get("sql"), str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "sql is required")
+        params = body.get("params") or []
+        if not isinstance(params, (list, dict)):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "params must be a list or an object")
+        return HTTPStatus.OK, await self.read(_run_sql, body["sql"], params)
+
+    async def payroll(self, request):
+        body = request.json()
+        month = str(body.get("month", "")).capitalize()
+        year = int(body.get("year") or time.localtime().tm_year)
+        if not month:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "month is required")
+        # settled before queueing: a date_paid outside the year is a 400 (ValueError, see _respond)
+        date_paid = payroll.paid_date(month, year, body.get("date_paid"))
+        if body.get("preview"):
+            plan = await self.read(payroll.preview, month, year, date_paid)
+            return HTTPStatus.OK, plan._asdict()
+        inserted = await self.write(payroll.run, month, year, date_paid, body.get("status") or "Paid")
+        return HTTPStatus.OK, {"inserted": inserted}
+
+    async def list_rows(self, request, source):
+        sort = request.param("sort", int, 0)
+        if not 0 <= sort < len(source.columns):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Bad value for sort")
+        filters = []
+        for text in request.params.get("filter", ()):
+            column, _, value = text.partition(":")
+            if not column.isdigit() or int(column) >= len(source.columns):
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"Bad filter {text!r}")
+            filters.append((int(column), value))
+        state = ViewState(sort, request.param("desc", int, int(source.descending)) == 1, tuple(filters))
+        limit = max(1, min(request.param("limit", int, PAGE_SIZE), MAX_PAGE_SIZE))
+        last_key = request.param("after", json.loads)
+        if last_key is not None and not (isinstance(last_key, list) and len(last_key) == 2):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "after must be [sort value, id]")
+        return HTTPStatus.OK, await self.read(_page, source, state, last_key, limit)
+
+    async def get_row(self, repo, row_id):
+        row = await self.read(repo.get, row_id)
+        if row is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No {repo.row_name} {row_id}")
+        return HTTPStatus.OK, row._asdict()
+
+    async def insert(self, request, repo):
+        values = request.json()
+        if not isinstance(values, dict) or not values:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Send the new row's columns as an object")
+        return HTTPStatus.CREATED, {"id": await self.write(lambda: repo.insert(**values))}
+
+    async def update(self, request, repo, row_id):
+        values = request.json()
+        if not isinstance(values, dict) or not values:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Send the columns to change as an object")
+        version = request.param("version", int)
+        new_version = await self.write(lambda: repo.update(row_id, version, **values))
+        return HTTPStatus.OK, {"changed": int(bool(new_version)), "version": new_version}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m modules.server", description="JSON API over the firm database")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0: every interface)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="database file (default: the app database)")
+    parser.add_argument("--readers", type=int, default=READERS, help="reader threads")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db or db_connection.DB_PATH)  # never another server's URL
+    print(f"Serving {db_connection.get_pool().path} on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(Server(args.readers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,206 @@
+from collections import namedtuple
+
+from modules import dates, db_connection
+
+# ---- LIST TAB QUERIES ----
+# What each list tab shows, and how a sorted, filtered view of it is read.
+# Kept free of Qt so exports and command-line tools can share it.
+
+FILTER_OPERATORS = ("<=", ">=", "!=", "<", ">", "=")
+FILTER_HELP = "Matches text anywhere; start with =, !=, <, >, <= or >= to compare values"
+
+
+class ViewState(namedtuple("ViewState", "sort_column descending filters")):
+    """Sort column index, direction and ((column index, text), ...) filters of one view.
+
+    Immutable, so a snapshot can be handed to a worker thread with the query.
+    """
+
+
+def _coerce(text):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _filter_clause(expr, text):
+    """Translate one filter box into (SQL condition, parameter)"""
+    text = text.strip()
+    for op in FILTER_OPERATORS:
+        if text.startswith(op):
+            return f"{expr} {op} ?", _coerce(text[len(op):].strip())
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{expr} LIKE ? ESCAPE '\\'", f"%{escaped}%"
+
+
+def sql_order(value):
+    """Python sort key matching SQLite's ordering of NULL < numbers < text < blobs"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, value)
+
+
+class TableSource:
+    """SQL for one list tab: column expressions, FROM clause and the unique key.
+
+    Rows are read a page at a time by keyset: ordered by (sort column, key) and
+    seeking past the (value, key) of the last row already shown, so the cost of
+    a page does not depend on how deep into the table it is.
+
+    `date_columns` hold stored date text (M/D/YYYY and friends, see dates.py),
+    which sorts by its ISO form rather than as text; text in no known format
+    sorts as itself.
+    """
+
+    def __init__(self, headers, columns, from_clause, key, descending=False, date_columns=()):
+        self.headers = headers
+        self.columns = list(columns)  # SQL expressions; columns[0] is the key
+        self.from_clause = from_clause
+        self.key = key
+        self.descending = descending
+        self.date_columns = frozenset(date_columns)
+
+    def default_state(self):
+        return ViewState(0, self.descending, ())
+
+    def sort_expr(self, column):
+        """SQL the view orders by for a column"""
+        expr = self.columns[column]
+        return dates.date_sort_sql(expr) if column in self.date_columns else expr
+
+    def sort_value(self, column, value):
+        """sort_expr() of a value the view shows in `column`, worked out in Python"""
+        if column in self.date_columns and isinstance(value, str):
+            return dates.date_key(value) or value
+        return value
+
+    def _select(self):
+        return f"SELECT {', '.join(self.columns)} FROM {self.from_clause}"
+
+    def _filters(self, state):
+        clauses, params = [], []
+        for column, text in state.filters:
+            clause, param = _filter_clause(self.columns[column], text)
+            clauses.append(clause)
+            params.append(param)
+        return clauses, params
+
+    def _seek(self, state, last_key):
+        """Condition selecting rows after `last_key` = (sort value, key)"""
+        value, key = last_key
+        if state.sort_column == 0:
+            return f"{self.key} {'<' if state.descending else '>'} ?", [key]
+        expr = self.sort_expr(state.sort_column)
+        value = self.sort_value(state.sort_column, value)
+        # NULLs sort first ascending and last descending, and never match a row-value comparison;
+        # the plain bound on expr lets an index on an expression (a date column's) seek too
+        if state.descending:
+            if value is None:
+                return f"({expr} IS NULL AND {self.key} < ?)", [key]
+            return f"(({expr} <= ? AND ({expr}, {self.key}) < (?, ?)) OR {expr} IS NULL)", [value, value, key]
+        if value is None:
+            return f"(({expr} IS NULL AND {self.key} > ?) OR {expr} IS NOT NULL)", [key]
+        return f"{expr} >= ? AND ({expr}, {self.key}) > (?, ?)", [value, value, key]
+
+    def query(self, state, last_key=None):
+        """(sql, params) of every row after `last_key` (None = from the start), in view order"""
+        clauses, params = self._filters(state)
+        if last_key is not None:
+            clause, seek_params = self._seek(state, last_key)
+            clauses.append(clause)
+            params.extend(seek_params)
+        sql = self._select()
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        direction = "DESC" if state.descending else "ASC"
+        if state.sort_column == 0:
+            sql += f" ORDER BY {self.key} {direction}"
+        else:
+            sql += f" ORDER BY {self.sort_expr(state.sort_column)} {direction}, {self.key} {direction}"
+        return sql, params
+
+    def fetch_after(self, state, last_key, limit):
+        """Return up to `limit` rows following `last_key` (None = from the start)"""
+        sql, params = self.query(state, last_key)
+        return db_connection.query(sql + " LIMIT ?", params + [limit])
+
+    def fetch_one(self, state, key):
+        """Return the row for one key as the view shows it, or None if filtered out"""
+        clauses, params = self._filters(state)
+        clauses.insert(0, f"{self.key} = ?")
+        params.insert(0, key)
+        return db_connection.query_one(f"{self._select()} WHERE {' AND '.join(clauses)}", params)
+
+
+# ---- LIST TAB SOURCES ----
+CLIENTS_SOURCE = TableSource(
+    ["ID", "Name", "Contact", "Address"],
+    ["id", "name", "contact", "address"],
+    "clients",
+    key="id",
+)
+PROJECTS_SOURCE = TableSource(
+    ["ID", "Client", "Project Name", "Value", "Status"],
+    ["projects.id", "clients.name", "projects.project_name", "projects.project_value", "projects.status"],
+    "projects LEFT JOIN clients ON projects.client_id = clients.id",
+    key="projects.id",
+)
+PAYMENTS_SOURCE = TableSource(
+    ["ID", "Project", "Amount", "Date"],
+    ["p.id", "pr.project_name", "p.amount", "p.date"],
+    "payments p LEFT JOIN projects pr ON p.project_id = pr.id",
+    key="p.id",
+    date_columns=(3,),
+)
+MACHINES_SOURCE = TableSource(
+    ["ID", "Name", "Type", "Purchase Date", "Cost", "Status"],
+    ["id", "machine_name", "machine_type", "purchase_date", "cost", "status"],
+    "machines",
+    key="id",
+    date_columns=(3,),
+)
+EMPLOYEES_SOURCE = TableSource(
+    ["ID", "Name", "Phone", "CNIC", "Designation", "Salary", "Status"],
+    ["id", "name", "phone", "cnic", "designation", "salary", "status"],
+    "employees",
+    key="id",
+)
+# one row per project: payments received come from the trigger-maintained
+# project_totals (migration 6), so no page ever sums the payments table
+_RECEIVED = "IFNULL(t.received, 0)"
+LEDGER_SOURCE = TableSource(
+    ["ID", "Client", "Project Name", "Value", "Received", "Outstanding", "% Paid", "Payments"],
+    [
+        "pr.id", "c.name", "pr.project_name", "pr.project_value", _RECEIVED,
+        f"IFNULL(pr.project_value, 0) - {_RECEIVED}",
+        f"CASE WHEN pr.project_value > 0 THEN ROUND(100.0 * {_RECEIVED} / pr.project_value, 1) END",
+        "IFNULL(t.payments, 0)",
+    ],
+    "projects pr LEFT JOIN clients c ON pr.client_id = c.id LEFT JOIN project_totals t ON t.project_id = pr.id",
+    key="pr.id",
+)
+SALARY_SOURCE = TableSource(
+    ["ID", "Employee", "Amount", "Month", "Paid On", "Status"],
+    ["es.id", "e.name", "es.salary_amount", "es.month", "es.date_paid", "es.status"],
+    "employee_salaries es JOIN employees e ON es.employee_id = e.id",
+    key="es.id",
+    descending=True,
+    date_columns=(4,),
+)
+
+SOURCES = {
+    "clients": CLIENTS_SOURCE,
+    "projects": PROJECTS_SOURCE,
+    "payments": PAYMENTS_SOURCE,
+    "ledger": LEDGER_SOURCE,
+    "machines": MACHINES_SOURCE,
+    "employees": EMPLOYEES_SOURCE,
+    "salaries": SALARY_SOURCE,
+}
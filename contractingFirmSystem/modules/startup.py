@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+# ---- STARTUP PROFILE ----
+# `python main.py --profile-startup` (or FIRM_PROFILE_STARTUP=1) timestamps
+# each startup step with mark() and prints the breakdown once the dashboard
+# is up. Without it mark() returns at once.
+
+_marks = None    # [(name, seconds since start)]
+_started = None
+
+
+def enable(started=None):
+    """Start recording; `started` is a perf_counter() taken at process start"""
+    global _marks, _started
+    _started = started if started is not None else time.perf_counter()
+    _marks = []
+
+
+def requested(argv=None):
+    argv = sys.argv if argv is None else argv
+    return "--profile-startup" in argv or os.environ.get("FIRM_PROFILE_STARTUP", "") not in ("", "0")
+
+
+def enabled():
+    return _marks is not None
+
+
+def mark(name):
+    """The step `name` ended now; it started at the previous mark"""
+    if _marks is not None:
+        _marks.append((name, time.perf_counter() - _started))
+
+
+def report(file=None):
+    """Print each step with its duration and end time, then stop recording"""
+    global _marks
+    if _marks is None:
+        return
+    file = file or sys.stderr
+    print(f"{'step':<28} {'ms':>8} {'at ms':>8}", file=file)
+    previous = 0.0
+    for name, at in _marks:
+        print(f"{name:<28} {(at - previous) * 1000:>8.1f} {at * 1000:>8.1f}", file=file)
+        previous = at
+    _marks = None
@@ -0,0 +1,222 @@
+import sys
+
+from modules import dates, db_connection
+
+# ---- OVERVIEW COUNTERS ----
+# dashboard_stats and salary_month_totals are maintained by the triggers from
+# migration 3, project_totals by those from migration 6 and the cash-flow
+# rollups (see modules/reports.py) by those from migration 7. The queries below
+# recompute the same values from the base tables; rebuild() uses them to reset
+# the counters and verify() to find drift.
+
+EXPECTED_STATS_SQL = """
+    SELECT 'clients', COUNT(*) FROM clients
+    UNION ALL SELECT 'projects', COUNT(*) FROM projects
+    UNION ALL SELECT 'projects_status:' || IFNULL(status, ''), COUNT(*) FROM projects GROUP BY 1
+    UNION ALL SELECT 'payments', COUNT(*) FROM payments
+    UNION ALL SELECT 'payments_total', IFNULL(SUM(amount), 0) FROM payments
+"""
+
+EXPECTED_SALARY_MONTHS_SQL = """
+    SELECT IFNULL(month, ''), IFNULL(SUM(salary_amount), 0), COUNT(*)
+    FROM employee_salaries GROUP BY 1
+"""
+
+# the grouped aggregate project_totals caches; idx_payments_project covers it
+EXPECTED_PROJECT_TOTALS_SQL = """
+    SELECT project_id, IFNULL(SUM(amount), 0), COUNT(*)
+    FROM payments GROUP BY project_id
+"""
+
+_PAYMENT_MONTH = f"IFNULL({dates.month_key_sql('p.date')}, '')"
+_SALARY_MONTH = f"IFNULL({dates.period_key_sql('s.month', 's.date_paid')}, '')"
+
+EXPECTED_CASH_FLOW_SQL = f"""
+    SELECT month, SUM(income), SUM(payments), SUM(payroll), SUM(salaries) FROM (
+        SELECT {_PAYMENT_MONTH} AS month, IFNULL(p.amount, 0) AS income, 1 AS payments,
+               0 AS payroll, 0 AS salaries
+        FROM payments p
+        UNION ALL
+        SELECT {_SALARY_MONTH}, 0, 0, IFNULL(s.salary_amount, 0), 1 FROM employee_salaries s
+    ) GROUP BY month
+"""
+
+EXPECTED_CLIENT_INCOME_SQL = f"""
+    SELECT IFNULL(pr.client_id, 0), {_PAYMENT_MONTH}, IFNULL(SUM(p.amount), 0), COUNT(*)
+    FROM payments p LEFT JOIN projects pr ON pr.id = p.project_id
+    GROUP BY 1, 2
+"""
+
+# the same rollups for just the rows after an id, added onto what is stored; see add_cash_flow
+_ADD_CASH_FLOW = "ON CONFLICT(month) DO UPDATE SET income = income + excluded.income, " \
+    "payments = payments + excluded.payments, payroll = payroll + excluded.payroll, " \
+    "salaries = salaries + excluded.salaries"
+ADDED_CASH_FLOW_SQL = {
+    "payments": [
+        f"""
+        INSERT INTO cash_flow_months (month, income, payments, payroll, salaries)
+        SELECT {_PAYMENT_MONTH}, IFNULL(SUM(p.amount), 0), COUNT(*), 0, 0 FROM payments p
+        WHERE p.id > ? GROUP BY 1 {_ADD_CASH_FLOW}
+        """,
+        f"""
+        INSERT INTO client_month_income (client_id, month, income, payments)
+        SELECT IFNULL(pr.client_id, 0), {_PAYMENT_MONTH}, IFNULL(SUM(p.amount), 0), COUNT(*)
+        FROM payments p LEFT JOIN projects pr ON pr.id = p.project_id
+        WHERE p.id > ? GROUP BY 1, 2
+        ON CONFLICT(client_id, month) DO UPDATE SET income = income + excluded.income,
+            payments = payments + excluded.payments
+        """,
+    ],
+    "employee_salaries": [
+        f"""
+        INSERT INTO cash_flow_months (month, income, payments, payroll, salaries)
+        SELECT {_SALARY_MONTH}, 0, 0, IFNULL(SUM(s.salary_amount), 0), COUNT(*) FROM employee_salaries s
+        WHERE s.id > ? GROUP BY 1 {_ADD_CASH_FLOW}
+        """,
+    ],
+}
+
+TOLERANCE = 1e-6  # float sums drift in the last digits
+
+
+def _conn(conn):
+    return conn if conn is not None else db_connection.connection()
+
+
+def read_overview(conn=None):
+    """Counters for the Overview tab, read in O(1)"""
+    values = dict(_conn(conn).execute(
+        "SELECT name, value FROM dashboard_stats "
+        "WHERE name IN ('clients', 'projects', 'projects_status:ongoing', 'payments_total')"
+    ).fetchall())
+    return {
+        "clients": int(values.get("clients", 0)),
+        "projects": int(values.get("projects", 0)),
+        "ongoing_projects": int(values.get("projects_status:ongoing", 0)),
+        "payments_total": float(values.get("payments_total", 0)),
+    }
+
+
+def salary_month_totals(conn=None):
+    """{month: (total, records)} for every month that has salary records"""
+    rows = _conn(conn).execute(
+        "SELECT month, total, records FROM salary_month_totals WHERE records != 0"
+    ).fetchall()
+    return {month: (total, records) for month, total, records in rows}
+
+
+def ledger_totals(conn=None):
+    """Contract value, received and outstanding summed over all projects, for the Ledger tab"""
+    projects, value, received = _conn(conn).execute(
+        "SELECT COUNT(*), IFNULL(SUM(pr.project_value), 0), IFNULL(SUM(t.received), 0) "
+        "FROM projects pr LEFT JOIN project_totals t ON t.project_id = pr.id"
+    ).fetchone()
+    return {"projects": projects, "value": value, "received": received, "outstanding": value - received}
+
+
+def _write(conn, statements):
+    if conn.in_transaction:
+        for statement in statements:
+            conn.execute(statement)
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for statement in statements:
+            conn.execute(statement)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def rebuild(conn=None):
+    """Recompute the overview counters from the base tables"""
+    _write(_conn(conn), [
+        "DELETE FROM dashboard_stats",
+        f"INSERT INTO dashboard_stats (name, value) {EXPECTED_STATS_SQL}",
+        "DELETE FROM salary_month_totals",
+        f"INSERT INTO salary_month_totals (month, total, records) {EXPECTED_SALARY_MONTHS_SQL}",
+    ])
+
+
+def rebuild_project_totals(conn=None):
+    """Recompute project_totals from the payments table"""
+    _write(_conn(conn), [
+        "DELETE FROM project_totals",
+        f"INSERT INTO project_totals (project_id, received, payments) {EXPECTED_PROJECT_TOTALS_SQL}",
+    ])
+
+
+def rebuild_cash_flow(conn=None):
+    """Recompute the monthly cash-flow rollups from payments and salaries"""
+    _write(_conn(conn), [
+        "DELETE FROM cash_flow_months",
+        f"INSERT INTO cash_flow_months (month, income, payments, payroll, salaries) {EXPECTED_CASH_FLOW_SQL}",
+        "DELETE FROM client_month_income",
+        f"INSERT INTO client_month_income (client_id, month, income, payments) {EXPECTED_CLIENT_INCOME_SQL}",
+    ])
+
+
+def add_cash_flow(conn, table, after_id):
+    """Roll up the rows of `table` with ids above `after_id`, inserted while bulk_insert.active was set"""
+    for statement in ADDED_CASH_FLOW_SQL[table]:
+        conn.execute(statement, (after_id,))
+
+
+def _differs(stored, actual):
+    return abs((stored or 0) - (actual or 0)) > TOLERANCE * max(1.0, abs(actual or 0))
+
+
+def verify(conn=None):
+    """Return [(counter, stored, actual)] for every counter that has drifted"""
+    conn = _conn(conn)
+    drift = []
+
+    stored = dict(conn.execute("SELECT name, value FROM dashboard_stats").fetchall())
+    actual = dict(conn.execute(EXPECTED_STATS_SQL).fetchall())
+    for name in sorted(set(stored) | set(actual)):
+        if _differs(stored.get(name), actual.get(name)):
+            drift.append((name, stored.get(name), actual.get(name)))
+
+    for label, stored_sql, actual_sql, keys in (
+        ("salary_month", "SELECT month, total, records FROM salary_month_totals", EXPECTED_SALARY_MONTHS_SQL, 1),
+        ("project", "SELECT project_id, received, payments FROM project_totals", EXPECTED_PROJECT_TOTALS_SQL, 1),
+        ("cash_flow", "SELECT month, income, payments, payroll, salaries FROM cash_flow_months",
+         EXPECTED_CASH_FLOW_SQL, 1),
+        ("client_income", "SELECT client_id, month, income, payments FROM client_month_income",
+         EXPECTED_CLIENT_INCOME_SQL, 2),
+    ):
+        drift += _keyed_drift(conn, label, stored_sql, actual_sql, keys)
+    return drift
+
+
+def _keyed_drift(conn, label, stored_sql, actual_sql, keys):
+    """Drift between two queries returning (key columns..., values...); a missing row counts as zeros"""
+    stored = {row[:keys]: row[keys:] for row in conn.execute(stored_sql)}
+    actual = {row[:keys]: row[keys:] for row in conn.execute(actual_sql)}
+    drift = []
+    for key in sorted(set(stored) | set(actual), key=lambda k: tuple(map(str, k))):
+        s_values, a_values = stored.get(key), actual.get(key)
+        zeros = (0,) * len(s_values or a_values)
+        s_values, a_values = s_values or zeros, a_values or zeros
+        if any(_differs(s, a) for s, a in zip(s_values, a_values)):
+            drift.append((f"{label}:{':'.join(map(str, key))}", s_values, a_values))
+    return drift
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "rebuild":
+        rebuild()
+        rebuild_project_totals()
+        rebuild_cash_flow()
+        print("Overview counters, project totals and cash-flow rollups rebuilt")
+    elif command == "verify":
+        problems = verify()
+        for name, stored_value, actual_value in problems:
+            print(f"{name}: stored {stored_value}, actual {actual_value}")
+        print("Counters match the base tables" if not problems else f"{len(problems)} counter(s) drifted")
+        sys.exit(1 if problems else 0)
+    else:
+        print("usage: python -m modules.stats [verify|rebuild]")
+        sys.exit(2)
@@ -0,0 +1,351 @@
+import gzip
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+
+from modules import db_connection, events, migrations, repositories
+
+# ---- DELTA SYNC BETWEEN SITES ----
+# Site laptops and head office each keep their own firm.db and trade files of
+# what changed instead of whole databases. Migration 9's triggers log every
+# insert, update and delete in change_log, and every row has a uuid that is
+# the same in every copy, whatever id each file gave it. A sync file holds the
+# rows logged since the other site last confirmed what it has (the watermark,
+# sync_peers.acked), so its size and the time to write and apply it follow the
+# day's changes, not the size of the database:
+#
+#     python cli.py --user admin sync clone laptop1.db --name "Laptop 1"      (once, at head office)
+#     python cli.py --user admin sync export "Head office" to-office.sync     (on the laptop)
+#     python cli.py --user admin sync import to-office.sync                   (at head office)
+#
+# and the same the other way. Each file also carries the sender's watermark
+# for the receiver, so a lost file is simply covered by the next one, and a
+# file imported twice changes nothing the second time. Every site settles a
+# conflict the same way: the later updated_at wins, equal times go to the
+# larger row values, a delete beats edits made before it, and an edit made
+# after a delete elsewhere brings the row back.
+
+FORMAT = "firm-sync"
+FORMAT_VERSION = 1
+BATCH = 1000  # rows per line of a sync file, and per transaction when applying one
+
+# parents before children, so a new row's references can be resolved when it arrives
+TABLES = ("users", "clients", "projects", "payments", "machines", "employees", "employee_salaries")
+REFERENCES = {  # column -> table whose rows it points at; sent as uuids
+    "projects": {"client_id": "clients"},
+    "payments": {"project_id": "projects"},
+    "employee_salaries": {"employee_id": "employees"},
+}
+
+Peer = namedtuple("Peer", "site name acked received pending")
+SyncReport = namedtuple("SyncReport", "applied skipped deleted rejected errors seconds")
+MAX_REPORTED_ERRORS = 100
+
+
+def site(conn=None):
+    """(id, name) of this database as a sync site"""
+    conn = conn or db_connection.connection()
+    return tuple(conn.execute("SELECT id, name FROM sync_site").fetchone())
+
+
+def _last_seq(conn):
+    # from sqlite_sequence rather than MAX(seq): pruning may have removed the latest entries
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def _pending(conn, peer, since):
+    return conn.execute(
+        "SELECT COUNT(*) FROM change_log WHERE seq > ? AND (origin IS NULL OR origin != ?)", (since, peer)
+    ).fetchone()[0]
+
+
+def peers(conn=None):
+    """Sites this database syncs with, and how many changes each has still to confirm"""
+    conn = conn or db_connection.connection()
+    return [
+        Peer(peer, name, acked, received, _pending(conn, peer, acked))
+        for peer, name, acked, received in conn.execute(
+            "SELECT site, name, acked, received FROM sync_peers ORDER BY name"
+        ).fetchall()
+    ]
+
+
+def find_peer(conn, name):
+    """The Peer called `name`, or whose site id is or starts with it"""
+    matches = [p for p in peers(conn) if name in (p.name, p.site) or p.site.startswith(name.lower())]
+    if len(matches) != 1:
+        known = ", ".join(f"{p.name} ({p.site[:8]})" for p in peers(conn)) or "none yet"
+        raise ValueError(f"No single sync site matches '{name}'; known sites: {known}")
+    return matches[0]
+
+
+# ---- NEW SITES ----
+def clone(path, name):
+    """Copy this database to `path` as a new site that syncs with this one.
+
+    Use this instead of copying firm.db: the copy gets its own site id, and
+    each side starts its watermark for the other at the moment of the copy.
+    """
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    conn = db_connection.connection()
+    my_id, my_name = site(conn)
+    if any(p.name == name for p in peers(conn)) or name == my_name:
+        raise ValueError(f"There is already a site called '{name}'")
+    target = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.backup(target)  # a consistent copy even while the dashboard writes
+        copied = _last_seq(target)  # everything logged up to here is in the copy
+        target.execute("BEGIN IMMEDIATE")
+        target.execute(f"UPDATE sync_site SET id = {migrations.NEW_UUID_SQL}, name = ?", (name,))
+        target.execute("DELETE FROM sync_peers")
+        target.execute(
+            "INSERT INTO sync_peers (site, name, acked, received) VALUES (?, ?, ?, ?)",
+            (my_id, my_name, copied, copied),
+        )
+        target.execute("DELETE FROM change_log WHERE op = 'upsert'")  # deletes stay as tombstones
+        new_id = target.execute("SELECT id FROM sync_site").fetchone()[0]
+        target.execute("COMMIT")
+    finally:
+        target.close()
+    with db_connection.transaction() as conn:
+        conn.execute(
+            "INSERT INTO sync_peers (site, name, acked, received) VALUES (?, ?, ?, ?)",
+            (new_id, name, copied, copied),
+        )
+    return new_id
+
+
+# ---- EXPORT ----
+def _row_sql(table):
+    """SELECT of a row as it travels: uuid, updated_at, then columns with references as uuids"""
+    refs = REFERENCES.get(table, {})
+    values = [
+        f"(SELECT uuid FROM {refs[column]} WHERE id = t.{column})" if column in refs else f"t.{column}"
+        for column in repositories.BY_TABLE[table].columns
+    ]
+    return f"SELECT t.uuid, t.updated_at, {', '.join(values)} FROM {table} t"
+
+
+def export_changes(path, peer_name):
+    """Write what `peer_name` has not confirmed yet to `path`; returns (rows, deletes, seconds)"""
+    start = time.perf_counter()
+    rows = deletes = 0
+    part = path + ".part"
+    # one read transaction: the log and the rows it points at come from the same moment
+    with db_connection.transaction("DEFERRED") as conn, gzip.open(part, "wt", encoding="utf-8") as f:
+        my_id, my_name = site(conn)
+        peer = find_peer(conn, peer_name)
+        header = {
+            "format": FORMAT, "version": FORMAT_VERSION, "site": my_id, "name": my_name, "peer": peer.site,
+            "since": peer.acked, "until": _last_seq(conn), "ack": peer.received,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        f.write(json.dumps(header) + "\n")
+        # changes that came from the peer itself are not sent back
+        for table in TABLES:
+            cursor = conn.execute(
+                f"""
+                {_row_sql(table)} WHERE t.id IN (
+                    SELECT row_id FROM change_log WHERE seq > ? AND table_name = ? AND op = 'upsert'
+                    AND (origin IS NULL OR origin != ?)
+                )
+                """,
+                (peer.acked, table, peer.site),
+            )
+            columns = ["uuid", "updated_at"] + list(repositories.BY_TABLE[table].columns)
+            while batch := cursor.fetchmany(BATCH):
+                f.write(json.dumps({"table": table, "columns": columns, "upsert": batch}) + "\n")
+                rows += len(batch)
+        cursor = conn.execute(
+            """
+            SELECT table_name, row_uuid, MAX(changed_at) FROM change_log
+            WHERE seq > ? AND op = 'delete' AND (origin IS NULL OR origin != ?)
+            GROUP BY table_name, row_uuid ORDER BY table_name
+            """,
+            (peer.acked, peer.site),
+        )
+        while batch := cursor.fetchmany(BATCH):
+            f.write(json.dumps({"delete": batch}) + "\n")
+            deletes += len(batch)
+    os.replace(part, path)
+    return rows, deletes, time.perf_counter() - start
+
+
+# ---- IMPORT ----
+def _newer(conn, table, incoming, local_id, local_updated_at):
+    """Whether an incoming row beats the local one; the same answer at every site"""
+    if (incoming[1] or "") != (local_updated_at or ""):
+        return (incoming[1] or "") > (local_updated_at or "")
+    local = conn.execute(f"{_row_sql(table)} WHERE t.id = ?", (local_id,)).fetchone()
+    return json.dumps(list(incoming[2:])) > json.dumps(list(local[2:]))
+
+
+def _tombstone(conn, row_uuid):
+    return conn.execute(
+        "SELECT MAX(changed_at) FROM change_log WHERE row_uuid = ? AND op = 'delete'", (row_uuid,)
+    ).fetchone()[0]
+
+
+class _Applier:
+    """Applies the lines of one sync file; tallies for the report"""
+
+    def __init__(self):
+        self.applied = self.skipped = self.deleted = self.rejected = 0
+        self.errors = []
+        self._ids = {}  # (table, uuid) -> local id, for references
+
+    def _local_id(self, conn, table, row_uuid):
+        if row_uuid is None:
+            return None
+        key = (table, row_uuid)
+        if key not in self._ids:
+            row = conn.execute(f"SELECT id FROM {table} WHERE uuid = ?", (row_uuid,)).fetchone()
+            if row is None:
+                return None  # not here (deleted); the column is left empty
+            self._ids[key] = row[0]
+        return self._ids[key]
+
+    def _reject(self, table, row_uuid, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((table, row_uuid, str(error)))
+
+    def upsert(self, conn, table, columns, rows):
+        names = columns[2:]
+        refs = REFERENCES.get(table, {})
+        insert = (
+            f"INSERT INTO {table} (uuid, updated_at, {', '.join(names)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(names))})"
+        )
+        update = (
+            f"UPDATE {table} SET updated_at = ?, {', '.join(f'{name} = ?' for name in names)}, "
+            f"version = version + 1 WHERE id = ?"  # a new version, so forms opened before this notice
+        )
+        changed = 0
+        for row in rows:
+            row_uuid, updated_at = row[0], row[1]
+            values = [
+                self._local_id(conn, refs[name], value) if name in refs else value
+                for name, value in zip(names, row[2:])
+            ]
+            local = conn.execute(f"SELECT id, updated_at FROM {table} WHERE uuid = ?", (row_uuid,)).fetchone()
+            try:
+                if local is None:
+                    deleted_at = _tombstone(conn, row_uuid)
+                    if deleted_at is not None and deleted_at >= (updated_at or ""):
+                        self.skipped += 1  # deleted here after this edit
+                        continue
+                    conn.execute(insert, [row_uuid, updated_at] + values)
+                elif _newer(conn, table, row, *local):
+                    conn.execute(update, [updated_at] + values + [local[0]])
+                else:
+                    self.skipped += 1
+                    continue
+            except sqlite3.IntegrityError as error:
+                self._reject(table, row_uuid, error)
+                continue
+            self.applied += 1
+            changed += 1
+        if changed:
+            events.publish(table, "update", None, conn)
+
+    def delete(self, conn, rows):
+        tables = set()
+        for table, row_uuid, deleted_at in rows:
+            local = conn.execute(f"SELECT id, updated_at FROM {table} WHERE uuid = ?", (row_uuid,)).fetchone()
+            if local is not None and (local[1] or "") > deleted_at:
+                self.skipped += 1  # edited here after the delete: the row stays
+                continue
+            if local is not None:
+                # the delete trigger logs the tombstone with the original time
+                conn.execute("UPDATE sync_apply SET deleted_at = ?", (deleted_at,))
+                conn.execute(f"DELETE FROM {table} WHERE id = ?", (local[0],))
+                self._ids.pop((table, row_uuid), None)
+                tables.add(table)
+                self.deleted += 1
+            elif (_tombstone(conn, row_uuid) or "") < deleted_at:
+                # never here or already gone: keep the tombstone, and pass it on to other sites
+                conn.execute(
+                    "INSERT INTO change_log (table_name, row_uuid, op, changed_at, origin) "
+                    "VALUES (?, ?, 'delete', ?, (SELECT origin FROM sync_apply))",
+                    (table, row_uuid, deleted_at),
+                )
+                self.skipped += 1
+            else:
+                self.skipped += 1
+        conn.execute("UPDATE sync_apply SET deleted_at = NULL")
+        for table in tables:
+            events.publish(table, "delete", None, conn)
+
+
+def import_changes(path, progress=None):
+    """Apply a sync file made for this database by export_changes; returns a SyncReport"""
+    start = time.perf_counter()
+    conn = db_connection.connection()
+    my_id, _my_name = site(conn)
+    applier = _Applier()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT or header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a sync file this version can read")
+        if header["site"] == my_id:
+            raise ValueError(f"{path} was made by this database")
+        if header["peer"] != my_id:
+            raise ValueError(f"{path} was made for another site")
+        known = conn.execute("SELECT received FROM sync_peers WHERE site = ?", (header["site"],)).fetchone()
+        received = known[0] if known else 0
+        if header["since"] > received:
+            raise ValueError(
+                f"Changes from {header['name']} after {received} are missing: "
+                f"import the file made before this one first"
+            )
+        for line in f:
+            batch = json.loads(line)
+            with db_connection.transaction() as conn:
+                # changes logged while this is set are known to the sender already
+                conn.execute("UPDATE sync_apply SET origin = ?", (header["site"],))
+                if "upsert" in batch:
+                    applier.upsert(conn, batch["table"], batch["columns"], batch["upsert"])
+                else:
+                    applier.delete(conn, batch["delete"])
+                conn.execute("UPDATE sync_apply SET origin = NULL")
+            if progress is not None:
+                progress(applier.applied + applier.skipped + applier.deleted + applier.rejected)
+    with db_connection.transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO sync_peers (site, name, acked, received) VALUES (:site, :name, :ack, :until)
+            ON CONFLICT(site) DO UPDATE SET
+                name = COALESCE(sync_peers.name, excluded.name),
+                acked = MAX(sync_peers.acked, excluded.acked),
+                received = MAX(sync_peers.received, excluded.received)
+            """,
+            header,
+        )
+        prune()
+    return SyncReport(applier.applied, applier.skipped, applier.deleted, applier.rejected, applier.errors,
+                      time.perf_counter() - start)
+
+
+def prune():
+    """Drop logged upserts every peer has confirmed; deletes stay as tombstones"""
+    with db_connection.transaction() as conn:
+        confirmed = conn.execute("SELECT MIN(acked) FROM sync_peers").fetchone()[0]
+        if confirmed is None:
+            confirmed = _last_seq(conn)  # nobody to send them to; a later clone starts from here
+        return conn.execute("DELETE FROM change_log WHERE seq <= ? AND op = 'upsert'", (confirmed,)).rowcount
+
+
+def format_report(report):
+    lines = [
+        f"Applied {report.applied} rows and {report.deleted} deletes in {report.seconds:.1f}s; "
+        f"{report.skipped} already up to date or older than what is here"
+    ]
+    if report.rejected:
+        lines.append(f"Rejected {report.rejected} rows")
+        lines += [f"  {table} {row_uuid}: {error}" for table, row_uuid, error in report.errors[:10]]
+    return "\n".join(lines)
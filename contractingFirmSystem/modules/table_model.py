@@ -0,0 +1,374 @@
+import bisect
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtWidgets
+
+from modules.sources import FILTER_HELP, sql_order
+
+
+class SqlTableModel(QtCore.QAbstractTableModel):
+    """Read-only table model that pulls rows from a TableSource in chunks.
+
+    Rows are exposed incrementally through canFetchMore/fetchMore as the view
+    scrolls. Only the most recently used `max_chunks` chunks are kept in memory;
+    an evicted chunk is re-read on demand by seeking past the last key of the
+    chunk before it, so memory stays bounded however far the user scrolls.
+
+    With an `executor` every fetch runs on a worker thread and rows are added
+    when the result arrives; without one the model fetches synchronously.
+
+    After a write, insert_row/update_row/remove_key patch a single row in place
+    instead of reloading; apply_changes does this for change events
+    (events.Change) on the source table.
+
+    Header clicks (sort) and set_filters change the ViewState and reload; both
+    are pushed down into the SQL.
+    """
+
+    PATCH_LIMIT = 100  # rows re-read one by one after a write; more than this reloads
+
+    def __init__(self, source, chunk_size=256, max_chunks=20, executor=None, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.executor = executor
+        self.state = source.default_state()
+        self._chunks = OrderedDict()   # chunk number -> list of rows (LRU order)
+        self._bounds = []              # (sort value, key) of the last row of each loaded chunk
+        self._starts = []              # first model row of each chunk
+        self._sizes = []               # row count of each chunk
+        self._row_count = 0
+        self._exhausted = True
+        self._fetching = False
+        self._requested = set()        # evicted chunks being re-read
+        self._generation = 0           # bumped on reload so stale results are dropped
+        self.loaded = False            # False until the first reload delivers rows
+
+    def _run(self, fn, args, on_result, key=None):
+        if self.executor is None:
+            on_result(fn(*args))
+        else:
+            self.executor.submit(fn, *args, on_result=on_result, key=key)
+
+    def _key_of(self, row):
+        return (row[self.state.sort_column], row[0])
+
+    def _before(self, a, b):
+        """True if key `a` sorts before key `b` in this model's order"""
+        column = self.state.sort_column
+        a = (sql_order(self.source.sort_value(column, a[0])), a[1])
+        b = (sql_order(self.source.sort_value(column, b[0])), b[1])
+        return a > b if self.state.descending else a < b
+
+    def row_fetcher(self):
+        """Callable re-reading one row under the current sort/filters (safe to run on a worker)"""
+        source, state = self.source, self.state
+        return lambda key: source.fetch_one(state, key)
+
+    # ---- sorting and filtering ----
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        state = self.state._replace(sort_column=column, descending=order == QtCore.Qt.DescendingOrder)
+        if state != self.state:
+            self.state = state
+            self.reload()
+
+    def set_filters(self, filters):
+        """Apply {column index: filter text}; empty texts are ignored"""
+        filters = tuple(sorted((c, t) for c, t in filters.items() if t.strip()))
+        if filters != self.state.filters:
+            self.state = self.state._replace(filters=filters)
+            self.reload()
+
+    # ---- loading ----
+    def reload(self):
+        self._generation += 1
+        generation = self._generation
+        self._run(
+            self.source.fetch_after, (self.state, None, self.chunk_size),
+            lambda rows: self._reset(generation, rows),
+            key=("reload", id(self)),
+        )
+
+    def _reset(self, generation, rows):
+        if generation != self._generation:
+            return
+        self.beginResetModel()
+        self._chunks.clear()
+        self._bounds = []
+        self._starts = []
+        self._sizes = []
+        self._row_count = 0
+        self._fetching = False
+        self._requested.clear()
+        self._exhausted = len(rows) < self.chunk_size
+        self._append(rows)
+        self.loaded = True
+        self.endResetModel()
+
+    def _append(self, rows):
+        if rows:
+            self._store(len(self._bounds), list(rows))
+            self._bounds.append(self._key_of(rows[-1]))
+            self._starts.append(self._row_count)
+            self._sizes.append(len(rows))
+            self._row_count += len(rows)
+
+    def _store(self, chunk_no, rows):
+        self._chunks[chunk_no] = rows
+        self._chunks.move_to_end(chunk_no)
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+
+    def _chunk(self, chunk_no):
+        """Rows of a chunk, or None while an evicted chunk is being re-read"""
+        rows = self._chunks.get(chunk_no)
+        if rows is not None:
+            self._chunks.move_to_end(chunk_no)
+            return rows
+        if chunk_no not in self._requested:
+            self._requested.add(chunk_no)
+            generation = self._generation
+            last_key = self._bounds[chunk_no - 1] if chunk_no else None
+            self._run(
+                self.source.fetch_after, (self.state, last_key, self._sizes[chunk_no]),
+                lambda rows: self._chunk_loaded(generation, chunk_no, rows),
+            )
+        return self._chunks.get(chunk_no)
+
+    def _chunk_loaded(self, generation, chunk_no, rows):
+        if generation != self._generation:
+            return
+        self._requested.discard(chunk_no)
+        self._store(chunk_no, list(rows))
+        first = self._starts[chunk_no]
+        last = first + self._sizes[chunk_no] - 1
+        if self.executor is not None and last >= first:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, self.columnCount() - 1))
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._fetching = True
+        generation = self._generation
+        last_key = self._bounds[-1] if self._bounds else None
+        self._run(
+            self.source.fetch_after, (self.state, last_key, self.chunk_size),
+            lambda rows: self._more_loaded(generation, rows),
+        )
+
+    def _more_loaded(self, generation, rows):
+        if generation != self._generation:
+            return
+        self._fetching = False
+        if len(rows) < self.chunk_size:
+            self._exhausted = True
+        if not rows:
+            return
+        first = self._row_count
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self._append(rows)
+        self.endInsertRows()
+
+    # ---- row access ----
+    def _locate(self, row):
+        chunk_no = bisect.bisect_right(self._starts, row) - 1
+        return chunk_no, row - self._starts[chunk_no]
+
+    def row_values(self, row):
+        if row < 0 or row >= self._row_count:
+            return None
+        chunk_no, offset = self._locate(row)
+        rows = self._chunk(chunk_no)
+        return rows[offset] if rows is not None and offset < len(rows) else None
+
+    def row_id(self, row):
+        values = self.row_values(row)
+        return values[0] if values else None
+
+    def row_of(self, key):
+        """Model row of a loaded row id, or None"""
+        for chunk_no, rows in self._chunks.items():
+            for offset, values in enumerate(rows):
+                if values[0] == key:
+                    return self._starts[chunk_no] + offset
+        return None
+
+    # ---- incremental updates ----
+    def _shift(self, chunk_no, delta):
+        self._sizes[chunk_no] += delta
+        for i in range(chunk_no + 1, len(self._starts)):
+            self._starts[i] += delta
+        self._row_count += delta
+
+    def insert_row(self, values):
+        """Insert one freshly written row at its sorted position"""
+        if values is None:
+            return
+        key = self._key_of(values)
+        if not self._bounds:
+            if self._exhausted:
+                self.beginInsertRows(QtCore.QModelIndex(), 0, 0)
+                self._append([values])
+                self.endInsertRows()
+            return
+        # the first chunk whose last key does not sort before the new key
+        chunk_no = next(
+            (i for i, bound in enumerate(self._bounds) if not self._before(bound, key)),
+            None,
+        )
+        if chunk_no is None:
+            if not self._exhausted:
+                return  # beyond the loaded rows; fetchMore will bring it in
+            chunk_no = len(self._bounds) - 1
+            self._bounds[chunk_no] = key
+        rows = self._chunks.get(chunk_no)
+        if rows is None:
+            offset = 0  # evicted: exact place is settled when the chunk is re-read
+        else:
+            offset = next(
+                (i for i, r in enumerate(rows) if self._before(key, self._key_of(r))),
+                len(rows),
+            )
+        row = self._starts[chunk_no] + offset
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        if rows is not None:
+            rows.insert(offset, values)
+        self._shift(chunk_no, 1)
+        self.endInsertRows()
+
+    def update_row(self, key, values):
+        """Replace a loaded row with its re-read values (None = no longer matches the filters)"""
+        row = self.row_of(key)
+        if row is None:
+            return
+        chunk_no, offset = self._locate(row)
+        old = self._chunks[chunk_no][offset]
+        if values is None or self._key_of(values) != self._key_of(old):
+            # filtered out or moved in the sort order
+            self.remove_key(key)
+            self.insert_row(values)
+            return
+        self._chunks[chunk_no][offset] = values
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def apply_changes(self, changes):
+        """Re-read the rows named by change events on the source table.
+
+        Returns False when the changes do not name their rows (bulk writes)
+        or name more than PATCH_LIMIT; the caller should reload instead.
+        """
+        if not self.loaded:
+            return True  # nothing shown yet; the first load reads current data
+        ops = {}  # key -> last operation on it
+        for change in changes:
+            if change.ids is None:
+                return False
+            for key in change.ids:
+                ops[key] = change.op
+        if len(ops) > self.PATCH_LIMIT:
+            return False
+        fetch, generation = self.row_fetcher(), self._generation
+        self._run(
+            lambda: [(key, op, fetch(key)) for key, op in ops.items()], (),
+            lambda rows: self._patch(generation, rows),
+        )
+        return True
+
+    def _patch(self, generation, rows):
+        if generation != self._generation:
+            return  # reloaded meanwhile, which already read these rows
+        for key, op, values in rows:
+            if values is None:
+                self.remove_key(key)   # deleted, or no longer passes the filters
+            elif self.row_of(key) is not None:
+                self.update_row(key, values)
+            elif op == "insert" or len(self._chunks) == len(self._bounds):
+                # an updated row that is not loaded may sit in an evicted chunk;
+                # only with every chunk in memory is it known to be missing
+                self.insert_row(values)
+
+    def remove_key(self, key):
+        """Drop the row with this key if it is loaded"""
+        row = self.row_of(key)
+        if row is None:
+            return
+        chunk_no, offset = self._locate(row)
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._chunks[chunk_no][offset]
+        self._shift(chunk_no, -1)
+        self.endRemoveRows()
+
+    # ---- Qt model interface ----
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.source.headers)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        values = self.row_values(index.row())
+        if values is None:
+            return None
+        return str(values[index.column()])
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.source.headers[section]
+        return str(section + 1)
+
+
+class FilterRow(QtWidgets.QWidget):
+    """One filter box per column; typing is debounced into SqlTableModel.set_filters"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(300)
+        self._timer.timeout.connect(self.apply)
+        self.edits = []
+        for header in model.source.headers:
+            edit = QtWidgets.QLineEdit(self)
+            edit.setPlaceholderText(f"Filter {header}")
+            edit.setToolTip(FILTER_HELP)
+            edit.setClearButtonEnabled(True)
+            edit.textChanged.connect(self._timer.start)
+            layout.addWidget(edit)
+            self.edits.append(edit)
+
+    def apply(self):
+        self.model.set_filters({i: edit.text() for i, edit in enumerate(self.edits)})
+
+    def show_only(self, column, text):
+        """Replace all filters with one, applied at once"""
+        for i, edit in enumerate(self.edits):
+            edit.blockSignals(True)
+            edit.setText(text if i == column else "")
+            edit.blockSignals(False)
+        self._timer.stop()
+        self.apply()
+
+
+def add_filter_row(table, model):
+    """Place a FilterRow directly above `table`, taking its spot in the parent layout"""
+    page = table.parentWidget()
+    container = QtWidgets.QWidget(page)
+    page.layout().replaceWidget(table, container)
+    box = QtWidgets.QVBoxLayout(container)
+    box.setContentsMargins(0, 0, 0, 0)
+    box.setSpacing(4)
+    filter_row = FilterRow(model, container)
+    box.addWidget(filter_row)
+    box.addWidget(table)
+    return filter_row
@@ -0,0 +1,294 @@
+import argparse
+import logging
+import logging.handlers
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from modules import db_connection
+
+# ---- QUERY TRACING ----
+# Off by default: connections then use the plain counting cursor and have no
+# callbacks installed, so tracing costs nothing until it is switched on with
+# enable() or FIRM_TRACE=1. When on, every pooled connection gets
+#   - a trace callback: the statement as executed, with its values bound, plus
+#     one call per statement that triggers and FTS tables run on its behalf;
+#   - a progress handler: VM steps, a cost that does not depend on the machine;
+# and its cursors time execute and fetch, count rows, and note which
+# dashboard method asked for the data. Statements slower than `slow_ms` go to
+# a rotating log, with their query plan.
+
+SLOW_MS = 100
+PROGRESS_OPCODES = 1000      # VM instructions per progress callback
+LOG_PATH = os.path.join(db_connection.BASE_DIR, "logs", "slow_queries.log")
+LOG_MAX_BYTES = 1000000
+LOG_BACKUPS = 5
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+APP_FILE = os.path.join(db_connection.BASE_DIR, "main.py")
+
+
+# ---- CALLERS ----
+_origins = {}  # thread ident -> caller recorded when the work was submitted
+
+
+def caller():
+    """Qualified name of the innermost main.py function on the stack.
+
+    Without one (e.g. a view asking its model for more rows) the outermost
+    Python frame is used.
+    """
+    frame = sys._getframe(1)
+    outermost = None
+    while frame is not None:
+        code = frame.f_code
+        if os.path.abspath(code.co_filename) == APP_FILE and code.co_name != "<module>":
+            return code.co_qualname
+        outermost = code.co_qualname
+        frame = frame.f_back
+    return outermost
+
+
+@contextmanager
+def origin(name):
+    """Attribute the statements run by this thread to `name` (used by worker tasks)"""
+    ident = threading.get_ident()
+    previous = _origins.get(ident)
+    _origins[ident] = name
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _origins[ident]
+        else:
+            _origins[ident] = previous
+
+
+def current_origin():
+    return _origins.get(threading.get_ident()) or caller()
+
+
+# ---- STATEMENTS ----
+class Statement:
+    """One execution of a statement, filled in while it runs and is fetched"""
+
+    __slots__ = ("sql", "params", "origin", "seconds", "rows", "steps", "nested", "expanded", "done")
+
+    def __init__(self, sql, params, origin):
+        self.sql = sql
+        self.params = params
+        self.origin = origin
+        self.seconds = 0.0
+        self.rows = 0
+        self.steps = 0
+        self.nested = 0        # statements run on its behalf by triggers and FTS tables
+        self.expanded = None   # the statement text with its values bound
+        self.done = False
+
+    @property
+    def ms(self):
+        return self.seconds * 1000
+
+    @property
+    def head(self):
+        """Leading text of the statement, up to its first parameter"""
+        end = min((i for i in (self.sql.find("?"), self.sql.find(":")) if i >= 0), default=len(self.sql))
+        return self.sql[:min(end, 40)]
+
+
+class Tracer:
+    """Collects per-statement timings from the connections it is installed on"""
+
+    def __init__(self, slow_ms=SLOW_MS, log_path=LOG_PATH, explain=True,
+                 max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._totals = {}       # sql -> [executions, seconds, max seconds, rows, origins]
+        self._explained = set()
+        self._handler = None
+        self.logger = logging.getLogger("firm.slow_queries")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if log_path:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            self._handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True,
+            )
+            self._handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(self._handler)
+
+    def close(self):
+        if self._handler is not None:
+            self.logger.removeHandler(self._handler)
+            self._handler.close()
+            self._handler = None
+
+    # ---- connection hooks ----
+    def install(self, conn):
+        conn.set_trace_callback(lambda sql: self._on_trace(conn, sql))
+        conn.set_progress_handler(lambda: self._on_progress(conn), PROGRESS_OPCODES)
+
+    @staticmethod
+    def uninstall(conn):
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+
+    @staticmethod
+    def _on_trace(conn, sql):
+        statement = conn.trace_current
+        if statement is not None:
+            if statement.expanded is None and sql.startswith(statement.head):
+                statement.expanded = sql
+            else:
+                statement.nested += 1
+
+    @staticmethod
+    def _on_progress(conn):
+        statement = conn.trace_current
+        if statement is not None:
+            statement.steps += 1
+        return 0
+
+    # ---- statements ----
+    def begin(self, conn, sql, params):
+        statement = Statement(sql, params, current_origin())
+        conn.trace_current = statement
+        return statement
+
+    def finish(self, conn, statement):
+        if statement.done:
+            return
+        statement.done = True
+        if conn.trace_current is statement:
+            conn.trace_current = None
+        with self._lock:
+            totals = self._totals.get(statement.sql)
+            if totals is None:
+                totals = self._totals[statement.sql] = [0, 0.0, 0.0, 0, set()]
+            totals[0] += 1
+            totals[1] += statement.seconds
+            totals[2] = max(totals[2], statement.seconds)
+            totals[3] += statement.rows
+            if statement.origin:
+                totals[4].add(statement.origin)
+        if statement.ms >= self.slow_ms:
+            self._log_slow(conn, statement)
+
+    def _log_slow(self, conn, statement):
+        lines = [
+            f"slow query {statement.ms:.1f} ms, {statement.rows} rows, "
+            f"{statement.steps * PROGRESS_OPCODES} VM steps, "
+            f"{statement.nested} nested statements, "
+            f"from {statement.origin or '?'} [thread {threading.get_ident()}]",
+            "    " + " ".join((statement.expanded or statement.sql).split()),
+        ]
+        if self.explain:
+            with self._lock:
+                first = statement.sql not in self._explained
+                self._explained.add(statement.sql)
+            if first:
+                lines += ["    plan: " + line for line in explain(conn, statement.sql, statement.params)]
+        self.logger.info("\n".join(lines))
+
+    # ---- reporting ----
+    def totals(self):
+        """[(sql, executions, total ms, max ms, rows, origins)], slowest total first"""
+        with self._lock:
+            rows = [
+                (sql, n, seconds * 1000, worst * 1000, rows, sorted(origins))
+                for sql, (n, seconds, worst, rows, origins) in self._totals.items()
+            ]
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self._explained.clear()
+
+    def summary(self, limit=20):
+        lines = [f"{'calls':>7} {'total ms':>10} {'max ms':>9} {'rows':>9}  statement"]
+        for sql, n, total, worst, rows, origins in self.totals()[:limit]:
+            lines.append(f"{n:>7} {total:>10.1f} {worst:>9.1f} {rows:>9}  {' '.join(sql.split())[:100]}")
+            if origins:
+                lines.append(f"{'':>39}from {', '.join(origins)}")
+        return "\n".join(lines)
+
+
+def explain(conn, sql, params=None):
+    """EXPLAIN QUERY PLAN lines for a statement, as an indented tree"""
+    if params is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    # a plain cursor, so explaining a statement is not itself traced
+    cursor = conn.cursor(sqlite3.Cursor)
+    try:
+        plan = cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    except Exception as e:
+        return [f"(no plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for node, parent, _unused, detail in plan:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+# ---- SWITCH ----
+_tracer = None
+
+
+def enable(slow_ms=SLOW_MS, log_path=LOG_PATH, explain=True):
+    """Start tracing every pooled connection, open or opened later; returns the Tracer"""
+    global _tracer
+    disable()
+    _tracer = Tracer(slow_ms, log_path, explain)
+    db_connection.set_tracer(_tracer)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    if _tracer is not None:
+        db_connection.set_tracer(None)
+        _tracer.close()
+        _tracer = None
+
+
+def tracer():
+    return _tracer
+
+
+def active():
+    return _tracer is not None
+
+
+def enable_from_env():
+    """FIRM_TRACE=1 turns tracing on; FIRM_SLOW_MS sets the slow-query threshold"""
+    if os.environ.get("FIRM_TRACE", "") not in ("", "0"):
+        return enable(float(os.environ.get("FIRM_SLOW_MS", SLOW_MS)))
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m modules.tracing", description="Time a statement and show its query plan"
+    )
+    parser.add_argument("sql")
+    parser.add_argument("params", nargs="*", help="positional parameters")
+    parser.add_argument("--db", help="database file (default: the app database)")
+    args = parser.parse_args()
+
+    db_connection.configure(args.db)
+    conn = db_connection.connection()
+    active_tracer = enable(slow_ms=0, log_path=None)
+    start = time.perf_counter()
+    rows = conn.execute(args.sql, args.params).fetchall()
+    print(f"{len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print("\n".join(explain(conn, args.sql, args.params)))
+    print()
+    print(active_tracer.summary())
+    db_connection.close_all()
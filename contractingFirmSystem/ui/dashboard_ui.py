@@ -56,6 +56,7 @@ class Ui_DashboardWindow(object):
         self.label_19.setObjectName("label_19")
         self.gridLayout_2.addWidget(self.label_19, 0, 0, 1, 2)
         self.total_clients_box = QtWidgets.QGroupBox(self.Overview)
+        self.total_clients_box.setMinimumSize(QtCore.QSize(0, 80))
         font = QtGui.QFont()
         font.setPointSize(14)
         font.setBold(True)
@@ -70,6 +71,7 @@ class Ui_DashboardWindow(object):
         self.clients_count_label.setObjectName("clients_count_label")
         self.gridLayout_2.addWidget(self.total_clients_box, 1, 0, 1, 1)
         self.total_projects_box = QtWidgets.QGroupBox(self.Overview)
+        self.total_projects_box.setMinimumSize(QtCore.QSize(0, 80))
         font = QtGui.QFont()
         font.setPointSize(14)
         font.setBold(True)
@@ -84,6 +86,7 @@ class Ui_DashboardWindow(object):
         self.projects_count_label.setObjectName("projects_count_label")
         self.gridLayout_2.addWidget(self.total_projects_box, 1, 1, 1, 1)
         self.payments_sum_box = QtWidgets.QGroupBox(self.Overview)
+        self.payments_sum_box.setMinimumSize(QtCore.QSize(0, 90))
         font = QtGui.QFont()
         font.setPointSize(14)
         font.setBold(True)
@@ -97,6 +100,43 @@ class Ui_DashboardWindow(object):
         self.payments_sum_label.setFont(font)
         self.payments_sum_label.setObjectName("payments_sum_label")
         self.gridLayout_2.addWidget(self.payments_sum_box, 2, 0, 1, 2)
+        self.analytics_box = QtWidgets.QGroupBox(self.Overview)
+        font = QtGui.QFont()
+        font.setPointSize(14)
+        font.setBold(True)
+        self.analytics_box.setFont(font)
+        self.analytics_box.setObjectName("analytics_box")
+        self.gridLayout_11 = QtWidgets.QGridLayout(self.analytics_box)
+        self.gridLayout_11.setObjectName("gridLayout_11")
+        self.analytics_summary_label = QtWidgets.QLabel(self.analytics_box)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setBold(False)
+        self.analytics_summary_label.setFont(font)
+        self.analytics_summary_label.setWordWrap(True)
+        self.analytics_summary_label.setObjectName("analytics_summary_label")
+        self.gridLayout_11.addWidget(self.analytics_summary_label, 0, 0, 1, 2)
+        self.aging_table = QtWidgets.QTableWidget(self.analytics_box)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setBold(False)
+        self.aging_table.setFont(font)
+        self.aging_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.aging_table.setObjectName("aging_table")
+        self.aging_table.setColumnCount(0)
+        self.aging_table.setRowCount(0)
+        self.gridLayout_11.addWidget(self.aging_table, 1, 0, 1, 2)
+        self.forecast_table = QtWidgets.QTableWidget(self.analytics_box)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        font.setBold(False)
+        self.forecast_table.setFont(font)
+        self.forecast_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.forecast_table.setObjectName("forecast_table")
+        self.forecast_table.setColumnCount(0)
+        self.forecast_table.setRowCount(0)
+        self.gridLayout_11.addWidget(self.forecast_table, 2, 0, 1, 2)
+        self.gridLayout_2.addWidget(self.analytics_box, 3, 0, 1, 2)
         self.main_tabs.addTab(self.Overview, "")
         self.Clients = QtWidgets.QWidget()
         self.Clients.setStyleSheet("")
@@ -137,10 +177,8 @@ class Ui_DashboardWindow(object):
         self.delete_client_button = QtWidgets.QPushButton(self.Clients)
         self.delete_client_button.setObjectName("delete_client_button")
         self.gridLayout_3.addWidget(self.delete_client_button, 3, 2, 1, 1)
-        self.clients_table = QtWidgets.QTableWidget(self.Clients)
+        self.clients_table = QtWidgets.QTableView(self.Clients)
         self.clients_table.setObjectName("clients_table")
-        self.clients_table.setColumnCount(0)
-        self.clients_table.setRowCount(0)
         self.gridLayout_3.addWidget(self.clients_table, 4, 0, 1, 3)
         self.main_tabs.addTab(self.Clients, "")
         self.Projects = QtWidgets.QWidget()
@@ -172,10 +210,8 @@ class Ui_DashboardWindow(object):
         self.project_name_input.setSizePolicy(sizePolicy)
         self.project_name_input.setObjectName("project_name_input")
         self.gridLayout_4.addWidget(self.project_name_input, 2, 0, 1, 1)
-        self.projects_table = QtWidgets.QTableWidget(self.Projects)
-        self.projects_table.setColumnCount(7)
+        self.projects_table = QtWidgets.QTableView(self.Projects)
         self.projects_table.setObjectName("projects_table")
-        self.projects_table.setRowCount(0)
         self.gridLayout_4.addWidget(self.projects_table, 6, 0, 1, 7)
         self.project_client_dropdown = QtWidgets.QComboBox(self.Projects)
         self.project_client_dropdown.setObjectName("project_client_dropdown")
@@ -228,10 +264,8 @@ class Ui_DashboardWindow(object):
         self.add_payment_button.setSizePolicy(sizePolicy)
         self.add_payment_button.setObjectName("add_payment_button")
         self.gridLayout_5.addWidget(self.add_payment_button, 1, 0, 1, 3)
-        self.payments_table = QtWidgets.QTableWidget(self.Payments)
+        self.payments_table = QtWidgets.QTableView(self.Payments)
         self.payments_table.setObjectName("payments_table")
-        self.payments_table.setColumnCount(0)
-        self.payments_table.setRowCount(0)
         self.gridLayout_5.addWidget(self.payments_table, 2, 0, 1, 4)
         self.delete_payment_button = QtWidgets.QPushButton(self.Payments)
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed)
@@ -259,6 +293,65 @@ class Ui_DashboardWindow(object):
         self.payment_date_input.setObjectName("payment_date_input")
         self.gridLayout_5.addWidget(self.payment_date_input, 0, 3, 1, 1)
         self.main_tabs.addTab(self.Payments, "")
+        self.Ledger = QtWidgets.QWidget()
+        self.Ledger.setStyleSheet("")
+        self.Ledger.setObjectName("Ledger")
+        self.gridLayout_9 = QtWidgets.QGridLayout(self.Ledger)
+        self.gridLayout_9.setObjectName("gridLayout_9")
+        self.ledger_totals_label = QtWidgets.QLabel(self.Ledger)
+        self.ledger_totals_label.setText("")
+        self.ledger_totals_label.setObjectName("ledger_totals_label")
+        self.gridLayout_9.addWidget(self.ledger_totals_label, 0, 0, 1, 1)
+        self.ledger_table = QtWidgets.QTableView(self.Ledger)
+        self.ledger_table.setObjectName("ledger_table")
+        self.gridLayout_9.addWidget(self.ledger_table, 1, 0, 1, 1)
+        self.main_tabs.addTab(self.Ledger, "")
+        self.Reports = QtWidgets.QWidget()
+        self.Reports.setStyleSheet("")
+        self.Reports.setObjectName("Reports")
+        self.gridLayout_10 = QtWidgets.QGridLayout(self.Reports)
+        self.gridLayout_10.setObjectName("gridLayout_10")
+        self.report_from_label = QtWidgets.QLabel(self.Reports)
+        self.report_from_label.setObjectName("report_from_label")
+        self.gridLayout_10.addWidget(self.report_from_label, 0, 0, 1, 1)
+        self.report_from_year = QtWidgets.QSpinBox(self.Reports)
+        self.report_from_year.setMinimum(1900)
+        self.report_from_year.setMaximum(2100)
+        self.report_from_year.setObjectName("report_from_year")
+        self.gridLayout_10.addWidget(self.report_from_year, 0, 1, 1, 1)
+        self.report_to_label = QtWidgets.QLabel(self.Reports)
+        self.report_to_label.setObjectName("report_to_label")
+        self.gridLayout_10.addWidget(self.report_to_label, 0, 2, 1, 1)
+        self.report_to_year = QtWidgets.QSpinBox(self.Reports)
+        self.report_to_year.setMinimum(1900)
+        self.report_to_year.setMaximum(2100)
+        self.report_to_year.setObjectName("report_to_year")
+        self.gridLayout_10.addWidget(self.report_to_year, 0, 3, 1, 1)
+        self.report_by_client_check = QtWidgets.QCheckBox(self.Reports)
+        self.report_by_client_check.setObjectName("report_by_client_check")
+        self.gridLayout_10.addWidget(self.report_by_client_check, 0, 4, 1, 1)
+        self.report_client_dropdown = QtWidgets.QComboBox(self.Reports)
+        self.report_client_dropdown.setEnabled(False)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.report_client_dropdown.sizePolicy().hasHeightForWidth())
+        self.report_client_dropdown.setSizePolicy(sizePolicy)
+        self.report_client_dropdown.setObjectName("report_client_dropdown")
+        self.gridLayout_10.addWidget(self.report_client_dropdown, 0, 5, 1, 1)
+        self.report_chart = CashFlowChart(self.Reports)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.report_chart.sizePolicy().hasHeightForWidth())
+        self.report_chart.setSizePolicy(sizePolicy)
+        self.report_chart.setObjectName("report_chart")
+        self.gridLayout_10.addWidget(self.report_chart, 1, 0, 1, 6)
+        self.report_summary_label = QtWidgets.QLabel(self.Reports)
+        self.report_summary_label.setText("")
+        self.report_summary_label.setObjectName("report_summary_label")
+        self.gridLayout_10.addWidget(self.report_summary_label, 2, 0, 1, 6)
+        self.main_tabs.addTab(self.Reports, "")
         self.Machines = QtWidgets.QWidget()
         self.Machines.setStyleSheet("")
         self.Machines.setObjectName("Machines")
@@ -270,10 +363,8 @@ class Ui_DashboardWindow(object):
         self.delete_machine_button = QtWidgets.QPushButton(self.Machines)
         self.delete_machine_button.setObjectName("delete_machine_button")
         self.gridLayout_6.addWidget(self.delete_machine_button, 8, 3, 1, 1)
-        self.machines_table = QtWidgets.QTableWidget(self.Machines)
+        self.machines_table = QtWidgets.QTableView(self.Machines)
         self.machines_table.setObjectName("machines_table")
-        self.machines_table.setColumnCount(0)
-        self.machines_table.setRowCount(0)
         self.gridLayout_6.addWidget(self.machines_table, 9, 0, 1, 4)
         self.machine_name_input = QtWidgets.QLineEdit(self.Machines)
         self.machine_name_input.setObjectName("machine_name_input")
@@ -380,10 +471,8 @@ class Ui_DashboardWindow(object):
         self.delete_employee_btn = QtWidgets.QPushButton(self.Employees)
         self.delete_employee_btn.setObjectName("delete_employee_btn")
         self.gridLayout_7.addWidget(self.delete_employee_btn, 2, 7, 1, 1)
-        self.employees_table = QtWidgets.QTableWidget(self.Employees)
+        self.employees_table = QtWidgets.QTableView(self.Employees)
         self.employees_table.setObjectName("employees_table")
-        self.employees_table.setColumnCount(0)
-        self.employees_table.setRowCount(0)
         self.gridLayout_7.addWidget(self.employees_table, 3, 0, 1, 8)
         self.main_tabs.addTab(self.Employees, "")
         self.tab = QtWidgets.QWidget()
@@ -445,13 +534,19 @@ class Ui_DashboardWindow(object):
         self.add_salary_button.setSizePolicy(sizePolicy)
         self.add_salary_button.setObjectName("add_salary_button")
         self.gridLayout_8.addWidget(self.add_salary_button, 2, 0, 1, 1)
+        self.run_payroll_button = QtWidgets.QPushButton(self.tab)
+        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed)
+        sizePolicy.setHorizontalStretch(0)
+        sizePolicy.setVerticalStretch(0)
+        sizePolicy.setHeightForWidth(self.run_payroll_button.sizePolicy().hasHeightForWidth())
+        self.run_payroll_button.setSizePolicy(sizePolicy)
+        self.run_payroll_button.setObjectName("run_payroll_button")
+        self.gridLayout_8.addWidget(self.run_payroll_button, 2, 1, 1, 1)
         self.delete_salary_button = QtWidgets.QPushButton(self.tab)
         self.delete_salary_button.setObjectName("delete_salary_button")
         self.gridLayout_8.addWidget(self.delete_salary_button, 2, 4, 1, 1)
-        self.salary_table = QtWidgets.QTableWidget(self.tab)
+        self.salary_table = QtWidgets.QTableView(self.tab)
         self.salary_table.setObjectName("salary_table")
-        self.salary_table.setColumnCount(0)
-        self.salary_table.setRowCount(0)
         self.gridLayout_8.addWidget(self.salary_table, 3, 0, 1, 5)
         self.main_tabs.addTab(self.tab, "")
         self.gridLayout.addWidget(self.main_tabs, 1, 0, 1, 2)
@@ -480,6 +575,8 @@ class Ui_DashboardWindow(object):
         self.projects_count_label.setText(_translate("DashboardWindow", "0"))
         self.payments_sum_box.setTitle(_translate("DashboardWindow", "Total Payments Recieved"))
         self.payments_sum_label.setText(_translate("DashboardWindow", "Rs: "))
+        self.analytics_box.setTitle(_translate("DashboardWindow", "Receivables and Cash Forecast"))
+        self.analytics_summary_label.setText(_translate("DashboardWindow", "Loading..."))
         self.main_tabs.setTabText(self.main_tabs.indexOf(self.Overview), _translate("DashboardWindow", "Overview"))
         self.label_16.setText(_translate("DashboardWindow", "Client Name:"))
         self.label_17.setText(_translate("DashboardWindow", "Client Contact:"))
@@ -492,7 +589,6 @@ class Ui_DashboardWindow(object):
         self.label_6.setText(_translate("DashboardWindow", "End:"))
         self.label_5.setText(_translate("DashboardWindow", "Start:"))
         self.delete_project_button.setText(_translate("DashboardWindow", "Delete Project"))
-        self.projects_table.setSortingEnabled(True)
         self.add_project_button.setText(_translate("DashboardWindow", "Add"))
         self.label_4.setText(_translate("DashboardWindow", "value:"))
         self.label_3.setText(_translate("DashboardWindow", "Project Name: "))
@@ -501,6 +597,11 @@ class Ui_DashboardWindow(object):
         self.add_payment_button.setText(_translate("DashboardWindow", "Add"))
         self.delete_payment_button.setText(_translate("DashboardWindow", "Delete"))
         self.main_tabs.setTabText(self.main_tabs.indexOf(self.Payments), _translate("DashboardWindow", "Payments"))
+        self.main_tabs.setTabText(self.main_tabs.indexOf(self.Ledger), _translate("DashboardWindow", "Ledger"))
+        self.report_from_label.setText(_translate("DashboardWindow", "From:"))
+        self.report_to_label.setText(_translate("DashboardWindow", "To:"))
+        self.report_by_client_check.setText(_translate("DashboardWindow", "By client"))
+        self.main_tabs.setTabText(self.main_tabs.indexOf(self.Reports), _translate("DashboardWindow", "Reports"))
         self.label_8.setText(_translate("DashboardWindow", "Machine Cost:"))
         self.delete_machine_button.setText(_translate("DashboardWindow", "Delete"))
         self.label_10.setText(_translate("DashboardWindow", "STATUS"))
@@ -546,5 +647,7 @@ class Ui_DashboardWindow(object):
         self.salary_month_dropdown.setItemText(10, _translate("DashboardWindow", "November"))
         self.salary_month_dropdown.setItemText(11, _translate("DashboardWindow", "December"))
         self.add_salary_button.setText(_translate("DashboardWindow", "Add "))
+        self.run_payroll_button.setText(_translate("DashboardWindow", "Run Payroll..."))
         self.delete_salary_button.setText(_translate("DashboardWindow", "Delete"))
         self.main_tabs.setTabText(self.main_tabs.indexOf(self.tab), _translate("DashboardWindow", "Salary"))
+from modules.cash_flow_chart import CashFlowChart